@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+
+def canonical_hash(obj: Any) -> str:
+    """
+    对可 JSON 序列化的对象求规范化哈希：键排序、无多余空白，结构相同的输入得到相同的键
+    """
+    text = json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    粗略估算对象占用的内存字节数（用于缓存容量控制）
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if hasattr(obj, "nbytes"):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        if obj and isinstance(obj[0], (int, float)):
+            # 纯数值列表：指针 + 每个数值对象
+            return sys.getsizeof(obj) + len(obj) * sys.getsizeof(0.0)
+        return sys.getsizeof(obj) + sum(estimate_size(item) for item in obj)
+    return sys.getsizeof(obj)
+
+
+class ResultCache:
+    """
+    线程安全的 LRU 缓存：按估算内存上限淘汰最久未使用的条目，条目超过 TTL 后失效
+
+    属性:
+        max_bytes (int): 缓存总容量上限（字节）
+        ttl (float): 条目有效期（秒），<= 0 表示永不过期
+        hits / misses / evictions (int): 命中、未命中、淘汰计数
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Optional[Any]]:
+        """
+        查询缓存，返回 (是否命中, 值)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and time.monotonic() - entry[2] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key: str, value: Any, size: Optional[int] = None):
+        """
+        写入缓存；单个条目超过容量上限时不缓存
+        """
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        """
+        删除条目，返回条目是否存在
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+
+# 缓存配置：RISK_CACHE_MB 为结果缓存容量，RISK_TREE_CACHE_MB 为编译后决策树的缓存容量，RISK_CACHE_TTL 单位为秒
+result_cache = ResultCache(
+    max_bytes=int(float(os.getenv("RISK_CACHE_MB", "256")) * 1024 * 1024),
+    ttl=float(os.getenv("RISK_CACHE_TTL", "600"))
+)
+tree_cache = ResultCache(
+    max_bytes=int(float(os.getenv("RISK_TREE_CACHE_MB", "256")) * 1024 * 1024),
+    ttl=float(os.getenv("RISK_CACHE_TTL", "600"))
+)
+# 决策树编辑会话同样按内存上限和空闲时间淘汰：RISK_SESSION_MB、RISK_SESSION_TTL（秒）
+session_store = ResultCache(
+    max_bytes=int(float(os.getenv("RISK_SESSION_MB", "256")) * 1024 * 1024),
+    ttl=float(os.getenv("RISK_SESSION_TTL", "3600"))
+)
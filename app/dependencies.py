@@ -1,7 +1,10 @@
-from typing import Annotated
+import os
+
+from typing import Annotated, AsyncIterator
 from fastapi import Depends
-from sqlalchemy import Engine
-from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 username = 'root'
@@ -9,23 +12,47 @@ password = '123456'
 server_ip = '127.0.0.1'
 port = '3306'
 db_name = 'economics'
-sql_url = f"mysql+pymysql://{username}:{password}@{server_ip}:{port}/{db_name}"
 
-# engine = create_engine(sql_url, echo=True)
-engine = create_engine(
-    sql_url,
-    echo=True,
-    pool_pre_ping=True,  # 可选：连接断开后自动重连
-    future=True          # 启用 SQLAlchemy 2.0 风格语法（可选）
-)
+# 数据库配置：均可通过环境变量覆盖；本地开发 / 测试可用 DATABASE_URL=sqlite+aiosqlite:///./economics.db
+sql_url = os.getenv("DATABASE_URL", f"mysql+aiomysql://{username}:{password}@{server_ip}:{port}/{db_name}")
+pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+echo = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+
+def build_engine(url: str) -> AsyncEngine:
+    """
+    创建异步引擎；SQLite 使用 SQLAlchemy 默认的连接池，不接受连接池大小参数
+    """
+    if url.startswith("sqlite"):
+        return create_async_engine(url, echo=echo)
+    return create_async_engine(
+        url,
+        echo=echo,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=True,  # 连接断开后自动重连
+    )
+
+
+engine = build_engine(sql_url)
+
+
+async def create_db_and_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+async def dispose_engine():
+    await engine.dispose()
 
 
-def get_session():
-    with Session(engine) as session:
+async def get_session() -> AsyncIterator[AsyncSession]:
+    # expire_on_commit=False：提交后仍可直接读取对象属性，无需再次查询
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
 
 
-SessionDep = Annotated[Session, Depends(get_session)]
\ No newline at end of file
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
@@ -0,0 +1,95 @@
+import asyncio
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+
+# 进程池配置：RISK_WORKERS=0 时不启用进程池，计算退回 Starlette 的线程池
+max_workers = int(os.getenv("RISK_WORKERS", os.cpu_count() or 1))
+default_timeout = float(os.getenv("RISK_TIMEOUT", "60"))
+disconnect_poll_interval = 0.5
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    懒加载进程池；使用 spawn 启动方式，避免在多线程的服务进程中 fork
+    """
+    global _pool
+    if max_workers <= 0:
+        return None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    """
+    关闭进程池（在 lifespan 结束时调用），丢弃尚未开始的任务
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _wait_for_disconnect(request: Request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(disconnect_poll_interval)
+
+
+async def run_tasks(request: Request, calls: List[Tuple[Callable, tuple]], timeout: Optional[float] = None) -> List[Any]:
+    """
+    把一组 (函数, 参数) 分发到进程池并按顺序返回结果
+
+    超时返回 504；客户端断开时返回 499。两种情况下尚未开始的任务都会被取消，
+    已在子进程中运行的任务会执行完毕但结果被丢弃，因此调用方应把大任务切成小块。
+
+    Args:
+        request (Request): 当前请求，用于检测客户端断开
+        calls (List[Tuple[Callable, tuple]]): 模块级函数及其位置参数（需可被 pickle）
+        timeout (float): 可选，本次请求的超时秒数，缺省使用 RISK_TIMEOUT
+
+    Returns:
+        List[Any]: 与 calls 顺序一致的结果
+    """
+    pool = get_pool()
+    loop = asyncio.get_running_loop()
+    if pool is None:
+        futures = [asyncio.ensure_future(run_in_threadpool(fn, *args)) for fn, args in calls]
+    else:
+        futures = [loop.run_in_executor(pool, partial(fn, *args)) for fn, args in calls]
+
+    gathered = asyncio.gather(*futures)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    done, _ = await asyncio.wait(
+        {gathered, watcher},
+        timeout=default_timeout if timeout is None else timeout,
+        return_when=asyncio.FIRST_COMPLETED
+    )
+
+    if gathered in done:
+        watcher.cancel()
+        return gathered.result()
+
+    # 取消 gather 会一并取消其中尚未完成的任务；回调取走其异常，避免 "never retrieved" 警告
+    gathered.add_done_callback(lambda f: f.cancelled() or f.exception())
+    gathered.cancel()
+    watcher.cancel()
+    if watcher in done:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    raise HTTPException(status_code=504, detail="Analysis timed out")
+
+
+async def run_task(request: Request, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+    """
+    在进程池中执行单个任务，超时与断开处理同 run_tasks
+    """
+    return (await run_tasks(request, [(fn, args)], timeout))[0]
@@ -1,7 +1,13 @@
-from typing import Annotated, Optional, Dict, Literal, List, Tuple
+from datetime import datetime, timezone
+from typing import Annotated, Any, Optional, Dict, Literal, List, Tuple
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class BudgetCostBase(SQLModel):
     method: str = Field(index=True)
 
@@ -9,7 +15,9 @@ class BudgetCostBase(SQLModel):
 # roi
 class ROI(BudgetCostBase, table=True):
     __tablename__ = "budget_roi"
+    __table_args__ = (Index("ix_budget_roi_method_created_at", "method", "created_at"),)
     id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=utc_now)
     method: Optional[str] = Field(default="roi")
     gain: Optional[float] = Field(default=20.0)
     cost: Optional[float] = Field(default=10.0)
@@ -29,7 +37,9 @@ class ROIPublic(BudgetCostBase):
 # npv
 class NPV(BudgetCostBase, table=True):
     __tablename__ = "budget_npv"
+    __table_args__ = (Index("ix_budget_npv_method_created_at", "method", "created_at"),)
     id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=utc_now)
     method: Optional[str] = Field(default="npv")
     discount_rate: float
     npv_value: Optional[float] = Field(default=0.0)
@@ -46,10 +56,34 @@ class NPVPublic(BudgetCostBase):
     npv_value: float
 
 
+class NPVCurveCreate(BudgetCostBase):
+    method: Optional[str] = Field(default="npv_curve")
+    cash_flows: List[float] = Field(min_length=1)
+    rates: Optional[List[float]] = Field(default=None, max_length=100001)
+    rate_min: float = Field(default=0.0, gt=-1)
+    rate_max: float = Field(default=0.5, gt=-1)
+    rate_steps: int = Field(default=51, ge=2, le=100001)
+    rate_curves: Optional[List[List[float]]] = None
+    finance_rate: Optional[float] = Field(default=None, gt=-1)
+    reinvest_rate: Optional[float] = Field(default=None, gt=-1)
+
+
+class NPVCurvePublic(BudgetCostBase):
+    method: str
+    rates: List[float]
+    npv: List[float]
+    break_even_rates: List[float]
+    curve_npv: Optional[List[float]] = None
+    mirr: Optional[float] = None
+    msg: str = "record"
+
+
 # irr
 class IRR(BudgetCostBase, table=True):
     __tablename__ = "budget_irr"
+    __table_args__ = (Index("ix_budget_irr_method_created_at", "method", "created_at"),)
     id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=utc_now)
     method: Optional[str] = Field(default="irr")
     irr_value: Optional[float] = Field(default=0.0)
 
@@ -61,14 +95,16 @@ class IRRCreate(BudgetCostBase):
 
 class IRRPublic(BudgetCostBase):
     method: str
-    irr_value: float
+    irr_value: Optional[float]
     msg: str = "record"
 
 
 # Payback Period
 class PaybackPeriod(BudgetCostBase, table=True):
     __tablename__ = "budget_payback_period"
+    __table_args__ = (Index("ix_budget_payback_period_method_created_at", "method", "created_at"),)
     id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=utc_now)
     method: Optional[str] = Field(default="pp")
     pp_value: Optional[float] = Field(default=0.0)
 
@@ -80,16 +116,98 @@ class PaybackPeriodCreate(BudgetCostBase):
 
 class PaybackPeriodPublic(BudgetCostBase):
     method: str
-    pp_value: float
+    pp_value: Optional[float] = None
     msg: str = "record"
 
 
-class ForecastCreate(BudgetCostBase):
+class ForecastOptions(BudgetCostBase):
+    model: Literal["linear", "ses", "holt", "holt_winters"] = Field(default="linear")
+    confidence: float = Field(default=0.95, gt=0, lt=1)
+    season_length: int = Field(default=1, ge=1)
+    alpha: Optional[float] = Field(default=None, ge=0, le=1)
+    beta: Optional[float] = Field(default=None, ge=0, le=1)
+    gamma: Optional[float] = Field(default=None, ge=0, le=1)
+
+
+class ForecastCreate(ForecastOptions):
     method: Optional[str] = Field(default="forecast")
     historical_data: List[float]
-    future_periods: int
+    future_periods: int = Field(ge=1, le=10000)
 
 class ForecastPublic(BudgetCostBase):
     method: str
-    res: float
-    msg: str
\ No newline at end of file
+    res: Optional[float]
+    forecast: Optional[List[float]] = None
+    lower: Optional[List[Optional[float]]] = None
+    upper: Optional[List[Optional[float]]] = None
+    msg: str
+
+
+class ForecastBatchCreate(ForecastOptions):
+    method: Optional[str] = Field(default="forecast_batch")
+    series: List[List[float]] = Field(min_length=1)
+    future_periods: int = Field(ge=1, le=10000)
+
+
+class ForecastBatchPublic(BudgetCostBase):
+    method: str
+    forecast: List[List[float]]
+    lower: List[List[Optional[float]]]
+    upper: List[List[Optional[float]]]
+    sigma: List[Optional[float]]
+    alpha: Optional[List[float]] = None
+    beta: Optional[List[float]] = None
+    gamma: Optional[List[float]] = None
+    msg: str = "record"
+
+# batch npv / irr / payback period
+class BatchCreate(BudgetCostBase):
+    method: Optional[str] = Field(default="batch")
+    cash_flows: List[List[float]]
+    discount_rates: List[float] = Field(min_length=1)
+    metrics: List[Literal["npv", "irr", "pp"]] = Field(default=["npv", "irr", "pp"])
+    irr_guess: float = Field(default=0.1, gt=-1)
+    irr_tol: float = Field(default=1e-10, gt=0, lt=1)
+    irr_max_iter: int = Field(default=100, ge=1, le=1000)
+
+
+class BatchPublic(BudgetCostBase):
+    method: str
+    npv: Optional[List[Optional[float]]] = None
+    irr: Optional[List[Optional[float]]] = None
+    irr_status: Optional[List[int]] = None
+    pp: Optional[List[Optional[float]]] = None
+    msg: str = "record"
+
+
+# stochastic cash-flow simulation
+class StochasticValue(SQLModel):
+    value: Optional[float] = None
+    distribution: Optional[Literal["normal", "uniform", "triangular", "lognormal", "pert", "empirical"]] = None
+    params: Optional[Dict[str, Any]] = None
+
+
+class SimulationCreate(BudgetCostBase):
+    method: Optional[str] = Field(default="simulation")
+    cash_flows: List[StochasticValue] = Field(min_length=1)
+    discount_rates: List[StochasticValue] = Field(min_length=1)
+    correlation: Optional[List[List[float]]] = None
+    runs: int = Field(default=100000, ge=1, le=10000000)
+    chunk_size: int = Field(default=100000, ge=1, le=1000000)
+    bins: int = Field(default=10, ge=1, le=1000)
+    percentiles: List[float] = Field(default=[5, 25, 50, 75, 95])
+    confidence: float = Field(default=0.95, gt=0, lt=1)
+    irr: bool = True
+    seed: Optional[int] = None
+    timeout: Optional[float] = Field(default=None, gt=0)
+
+
+class SimulationPublic(BudgetCostBase):
+    method: str
+    npv: Dict[str, Any]
+    probability_negative: float
+    value_at_risk: float
+    conditional_value_at_risk: float
+    irr: Optional[Dict[str, Any]] = None
+    irr_unsolved_share: Optional[float] = None
+    msg: str = "record"
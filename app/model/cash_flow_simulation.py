@@ -0,0 +1,118 @@
+from typing import List, Optional
+
+import numpy as np
+
+from app.model.cash_flows import irr_batch
+from app.model.decision_tree import SampleSketch
+from app.model.distributions import copula_uniforms, correlation_factor, inverse_cdf, validate_distribution
+
+
+def stochastic_inputs(cash_flows: List[dict], discount_rates: List[dict]) -> List[dict]:
+    """
+    Validate the per-period inputs and return the stochastic ones (cash flows first, then rates) in order.
+    Every input is either {"value": x} or {"distribution": name, "params": {...}}.
+
+    :param cash_flows: one input per period
+    :param discount_rates: a single rate input for all periods, or one per period
+    :return: inputs that carry a distribution
+    """
+    if not cash_flows:
+        raise ValueError("At least one cash flow is required.")
+    if len(discount_rates) not in (1, len(cash_flows)):
+        raise ValueError(f"discount_rates must have 1 or {len(cash_flows)} items, got {len(discount_rates)}.")
+    stochastic = []
+    for kind, items in (("cash_flows", cash_flows), ("discount_rates", discount_rates)):
+        for i, item in enumerate(items):
+            if item.get("distribution") is not None:
+                validate_distribution(item["distribution"], item.get("params") or {})
+                stochastic.append(item)
+            elif item.get("value") is None:
+                raise ValueError(f"{kind}[{i}] needs either a value or a distribution.")
+            elif kind == "discount_rates" and item["value"] <= -1:
+                raise ValueError("Discount rates must be greater than -1.")
+    return stochastic
+
+
+def _sample(items: List[dict], u: np.ndarray, column: int, size: int) -> tuple:
+    """
+    Fill a (size, len(items)) matrix: fixed values are broadcast, stochastic ones consume copula columns in order
+    """
+    values = np.empty((size, len(items)))
+    for i, item in enumerate(items):
+        if item.get("distribution") is None:
+            values[:, i] = item["value"]
+        else:
+            values[:, i] = inverse_cdf(item["distribution"], item.get("params") or {}, u[:, column])
+            column += 1
+    return values, column
+
+
+def simulate_cash_flow_block(cash_flows: List[dict], discount_rates: List[dict],
+                             correlation: Optional[List[List[float]]], runs: int, seed=None,
+                             chunk_size: int = 100000, with_irr: bool = True) -> dict:
+    """
+    One block of the cash-flow Monte Carlo, simulated chunk_size scenarios at a time so the
+    (scenarios x periods) matrices never exceed one chunk. NPV follows `npv` in the budget_cost router;
+    a single rate discounts every period, per-period rates are compounded like a rate curve.
+    Only fixed-size sketches leave the block, so merging is independent of the number of runs.
+
+    :return: npv (SampleSketch), irr (SampleSketch of the solved IRRs in percent, None when not requested
+             or none was solved) and irr_unsolved (scenarios without an IRR, None when not requested)
+    """
+    if runs <= 0 or chunk_size <= 0:
+        raise ValueError("runs and chunk_size must be positive.")
+    stochastic = stochastic_inputs(cash_flows, discount_rates)
+    factor = correlation_factor(correlation, len(stochastic))
+    rng = np.random.default_rng(seed)
+    periods = len(cash_flows)
+    npv_results = np.empty(runs)
+    irr_results = np.full(runs, np.nan) if with_irr else None
+
+    for start in range(0, runs, chunk_size):
+        size = min(chunk_size, runs - start)
+        u = copula_uniforms(rng, factor, size, len(stochastic)) if stochastic else None
+        flows, column = _sample(cash_flows, u, 0, size)
+        rates, _ = _sample(discount_rates, u, column, size)
+        if np.any(rates <= -1):
+            raise ValueError("A sampled discount rate is not greater than -1; bound its distribution above -1.")
+        factors = np.cumprod(np.broadcast_to(1 / (1 + rates), (size, periods)), axis=1)
+        npv_results[start:start + size] = np.einsum("ij,ij->i", flows, factors) - flows[:, 0]
+        if with_irr:
+            irr_results[start:start + size] = irr_batch(flows)[0]
+
+    block = {"npv": SampleSketch.from_samples(npv_results), "irr": None, "irr_unsolved": None}
+    if with_irr:
+        solved = irr_results[~np.isnan(irr_results)] * 100  # in percent
+        block["irr"] = SampleSketch.from_samples(solved)
+        block["irr_unsolved"] = runs - len(solved)
+    return block
+
+
+def merge_cash_flow_blocks(blocks: List[dict], bins: int = 10, confidence: float = 0.95,
+                           percentiles=(5, 25, 50, 75, 95)) -> dict:
+    """
+    Merge the block sketches and summarise the NPV distribution: summary, histogram, percentiles,
+    probability of a negative NPV and the value at risk / conditional value at risk at `confidence`
+    (both reported as losses, i.e. the negated lower-tail NPV). IRR is summarised in percent.
+    Percentiles, VaR and CVaR come from the merged sketch and are accurate to one sketch bin.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be within (0, 1).")
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise ValueError("percentiles must be within [0, 100].")
+    npv = SampleSketch.merge([block["npv"] for block in blocks])
+    threshold = float(npv.quantile(1 - confidence))
+
+    result = {"npv": npv.summary(bins)}
+    result["npv"]["percentiles"] = {
+        f"p{p:g}": round(float(v), 3) for p, v in zip(percentiles, npv.quantile(np.asarray(percentiles) / 100))
+    }
+    result["probability_negative"] = round(npv.negative / npv.count, 6)
+    result["value_at_risk"] = round(-threshold, 3)
+    result["conditional_value_at_risk"] = round(-npv.tail_mean(threshold), 3)
+
+    if blocks[0]["irr_unsolved"] is not None:
+        irr = SampleSketch.merge([block["irr"] for block in blocks])
+        result["irr"] = irr.summary(bins) if irr is not None else None
+        result["irr_unsolved_share"] = round(sum(block["irr_unsolved"] for block in blocks) / npv.count, 6)
+    return result
@@ -0,0 +1,376 @@
+from itertools import chain
+from typing import List, Optional
+
+import numpy as np
+
+# discount factors held at once when an NPV curve is evaluated
+NPV_CURVE_CELLS = 1 << 20
+
+
+def pad_cash_flows(cash_flows: List[List[float]]) -> np.ndarray:
+    """
+    Stack ragged cash-flow series into one matrix, padding short series with trailing zeros.
+    A trailing zero changes neither NPV, IRR nor the payback period, so no separate mask is needed.
+
+    :param cash_flows: one list of cash flows per series
+    :return: matrix of shape (series, longest series)
+    """
+    if not cash_flows:
+        return np.zeros((0, 1))
+    lengths = np.fromiter((len(c) for c in cash_flows), dtype=np.int64, count=len(cash_flows))
+    if lengths.min() == 0:
+        raise ValueError(f"Cash-flow series {int(np.argmin(lengths))} is empty.")
+    flows = np.zeros((len(cash_flows), int(lengths.max())))
+    values = np.fromiter(chain.from_iterable(cash_flows), dtype=float, count=int(lengths.sum()))
+    flows[np.arange(flows.shape[1]) < lengths[:, None]] = values
+    return flows
+
+
+def discount_factors(rates: np.ndarray, periods: int) -> np.ndarray:
+    """
+    Discount-factor matrix (1 + r) ^ -t for t = 1..periods, one row per rate (a Vandermonde matrix of 1 / (1 + r))
+    """
+    return np.vander(1 / (1 + np.asarray(rates, dtype=float)), periods + 1, increasing=True)[:, 1:]
+
+
+def curve_discount_factors(curves: List[List[float]], periods: int) -> np.ndarray:
+    """
+    Discount-factor matrix for term structures: period t is discounted by prod(1 / (1 + r_k)) for k = 1..t,
+    so a flat curve gives the same factors as `discount_factors`. A curve shorter than the series keeps its last rate.
+
+    :param curves: per-period rates, one list per curve
+    :param periods: number of periods to discount
+    :return: matrix of shape (curves, periods)
+    """
+    rates = np.empty((len(curves), periods))
+    for i, curve in enumerate(curves):
+        if not curve:
+            raise ValueError(f"Rate curve {i} is empty.")
+        rates[i, :len(curve)] = curve[:periods]
+        rates[i, len(curve):] = curve[-1]
+    if np.any(rates <= -1):
+        raise ValueError("Rates must be greater than -1.")
+    return np.cumprod(1 / (1 + rates), axis=1)
+
+
+def npv_curve(cash_flows: np.ndarray, rates: np.ndarray) -> np.ndarray:
+    """
+    NPV of one series at every rate (same convention as `npv`), evaluated over chunks of rates
+    so the discount-factor matrix never holds more than NPV_CURVE_CELLS values.
+
+    :param cash_flows: one cash-flow series
+    :param rates: flat discount rates
+    :return: NPV per rate
+    """
+    rates = np.asarray(rates, dtype=float)
+    periods = len(cash_flows)
+    rows = max(1, NPV_CURVE_CELLS // periods)
+    values = np.empty(len(rates))
+    for begin in range(0, len(rates), rows):
+        values[begin:begin + rows] = discount_factors(rates[begin:begin + rows], periods) @ cash_flows
+    return values - cash_flows[0]
+
+
+def curve_npv(cash_flows: np.ndarray, curves: List[List[float]]) -> np.ndarray:
+    """
+    NPV of one series under every per-period rate curve (see `curve_discount_factors`), evaluated over
+    chunks of curves like `npv_curve`
+
+    :param cash_flows: one cash-flow series
+    :param curves: per-period rates, one list per curve
+    :return: NPV per curve
+    """
+    # checked up front so the reported index refers to the whole list, not to a chunk
+    empty = next((i for i, curve in enumerate(curves) if not curve), None)
+    if empty is not None:
+        raise ValueError(f"Rate curve {empty} is empty.")
+    periods = len(cash_flows)
+    rows = max(1, NPV_CURVE_CELLS // periods)
+    values = np.empty(len(curves))
+    for begin in range(0, len(curves), rows):
+        values[begin:begin + rows] = curve_discount_factors(curves[begin:begin + rows], periods) @ cash_flows
+    return values - cash_flows[0]
+
+
+def npv_batch(flows: np.ndarray, rates: np.ndarray) -> np.ndarray:
+    """
+    NPV of every series with the same convention as `npv` in the budget_cost router.
+    A single shared rate is one matrix-vector product; otherwise each series is dotted with its own row.
+
+    :param flows: padded cash flows, shape (series, periods)
+    :param rates: one discount rate per series, or a single rate for all of them
+    :return: NPV per series
+    """
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    if len(rates) not in (1, len(flows)):
+        raise ValueError(f"discount_rates must have 1 or {len(flows)} values, got {len(rates)}.")
+    if np.any(rates <= -1):
+        raise ValueError("Discount rates must be greater than -1.")
+    factors = discount_factors(rates, flows.shape[1])
+    if len(rates) == 1:
+        return flows @ factors[0] - flows[:, 0]
+    return np.einsum("ij,ij->i", flows, factors) - flows[:, 0]
+
+
+def payback_batch(flows: np.ndarray) -> np.ndarray:
+    """
+    Index of the first period whose cumulative cash flow is non-negative, NaN if it is never reached
+
+    :param flows: padded cash flows, shape (series, periods)
+    :return: payback period per series
+    """
+    reached = np.cumsum(flows, axis=1) >= 0
+    return np.where(reached.any(axis=1), np.argmax(reached, axis=1), np.nan)
+
+
+# per-series IRR status codes
+IRR_OK = 0  # unique IRR
+IRR_MULTIPLE = 1  # cash flows change sign more than once: other IRRs may exist, the one closest to 0 is returned
+IRR_NO_SIGN_CHANGE = 2  # all cash flows have the same sign, no IRR exists
+IRR_NOT_FOUND = 3  # no root found between -99% and 999900% or the solver did not converge
+
+# x = 1 / (1 + r) grid scanned for sign changes when Newton alone is not enough: r from about 999900% down to -99%.
+# x = 1 (r = 0) is a grid point, so every cell lies entirely on one side of 0
+IRR_GRID = np.concatenate((np.geomspace(1e-4, 1, 129)[:-1], np.geomspace(1, 100, 65)))
+IRR_CHUNK = 1 << 14
+
+
+def sign_changes(flows: np.ndarray) -> np.ndarray:
+    """
+    Number of sign changes in every series, zeros are skipped
+    """
+    signs = np.sign(flows)
+    last = np.maximum.accumulate(np.where(signs != 0, np.arange(flows.shape[1]), -1), axis=1)
+    previous = np.where(last >= 0, np.take_along_axis(signs, np.maximum(last, 0), axis=1), 0)
+    return (signs[:, 1:] * previous[:, :-1] < 0).sum(axis=1)
+
+
+def _horner(c: np.ndarray, x: np.ndarray) -> tuple:
+    """
+    sum(c_t * x^t) and its derivative for every row of c at its own x
+    """
+    p, dp = np.zeros(len(x)), np.zeros(len(x))
+    for t in range(c.shape[1] - 1, -1, -1):
+        dp = dp * x + p
+        p = p * x + c[:, t]
+    return p, dp
+
+
+def _newton(flows: np.ndarray, x: np.ndarray, lo: np.ndarray, hi: np.ndarray, tol: float, max_iter: int) -> tuple:
+    """
+    Newton's method on p(x) = sum(c_t * x^t) for all series at once, with a convergence mask.
+    Where [lo, hi] brackets a sign change a step that leaves the bracket is replaced by bisection;
+    without a bracket (hi = inf) such a step marks the series as failed.
+
+    :return: (x, converged)
+    """
+    m = len(flows)
+    x, lo, hi = x.copy(), lo.copy(), hi.copy()
+    bracketed = np.isfinite(hi)
+    sign_lo = np.sign(_horner(flows, lo)[0])
+    active = np.ones(m, dtype=bool)
+    converged = np.zeros(m, dtype=bool)
+    # the working set is only re-gathered once fewer than half of it is still active, and is stored
+    # column-major so Horner reads contiguous memory
+    work, columns = np.arange(m), np.asfortranarray(flows)
+    with np.errstate(all="ignore"):
+        for _ in range(max_iter):
+            selected = active[work]
+            if not selected.any():
+                break
+            if 2 * np.count_nonzero(selected) < len(work):
+                work = work[selected]
+                columns = np.asfortranarray(flows[work])
+                selected = np.ones(len(work), dtype=bool)
+            idx = work[selected]
+            xi = x[idx]
+            p, dp = _horner(columns, x[work])
+            p, dp = p[selected], dp[selected]
+            root = p == 0
+            below = bracketed[idx] & (np.sign(p) == sign_lo[idx])
+            lo[idx[below]] = xi[below]
+            above = bracketed[idx] & ~below
+            hi[idx[above]] = xi[above]
+
+            new = xi - p / dp
+            done = root | (np.abs(new - xi) <= tol * np.maximum(1, np.abs(xi)))
+            outside = ~done & ~((new > lo[idx]) & (new < hi[idx]))
+            bisect = outside & bracketed[idx]
+            new[bisect] = (lo[idx[bisect]] + hi[idx[bisect]]) / 2
+            failed = outside & ~bracketed[idx]
+            x[idx] = np.where(root, xi, new)
+
+            converged[idx[done]] = True
+            active[idx[done | failed]] = False
+    return x, converged
+
+
+def _bracket(flows: np.ndarray, tol: float = 1e-10, max_iter: int = 100) -> tuple:
+    """
+    Scan IRR_GRID for sign changes. The IRR closest to 0 (the same choice as numpy_financial.irr) lies in
+    the sign-change cell nearest to x = 1 on one of its two sides, so both candidates are returned.
+    Two roots inside one cell leave no sign change at the grid points; such a cell is recognised by a sign
+    change of p' instead, and when p at the turning point x* has the other sign the root nearer to x = 1
+    is bracketed by [x*, x_hi] (r > 0) or [x_lo, x*] (r < 0). The scan is chunked so memory stays bounded.
+
+    :return: (lo, hi, start) of shape (series, 2), hi is inf where that side has no sign change
+    """
+    m, n = flows.shape
+    lo, hi, start = np.zeros((m, 2)), np.full((m, 2), np.inf), np.zeros((m, 2))
+    powers = IRR_GRID[None, :] ** np.arange(n)[:, None]
+    # p'(x) = sum(t * c_t * x^(t-1))
+    slopes = flows[:, 1:] * np.arange(1, n)
+    slope_powers = powers[:-1]
+    split = int(np.count_nonzero(IRR_GRID < 1))  # cells [0, split) have r > 0, the others r < 0
+    turning = []  # (series, cell, side) of cells where p' changes sign and that lie nearer to x = 1
+    with np.errstate(all="ignore"):
+        for begin in range(0, m, IRR_CHUNK):
+            rows = slice(begin, begin + IRR_CHUNK)
+            values = flows[rows] @ powers
+            negative = values < 0
+            cells = (negative[:, :-1] != negative[:, 1:]) | (values[:, :-1] == 0)
+            falling = (slopes[rows] @ slope_powers) < 0
+            series, cell = np.nonzero(~cells & (falling[:, :-1] != falling[:, 1:]))
+            turn_side = (cell >= split).astype(np.int64)
+            nearer = np.zeros(len(series), dtype=bool)
+            for side, first, offset in ((0, cells[:, :split], 0), (1, cells[:, split:], split)):
+                # r > 0: the cell with the largest x (closest to 1); r < 0: the cell with the smallest x
+                found = first.any(axis=1)
+                best = offset + (split - 1 - np.argmax(first[:, ::-1], axis=1) if side == 0 else np.argmax(first, axis=1))
+                p_lo = np.take_along_axis(values, best[:, None], axis=1)[:, 0]
+                p_hi = np.take_along_axis(values, best[:, None] + 1, axis=1)[:, 0]
+                x_lo, x_hi = IRR_GRID[best], IRR_GRID[best + 1]
+                lo[rows, side] = x_lo
+                hi[rows, side] = np.where(found, np.where(p_lo == 0, x_lo, x_hi), np.inf)
+                # start Newton from the secant through the cell ends
+                start[rows, side] = np.where(p_lo == 0, x_lo, x_lo - p_lo * (x_hi - x_lo) / (p_hi - p_lo))
+
+                # turning cells between x = 1 and the nearest sign-change cell of the same side
+                beyond = cell > best[series] if side == 0 else cell < best[series]
+                nearer |= (turn_side == side) & (~found[series] | beyond)
+            turning.append((series[nearer] + begin, cell[nearer], turn_side[nearer]))
+
+    series, cell, side = (np.concatenate(parts) for parts in zip(*turning))
+    if not len(series):
+        return lo, hi, start
+    x_lo, x_hi = IRR_GRID[cell], IRR_GRID[cell + 1]
+    turn, ok = _newton(slopes[series], (x_lo + x_hi) / 2, x_lo, x_hi, tol, max_iter)
+    p_turn = _horner(flows[series], turn)[0]
+    p_end = _horner(flows[series], x_lo)[0]
+    ok &= (turn > x_lo) & (turn < x_hi) & (np.sign(p_turn) != np.sign(p_end))
+    series, cell, side, turn = series[ok], cell[ok], side[ok], turn[ok]
+    for which in (0, 1):
+        on_side = side == which
+        # the nearest crossing turning cell replaces the sign-change cell of that side
+        key = np.where(on_side, cell if which == 0 else -cell, -np.inf)
+        best = np.full(m, -np.inf)
+        np.maximum.at(best, series, key)
+        pick = on_side & (key == best[series])
+        rows, a, b = series[pick], turn[pick], IRR_GRID[cell[pick] + (1 if which == 0 else 0)]
+        a, b = (a, b) if which == 0 else (b, a)
+        p_a, p_b = _horner(flows[rows], a)[0], _horner(flows[rows], b)[0]
+        lo[rows, which], hi[rows, which] = a, b
+        with np.errstate(all="ignore"):
+            start[rows, which] = np.where(p_a == 0, a, a - p_a * (b - a) / (p_b - p_a))
+    return lo, hi, start
+
+
+def irr_batch(flows: np.ndarray, guess: float = 0.1, tol: float = 1e-10, max_iter: int = 100) -> tuple:
+    """
+    IRR of every series, solved as roots of the polynomial p(x) = sum(c_t * x^t) with x = 1 / (1 + r).
+
+    With a single sign change p has exactly one positive root, so plain Newton from `guess` suffices.
+    Series with several sign changes, and series where Newton fails, are bracketed on a rate grid and
+    refined by Newton with bisection fallback; their status tells whether other IRRs may exist.
+
+    :param flows: padded cash flows, shape (series, periods)
+    :param guess: starting rate for Newton
+    :param tol: relative convergence tolerance on x
+    :param max_iter: maximum number of iterations of each solver pass
+    :return: (IRR per series as a fraction, NaN when there is none; status code per series, see IRR_OK etc.)
+    """
+    if guess <= -1:
+        raise ValueError("guess must be greater than -1.")
+    m, n = flows.shape
+    lead = np.argmax(flows != 0, axis=1)
+    if lead.any():
+        # leading zero flows only add the root x = 0 (r = inf): shift every series to its first non-zero flow
+        columns = np.arange(n) + lead[:, None]
+        flows = np.where(columns < n, np.take_along_axis(flows, np.minimum(columns, n - 1), axis=1), 0)
+    changes = sign_changes(flows)
+    status = np.where(changes == 0, IRR_NO_SIGN_CHANGE, IRR_NOT_FOUND)
+    x = np.full(m, np.nan)
+
+    single = np.flatnonzero(changes == 1)
+    if len(single):
+        start = np.full(len(single), 1 / (1 + guess))
+        root, ok = _newton(flows[single], start, np.zeros(len(single)), np.full(len(single), np.inf), tol, max_iter)
+        ok &= root > 0
+        x[single[ok]] = root[ok]
+        status[single[ok]] = IRR_OK
+
+    rest = np.flatnonzero((changes > 0) & (status == IRR_NOT_FOUND))
+    if len(rest):
+        lo, hi, start = _bracket(flows[rest], tol, max_iter)
+        series, side = np.nonzero(np.isfinite(hi))
+        lo, hi, start = lo[series, side], hi[series, side], start[series, side]
+        root, ok = _newton(flows[rest[series]], start, lo, hi, tol, max_iter)
+        # keep the smaller |r| when both sides have a root
+        distance = np.where(ok, np.abs(1 / root - 1), np.inf)
+        best = np.full(len(rest), np.inf)
+        np.minimum.at(best, series, distance)
+        pick = ok & (distance == best[series])
+        x[rest[series[pick]]] = root[pick]
+        status[rest[series[pick]]] = np.where(changes[rest[series[pick]]] > 1, IRR_MULTIPLE, IRR_OK)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 1 / x - 1, status
+
+
+def break_even_rates(cash_flows: np.ndarray, rates: np.ndarray, values: np.ndarray, tol: float = 1e-10,
+                     max_iter: int = 100) -> np.ndarray:
+    """
+    Rates within the scanned range where the NPV (same convention as `npv`) changes sign.
+    That NPV is the polynomial -c_0 + sum(c_(t-1) * x^t) in x = 1 / (1 + r); every sign change between
+    neighbouring grid rates is refined with the bracketed Newton / bisection solver used for IRR.
+
+    :param cash_flows: one cash-flow series
+    :param rates: increasing grid of rates
+    :param values: NPV at every grid rate
+    :return: break-even rates in increasing order
+    """
+    coefficients = np.concatenate(([-cash_flows[0]], cash_flows))
+    signs = np.sign(values)
+    exact = rates[signs == 0]
+    cells = np.flatnonzero(signs[:-1] * signs[1:] < 0)
+    if not len(cells):
+        return exact
+    lo, hi = 1 / (1 + rates[cells + 1]), 1 / (1 + rates[cells])
+    p_lo, p_hi = values[cells + 1], values[cells]
+    start = lo - p_lo * (hi - lo) / (p_hi - p_lo)
+    x, ok = _newton(np.tile(coefficients, (len(cells), 1)), start, lo, hi, tol, max_iter)
+    return np.sort(np.concatenate((exact, 1 / x[ok] - 1)))
+
+
+def mirr(cash_flows: np.ndarray, finance_rate: float, reinvest_rate: float) -> float:
+    """
+    Modified IRR: negative flows are discounted to period 0 at finance_rate, positive flows are compounded
+    to the last period at reinvest_rate (same definition as numpy_financial.mirr)
+
+    :return: MIRR as a fraction, NaN without both positive and negative flows
+    """
+    n = len(cash_flows)
+    positive, negative = cash_flows > 0, cash_flows < 0
+    if n < 2 or not positive.any() or not negative.any():
+        return np.nan
+    t = np.arange(n)
+    gain = (cash_flows * positive * (1 + reinvest_rate) ** (n - 1 - t)).sum()
+    cost = -(cash_flows * negative / (1 + finance_rate) ** t).sum()
+    return float((gain / cost) ** (1 / (n - 1)) - 1)
+
+
+def as_column(values: np.ndarray) -> List[Optional[float]]:
+    """
+    Convert an array to a JSON column, NaN becomes null
+    """
+    return [None if v != v else v for v in values.tolist()]
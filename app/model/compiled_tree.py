@@ -0,0 +1,267 @@
+import sys
+
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 节点类型
+LEAF = 0      # 叶子节点：EV = value
+CHANCE = 1    # 机会节点：EV = Σ probability * EV(child)
+DECISION = 2  # 决策节点：EV = max EV(child)
+
+
+class CompiledTree:
+    """
+    编译后的决策树：把嵌套字典展平为按层（BFS）排列的 NumPy 数组
+
+    BFS 顺序保证父节点总在子节点之前，且同一父节点的子节点在数组中连续，
+    因此自底向上逐层用 reduceat 即可一次算出所有节点的期望值。
+
+    属性:
+        names (List[str]): 节点名称
+        parent (np.ndarray): 父节点下标，根节点为 -1
+        kind (np.ndarray): 节点类型（LEAF / CHANCE / DECISION）
+        value (np.ndarray): 节点 value，缺省为 nan
+        probability (np.ndarray): 节点 probability，缺省为 nan
+        child_start (np.ndarray): 第一个子节点的下标
+        child_count (np.ndarray): 子节点个数
+        depth (np.ndarray): 节点深度，根节点为 0
+        level_offsets (np.ndarray): 第 L 层节点位于 [level_offsets[L], level_offsets[L+1])
+        path_index (Dict[tuple, int]): 路径元组 -> 节点下标，根节点为 ()
+    """
+
+    def __init__(self, names: List[str], parent, value, probability, child_start, child_count, depth, level_offsets,
+                 path_index: Dict[tuple, int]):
+        self.names = names
+        self.path_index = path_index
+        self.parent = parent
+        self.value = value
+        self.probability = probability
+        self.child_start = child_start
+        self.child_count = child_count
+        self.depth = depth
+        self.level_offsets = level_offsets
+
+        # 缺少 probability 的子节点个数：为 0 的内部节点是机会节点
+        has_prob = ~np.isnan(probability) & (parent >= 0)
+        self.missing_prob = child_count - np.bincount(parent[has_prob], minlength=len(names))
+
+        kind = np.full(len(names), DECISION, dtype=np.int8)
+        kind[child_count == 0] = LEAF
+        kind[(child_count > 0) & (self.missing_prob == 0)] = CHANCE
+        self.kind = kind
+
+        # 缺少 value 的叶子在编译时不报错：它可能正是敏感性分析 / 蒙特卡洛要替换的目标，
+        # 由 check_values 在真正需要这些 value 时校验
+        self.missing_value = np.flatnonzero((kind == LEAF) & np.isnan(value))
+
+        # 预先计算每一层的（内部父节点, reduceat 起点），求值时直接复用
+        self._levels = []
+        for level in range(len(level_offsets) - 2, 0, -1):
+            lo, hi = int(level_offsets[level]), int(level_offsets[level + 1])
+            plo, phi = int(level_offsets[level - 1]), lo
+            parents = np.flatnonzero(child_count[plo:phi] > 0) + plo
+            starts = child_start[parents] - lo
+            self._levels.append((lo, hi, parents, starts, kind[parents] == CHANCE))
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        估算编译后决策树占用的内存字节数
+        """
+        arrays = [self.parent, self.kind, self.value, self.probability, self.child_start,
+                  self.child_count, self.depth, self.level_offsets, self.missing_prob, self.missing_value]
+        arrays += [a for level in self._levels for a in level[2:]]
+        # 名称字符串 + 路径索引中的元组与字典槽位
+        return sum(a.nbytes for a in arrays) + sum(sys.getsizeof(name) + 8 for name in self.names) \
+            + sum(sys.getsizeof(path) + 100 for path in self.path_index)
+
+    def children(self, index: int) -> range:
+        """
+        返回节点 index 的所有子节点下标
+        """
+        start = int(self.child_start[index])
+        return range(start, start + int(self.child_count[index]))
+
+    def find_index(self, path: List[str]) -> int:
+        """
+        根据路径（列表）找到目标节点下标，例如 ["Dev A", "A Success"]，O(1) 查表
+        """
+        index = self.path_index.get(tuple(path))
+        if index is None:
+            raise ValueError(f"Node path {' -> '.join(path)} not found.")
+        return index
+
+    def check_values(self, overridden=()):
+        """
+        校验所有叶子都有 value；overridden 中的节点下标（其 value 会被替换）除外
+        """
+        for leaf in self.missing_value.tolist():
+            if leaf not in overridden:
+                raise ValueError(f"Leaf node '{self.names[leaf]}' has no value.")
+
+    def expected_values(self, value: Optional[np.ndarray] = None,
+                        probability: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        自底向上一次性计算所有节点的期望值；缺少 value 的叶子及其祖先为 nan，需要时先调用 check_values
+
+        Args:
+            value (np.ndarray): 可选，替换的 value 数组，形状 (n,) 或 (n, batch)
+            probability (np.ndarray): 可选，替换的 probability 数组，形状同上
+
+        Returns:
+            np.ndarray: 每个节点的期望值，形状 (n,) 或 (n, batch)
+        """
+        value = self.value if value is None else value
+        probability = self.probability if probability is None else probability
+        ev = np.array(value, dtype=float, copy=True)
+        for lo, hi, parents, starts, is_chance in self._levels:
+            child_ev = ev[lo:hi]
+            weighted = np.add.reduceat(child_ev * probability[lo:hi], starts, axis=0)
+            best = np.maximum.reduceat(child_ev, starts, axis=0)
+            if ev.ndim > 1:
+                is_chance = is_chance[:, None]
+            ev[parents] = np.where(is_chance, weighted, best)
+        return ev
+
+    def recompute_ancestors(self, overrides: List[Tuple[int, str, np.ndarray]],
+                            base_ev: Optional[np.ndarray] = None) -> Dict[int, np.ndarray]:
+        """
+        替换若干节点的 value/probability 后，只沿祖先路径重新计算期望值
+
+        EV 对叶子的 value 和机会分支的 probability 都是线性的，未受影响的兄弟节点
+        只需用基准 EV 汇总一次；替换值可以是任意可广播的数组，整批一起计算。
+
+        Args:
+            overrides (List[Tuple[int, str, np.ndarray]]): (节点下标, 字段, 替换值) 列表，
+                字段为 "value" 或 "probability"
+            base_ev (np.ndarray): 可选，未替换时各节点的期望值
+
+        Returns:
+            Dict[int, np.ndarray]: 受影响节点（目标节点及其祖先）的新期望值
+        """
+        if base_ev is None:
+            base_ev = self.expected_values()
+
+        new_value, new_prob = {}, {}
+        for index, field, values in overrides:
+            if field == "value":
+                new_value[index] = np.asarray(values, dtype=float)
+            elif field == "probability":
+                new_prob[index] = np.asarray(values, dtype=float)
+            else:
+                raise ValueError(f"Unsupported field: {field}")
+        self.check_values(new_value)
+
+        # 收集受影响节点，并记录每个祖先下受影响的子节点
+        affected_children = {}
+        for index in list(new_value) + list(new_prob):
+            affected_children.setdefault(index, [])
+            while self.parent[index] >= 0:
+                parent = int(self.parent[index])
+                seen = parent in affected_children
+                siblings = affected_children.setdefault(parent, [])
+                if index not in siblings:
+                    siblings.append(index)
+                if seen:
+                    break
+                index = parent
+
+        new_ev = {}
+        # BFS 顺序中子节点下标总大于父节点，逆序即自底向上
+        for node in sorted(affected_children, reverse=True):
+            if self.kind[node] == LEAF:
+                new_ev[node] = new_value.get(node, base_ev[node])
+                continue
+
+            changed = affected_children[node]
+            start, count = int(self.child_start[node]), int(self.child_count[node])
+            unchanged = np.ones(count, dtype=bool)
+            unchanged[[c - start for c in changed]] = False
+            rest_ev = base_ev[start:start + count][unchanged]
+
+            # 新补上 probability 的子节点可能让决策节点变成机会节点
+            filled = sum(1 for c in changed if c in new_prob and np.isnan(self.probability[c]))
+            if self.missing_prob[node] - filled == 0:
+                rest_prob = self.probability[start:start + count][unchanged]
+                ev = float(np.dot(rest_prob, rest_ev))
+                for c in changed:
+                    ev = ev + new_prob.get(c, self.probability[c]) * new_ev[c]
+            else:
+                ev = float(rest_ev.max()) if len(rest_ev) else -np.inf
+                for c in changed:
+                    ev = np.maximum(ev, new_ev[c])
+            new_ev[node] = ev
+
+        return new_ev
+
+    def evaluate_overrides(self, overrides: List[Tuple[int, str, np.ndarray]],
+                           base_ev: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        批量计算替换若干节点字段后的根节点期望值，结果形状为替换值的广播形状
+        """
+        if base_ev is None:
+            base_ev = self.expected_values()
+        return np.asarray(self.recompute_ancestors(overrides, base_ev).get(0, base_ev[0]), dtype=float)
+
+
+def compile_tree(data: dict) -> CompiledTree:
+    """
+    把嵌套字典（TreeNodeInput 格式）按 BFS 顺序编译为 CompiledTree，同时建立路径索引
+
+    同一父节点下的子节点名称必须唯一，否则路径无法唯一定位节点，此时直接报错并列出所有重名路径。
+
+    Args:
+        data (dict): 输入的嵌套字典结构
+
+    Returns:
+        CompiledTree: 编译完成的数组形式决策树
+    """
+    names, parent, value, probability = [], [], [], []
+    child_start, child_count, depth, level_offsets = [], [], [], []
+    path_index, duplicates = {}, []
+
+    queue = deque([(data, -1, 0, ())])
+    while queue:
+        node, parent_index, level, path = queue.popleft()
+        index = len(names)
+        if path in path_index:
+            duplicates.append(" -> ".join(path))
+        else:
+            path_index[path] = index
+        if level == len(level_offsets):
+            level_offsets.append(index)
+        names.append(node["name"])
+        parent.append(parent_index)
+        v = node.get("value")
+        p = node.get("probability")
+        value.append(np.nan if v is None else v)
+        probability.append(np.nan if p is None else p)
+        depth.append(level)
+
+        children = node.get("children") or []
+        # 子节点在 BFS 中连续排列，首个子节点的下标 = 已分配节点数 + 队列长度
+        child_start.append(index + 1 + len(queue))
+        child_count.append(len(children))
+        for child in children:
+            queue.append((child, index, level + 1, path + (child["name"],)))
+    level_offsets.append(len(names))
+
+    if duplicates:
+        raise ValueError(f"Duplicate sibling names at: {', '.join(duplicates)}")
+
+    return CompiledTree(
+        names=names,
+        parent=np.array(parent, dtype=np.int64),
+        value=np.array(value, dtype=float),
+        probability=np.array(probability, dtype=float),
+        child_start=np.array(child_start, dtype=np.int64),
+        child_count=np.array(child_count, dtype=np.int64),
+        depth=np.array(depth, dtype=np.int64),
+        level_offsets=np.array(level_offsets, dtype=np.int64),
+        path_index=path_index,
+    )
@@ -0,0 +1,135 @@
+from collections import deque
+from typing import Dict, List
+
+import numpy as np
+
+from app.model.scheduler import Activity
+
+
+class ProjectNetwork:
+    """
+    活动网络（AON）：用邻接表保存前置/后继关系，并用 Kahn 算法求出拓扑序
+
+    构建时一次性校验重名活动、未知前置活动和循环依赖，后续 CPM 计算均为 O(V+E)。
+    时间约定与原接口一致：工期从第 1 天开始，EF/LF 为活动最后一个工作日（含）。
+
+    属性:
+        names (List[str]): 活动名称（保持输入顺序）
+        index (Dict[str, int]): 活动名称 -> 下标
+        duration (np.ndarray): 工期
+        predecessors / successors (List[List[int]]): 前置 / 后继活动下标
+        order (List[int]): 拓扑序
+        edge_src / edge_dst (np.ndarray): 所有依赖边 (前置 -> 后继)
+    """
+
+    def __init__(self, activities: List[Activity]):
+        self.names = [a.name for a in activities]
+        self.index: Dict[str, int] = {}
+        duplicates = []
+        for i, name in enumerate(self.names):
+            if name in self.index:
+                duplicates.append(name)
+            self.index[name] = i
+        if duplicates:
+            raise ValueError(f"Duplicate activity names: {', '.join(sorted(set(duplicates)))}")
+
+        n = len(activities)
+        self.duration = np.array([a.duration for a in activities], dtype=np.int64)
+        self.predecessors: List[List[int]] = [[] for _ in range(n)]
+        self.successors: List[List[int]] = [[] for _ in range(n)]
+        unknown = []
+        for i, a in enumerate(activities):
+            for pred in dict.fromkeys(a.predecessors):  # 去重并保持顺序
+                p = self.index.get(pred)
+                if p is None:
+                    unknown.append(f"{a.name} <- {pred}")
+                    continue
+                self.predecessors[i].append(p)
+                self.successors[p].append(i)
+        if unknown:
+            raise ValueError(f"Unknown predecessors: {', '.join(unknown)}")
+
+        self.order = self._topological_order()
+        self.edge_src = np.array([p for i in range(n) for p in self.predecessors[i]], dtype=np.int64)
+        self.edge_dst = np.array([i for i in range(n) for _ in self.predecessors[i]], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _topological_order(self) -> List[int]:
+        """
+        Kahn 算法求拓扑序；存在循环依赖时找出其中一个环并报错
+        """
+        indegree = [len(p) for p in self.predecessors]
+        queue = deque(i for i, d in enumerate(indegree) if d == 0)
+        order = []
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+            for s in self.successors[i]:
+                indegree[s] -= 1
+                if indegree[s] == 0:
+                    queue.append(s)
+
+        if len(order) < len(self.names):
+            # 剩余节点都至少有一个剩余前置节点，沿前置节点回溯必然成环
+            remaining = {i for i, d in enumerate(indegree) if d > 0}
+            node, seen = next(iter(remaining)), {}
+            while node not in seen:
+                seen[node] = len(seen)
+                node = next(p for p in self.predecessors[node] if p in remaining)
+            cycle = [node] + list(seen)[seen[node]:][::-1]
+            raise ValueError(f"Cyclic dependency: {' -> '.join(self.names[i] for i in cycle)}")
+        return order
+
+    def earliest_starts(self) -> np.ndarray:
+        """
+        前推计算最早开始时间 ES（无前置活动的 ES 为 1）
+        """
+        duration = self.duration.tolist()
+        es = [1] * len(self.names)
+        for i in self.order:
+            finish = es[i] + duration[i]
+            for s in self.successors[i]:
+                if finish > es[s]:
+                    es[s] = finish
+        return np.array(es, dtype=np.int64)
+
+    def latest_finishes(self, project_end: int) -> np.ndarray:
+        """
+        逆推计算最迟完成时间 LF（无后继活动的 LF 为 project_end）
+        """
+        duration = self.duration.tolist()
+        lf = [project_end] * len(self.names)
+        for i in reversed(self.order):
+            start = lf[i] - duration[i]  # = LS - 1
+            for p in self.predecessors[i]:
+                if start < lf[p]:
+                    lf[p] = start
+        return np.array(lf, dtype=np.int64)
+
+    def critical_path(self) -> dict:
+        """
+        关键路径法：计算 ES/EF/LS/LF、总时差与自由时差
+
+        Returns:
+            dict: es, ef, ls, lf, total_float, free_float（均为 np.ndarray）以及 project_end
+        """
+        es = self.earliest_starts()
+        ef = es + self.duration - 1
+        project_end = int(ef.max()) if len(ef) else 0
+        lf = self.latest_finishes(project_end)
+        ls = lf - self.duration + 1
+
+        # 自由时差：不推迟任何后继活动最早开始的前提下可推迟的天数
+        next_start = np.full(len(es), project_end + 1, dtype=np.int64)
+        np.minimum.at(next_start, self.edge_src, es[self.edge_dst])
+        return {
+            "es": es,
+            "ef": ef,
+            "ls": ls,
+            "lf": lf,
+            "total_float": ls - es,
+            "free_float": next_start - ef - 1,
+            "project_end": project_end
+        }
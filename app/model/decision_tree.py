@@ -1,10 +1,18 @@
 from anytree import NodeMixin
 from typing import Optional, List
 from itertools import product
-from copy import deepcopy
 import numpy as np
 from collections import Counter
 
+from app.model.compiled_tree import CompiledTree, DECISION, compile_tree
+from app.model.distributions import validate_distribution, inverse_cdf, correlation_factor, copula_uniforms
+
+# 蒙特卡洛模拟按固定大小分块，每块一个子种子，可分发到不同进程；单次请求的模拟次数上限
+MONTE_CARLO_BLOCK_SIZE = 250000
+MAX_MONTE_CARLO_RUNS = 10000000
+# 每个样本摘要保留的等宽区间数
+SKETCH_BINS = 4096
+
 class DecisionNode(NodeMixin):
     """
     决策树节点类，继承 anytree 的 NodeMixin 支持树结构
@@ -39,13 +47,15 @@ class DecisionNode(NodeMixin):
         else:
             return max(c.expected_value() for c in self.children)
 
-def build_tree(data: dict, parent=None) -> DecisionNode:
+def build_tree(data: dict, parent=None, path: tuple = (), path_index: Optional[dict] = None) -> DecisionNode:
     """
-    递归构建决策树结构
+    递归构建决策树结构，同时在根节点上建立 path_index（路径元组 -> 节点）
 
     Args:
         data (dict): 输入的嵌套字典结构，符合 TreeNodeInput 格式
         parent (DecisionNode): 父节点引用（递归用）
+        path (tuple): 当前节点的路径（递归用）
+        path_index (dict): 路径索引（递归用）
 
     Returns:
         DecisionNode: 构建完成的树根节点
@@ -56,41 +66,90 @@ def build_tree(data: dict, parent=None) -> DecisionNode:
         probability=data.get("probability"),
         parent=parent
     )
+    if path_index is None:
+        path_index = {}
+        node.path_index = path_index
+    path_index[path] = node
 
     children_data = data.get("children") or []
+    names = [child_data["name"] for child_data in children_data]
+    duplicates = sorted({name for name in names if names.count(name) > 1}) if len(set(names)) < len(names) else []
+    if duplicates:
+        raise ValueError(f"Duplicate sibling names at: {', '.join(' -> '.join(path + (n,)) for n in duplicates)}")
     for child_data in children_data:
-        build_tree(child_data, parent=node)
+        build_tree(child_data, parent=node, path=path + (child_data["name"],), path_index=path_index)
 
     return node
 
-def export_tree_with_ev(node):
+def export_tree_with_ev(tree: CompiledTree, ev: Optional[np.ndarray] = None):
     """
     导出当前决策树为嵌套 JSON，包括每个节点的期望值（ev）
 
     Args:
-        node (DecisionNode): 决策树根节点
+        tree (CompiledTree): 编译后的决策树
+        ev (np.ndarray): 可选，已算好的各节点期望值，缺省时一次性计算
 
     Returns:
         dict: 可序列化的 JSON 树结构，包含每个节点的 ev、value、probability 等信息
     """
-    result = {
-        "name": node.name,
-        "ev": node.expected_value()
-    }
-    if node.value is not None:
-        result["value"] = node.value
-    if node.probability is not None:
-        result["probability"] = node.probability
+    if ev is None:
+        tree.check_values()
+        ev = tree.expected_values()
+    evs = ev.tolist()
+    values = tree.value.tolist()
+    probabilities = tree.probability.tolist()
+    has_value = (~np.isnan(tree.value)).tolist()
+    has_probability = (~np.isnan(tree.probability)).tolist()
+    parents = tree.parent.tolist()
+
+    # BFS 顺序下父节点总是先于子节点生成，无需递归
+    nodes = []
+    for i, name in enumerate(tree.names):
+        result = {"name": name, "ev": evs[i]}
+        if has_value[i]:
+            result["value"] = values[i]
+        if has_probability[i]:
+            result["probability"] = probabilities[i]
+        nodes.append(result)
+        if parents[i] >= 0:
+            nodes[parents[i]].setdefault("children", []).append(result)
+
+    return nodes[0]
+
+def evaluate_tree(tree_data) -> dict:
+    """
+    计算决策树每个子路径的期望值，返回完整决策树及最优方案
 
-    if node.children:
-        result["children"] = [export_tree_with_ev(child) for child in node.children]
+    Returns:
+        dict: branch_expected_values, optimal_expected_value, tree_with_ev
+    """
+    tree = as_compiled(tree_data)
+    tree.check_values()
+    ev = tree.expected_values()
+    results = {}
+    for child in tree.children(0):
+        results[tree.names[child]] = float(ev[child])
+
+    return {
+        "branch_expected_values": results,
+        "optimal_expected_value": float(ev[0]),
+        "tree_with_ev": export_tree_with_ev(tree, ev)
+    }
 
-    return result
 
 def find_node_by_path(node, path):
     """
     根据路径（列表）找到目标子节点，例如 ["Dev A", "A Success"]
+
+    build_tree 构建的根节点带有 path_index，可直接查表；否则逐层查找
     """
+    path_index = getattr(node, "path_index", None)
+    if path_index is not None:
+        current = path_index.get(tuple(path))
+        if current is None:
+            raise ValueError(f"Node path {' -> '.join(path)} not found.")
+        return current
+
     current = node
     for name in path:
         current = next((child for child in current.children if child.name == name), None)
@@ -99,10 +158,32 @@ def find_node_by_path(node, path):
     return current
 
 
+def sweep_values(value_range: dict) -> np.ndarray:
+    """
+    根据 start/end/step 生成扫描点（包含结束值）
+
+    Args:
+        value_range (dict): 浮动范围，包括 start/end/step
+
+    Returns:
+        np.ndarray: 所有扫描点
+    """
+    start = value_range["start"]
+    end = value_range["end"]
+    step = value_range["step"]
+    if step <= 0:
+        raise ValueError("Range step must be positive.")
+
+    count = int(np.floor((end - start) / step + 1e-8)) + 1  # 保证包含结束值
+    return start + step * np.arange(max(count, 0))
+
+
 def sensitivity_analysis(tree_data, target_path, field, value_range):
     """
     对指定路径的字段做敏感性分析
 
+    树只编译一次，目标节点只查找一次，所有扫描点作为一个向量沿祖先路径批量计算
+
     Args:
         tree_data (dict): 原始树结构
         target_path (List[str]): 节点路径（从根到目标）
@@ -112,22 +193,17 @@ def sensitivity_analysis(tree_data, target_path, field, value_range):
     Returns:
         List[Dict]: 每个值对应的 EV
     """
-    results = []
-    start = value_range["start"]
-    end = value_range["end"]
-    step = value_range["step"]
-
-    val = start
-    while val <= end + 1e-8:  # 保证包含结束值
-        tree_copy = build_tree(tree_data)  # 每次构建新树
-        target_node = find_node_by_path(tree_copy, target_path)
-        setattr(target_node, field, val)  # 设置字段
+    tree = as_compiled(tree_data)
+    target = tree.find_index(target_path)
+    inputs = sweep_values(value_range)
+
+    evs = np.broadcast_to(tree.evaluate_overrides([(target, field, inputs)]), inputs.shape)
+    return [
+        {"input_value": x, "ev": y}
+        for x, y in zip(np.round(inputs, 3).tolist(), np.round(evs, 3).tolist())
+    ]
 
-        ev = tree_copy.expected_value()
-        results.append({"input_value": round(val, 3), "ev": round(ev, 3)})
-        val += step
 
-    return results
 def format_for_chart(results: list):
     """
     格式化敏感性分析结果以兼容前端图表（ECharts/D3）
@@ -148,6 +224,108 @@ def format_for_chart(results: list):
 
 
 
+def as_compiled(tree_data) -> CompiledTree:
+    """
+    接受嵌套字典或已编译的树，统一返回 CompiledTree
+    """
+    return tree_data if isinstance(tree_data, CompiledTree) else compile_tree(tree_data)
+
+
+def sensitivity_axes(fields: list) -> List[np.ndarray]:
+    """
+    各字段的扫描点：优先使用显式给出的 values，否则由 range 生成
+    """
+    return [
+        np.round(np.asarray(f["values"], dtype=float) if "values" in f else sweep_values(f["range"]), 5)
+        for f in fields
+    ]
+
+
+def build_sensitivity_grid(tree_data, fields: list, with_regions=False):
+    """
+    多字段敏感性分析：把每个字段的扫描点放在独立的数组维度上，整张网格一次广播计算
+
+    Args:
+        tree_data (dict): 原始树结构
+        fields (list): 每个字段含 target_path, field, range（或显式的 values）
+        with_regions (bool): 是否同时计算根决策节点在每个网格点上的最优分支
+
+    Returns:
+        dict: labels（各轴标签）, axes（各轴取值）, ev（根节点 EV 网格）,
+              branches（参与比较的根分支名称）, best（每个网格点最优分支在 branches 中的下标）
+    """
+    tree = as_compiled(tree_data)
+    base_ev = tree.expected_values()
+
+    axes = sensitivity_axes(fields)
+    labels, overrides = [], []
+    for axis, (f, values) in enumerate(zip(fields, axes)):
+        shape = [1] * len(fields)
+        shape[axis] = len(values)
+        overrides.append((tree.find_index(f["target_path"]), f["field"], values.reshape(shape)))
+        labels.append(" → ".join(f["target_path"]))
+
+    grid_shape = tuple(len(values) for values in axes)
+    node_ev = tree.recompute_ancestors(overrides, base_ev)
+    ev = np.ascontiguousarray(np.broadcast_to(node_ev.get(0, base_ev[0]), grid_shape))
+
+    branches, best = None, None
+    if with_regions and tree.kind[0] == DECISION:
+        # 受影响分支各自一张 EV 网格，未受影响分支只需保留其中最大的常数
+        candidates = [c for c in tree.children(0) if c in node_ev]
+        static = [c for c in tree.children(0) if c not in node_ev]
+        if static:
+            candidates.append(max(static, key=lambda c: base_ev[c]))
+        stacked = np.stack([np.broadcast_to(node_ev.get(c, base_ev[c]), grid_shape) for c in candidates])
+        branches = [tree.names[c] for c in candidates]
+        best = np.argmax(stacked, axis=0)
+
+    return {"labels": labels, "axes": axes, "ev": ev, "branches": branches, "best": best}
+
+
+def split_sensitivity_fields(fields: list, parts: int) -> List[list]:
+    """
+    沿第一个字段的扫描点把网格切成至多 parts 份，便于并行计算后用 merge_sensitivity_grids 合并
+    """
+    if not fields or parts <= 1:
+        return [fields]
+    first = sensitivity_axes(fields[:1])[0]
+    return [
+        [dict(fields[0], values=piece.tolist())] + fields[1:]
+        for piece in np.array_split(first, min(parts, len(first))) if len(piece)
+    ] or [fields]
+
+
+def merge_sensitivity_grids(grids: List[dict]) -> dict:
+    """
+    把沿第一轴切分计算的网格按顺序拼接回完整网格
+    """
+    if len(grids) == 1:
+        return grids[0]
+    first = grids[0]
+    return {
+        "labels": first["labels"],
+        "axes": [np.concatenate([g["axes"][0] for g in grids])] + first["axes"][1:],
+        "ev": np.concatenate([g["ev"] for g in grids], axis=0),
+        "branches": first["branches"],
+        "best": None if first["best"] is None else np.concatenate([g["best"] for g in grids], axis=0)
+    }
+
+
+def iter_sensitivity_rows(grid: dict, chunk_size=65536):
+    """
+    按 itertools.product 的顺序逐行生成网格结果：{"inputs": {...}, "ev": ...}；
+    EV 每次只取 chunk_size 个舍入并转成 Python 数值，流式输出时内存不随网格大小增长
+    """
+    labels = grid["labels"]
+    combos = product(*(axis.tolist() for axis in grid["axes"]))
+    flat = grid["ev"].reshape(-1)
+    for start in range(0, flat.size, chunk_size):
+        # 本块 EV 放在 zip 的第一位：块用完时不会多取走一个组合
+        for ev, values in zip(np.round(flat[start:start + chunk_size], 3).tolist(), combos):
+            yield {"inputs": dict(zip(labels, values)), "ev": ev}
+
+
 def multi_sensitivity_analysis(tree_data, fields: list):
     """
     多字段敏感性分析：生成所有组合，修改节点值并计算 EV
@@ -159,65 +337,115 @@ def multi_sensitivity_analysis(tree_data, fields: list):
     Returns:
         list: 每组组合对应的输入值 + EV
     """
-    # 构建所有输入组合
-    input_axes = []
-    axis_labels = []
-
-    for f in fields:
-        r = f["range"]
-        steps = [round(r["start"] + i * r["step"], 5)
-                 for i in range(int((r["end"] - r["start"]) / r["step"]) + 1)]
-        input_axes.append(steps)
-        label = " → ".join(f["target_path"])
-        axis_labels.append(label)
-
-    results = []
-    for values in product(*input_axes):
-        tree_copy = build_tree(deepcopy(tree_data))  # 拷贝构建
-        for f, val in zip(fields, values):
-            node = find_node_by_path(tree_copy, f["target_path"])
-            setattr(node, f["field"], val)
-
-        results.append({
-            "inputs": dict(zip(axis_labels, values)),
-            "ev": round(tree_copy.expected_value(), 3)
-        })
+    return list(iter_sensitivity_rows(build_sensitivity_grid(tree_data, fields)))
 
-    return results
-def monte_carlo_simulation(tree_data, target_path, field, distribution, params, runs=1000, bins=10):
+
+def format_dense_grid(grid: dict, fields: list):
     """
-    执行蒙特卡洛模拟：对指定节点的某个字段值做随机采样，重复模拟期望值
+    以稠密 ndarray 形式返回网格：ev[i][j]... 对应各轴第 i、j... 个取值
+    """
+    return {
+        "axes": [
+            {"label": label, "field": f["field"], "values": axis.tolist()}
+            for label, f, axis in zip(grid["labels"], fields, grid["axes"])
+        ],
+        "shape": list(grid["ev"].shape),
+        "ev_grid": np.round(grid["ev"], 3).tolist()
+    }
+
+
+def summarize_grid(grid: dict, fields: list):
+    """
+    把网格压缩为摘要：EV 上下界及对应输入，以及根决策节点各分支成为最优方案的区域
 
     Returns:
-        dict: 含统计摘要 + EV分布数组 + 直方图数据
+        dict: axes（各轴范围）, ev_bounds, optimal_regions（网格未计算最优分支时为 None）
     """
-    ev_results = []
+    labels, axes, ev = grid["labels"], grid["axes"], grid["ev"]
+
+    def inputs_at(flat_index):
+        position = np.unravel_index(flat_index, ev.shape)
+        return {label: float(axis[i]) for label, axis, i in zip(labels, axes, position)}
+
+    summary = {
+        "axes": [
+            {"label": label, "field": f["field"], "start": float(axis[0]), "end": float(axis[-1]), "steps": len(axis)}
+            for label, f, axis in zip(labels, fields, axes) if len(axis)
+        ],
+        "shape": list(ev.shape),
+        "ev_bounds": None,
+        "optimal_regions": None
+    }
+    if ev.size == 0:
+        return summary
 
-    for _ in range(runs):
-        tree = build_tree(tree_data)
-        node = find_node_by_path(tree, target_path)
+    low, high = int(np.argmin(ev)), int(np.argmax(ev))
+    summary["ev_bounds"] = {
+        "min": {"ev": round(float(ev.flat[low]), 3), "inputs": inputs_at(low)},
+        "max": {"ev": round(float(ev.flat[high]), 3), "inputs": inputs_at(high)}
+    }
 
-        # 抽样设置字段
-        if distribution == "normal":
-            value = np.random.normal(params["mean"], params["stddev"])
-        elif distribution == "uniform":
-            value = np.random.uniform(params["low"], params["high"])
-        else:
-            raise ValueError("Unsupported distribution type")
+    if grid["best"] is None:
+        return summary
+
+    regions = []
+    for k, name in enumerate(grid["branches"]):
+        mask = grid["best"] == k
+        count = int(mask.sum())
+        if not count:
+            continue
+        bounds = {}
+        for axis_index, (label, axis) in enumerate(zip(labels, axes)):
+            other = tuple(i for i in range(ev.ndim) if i != axis_index)
+            hit = axis[mask.any(axis=other)]
+            bounds[label] = [float(hit.min()), float(hit.max())]
+        regions.append({
+            "branch": name,
+            "count": count,
+            "share": round(count / ev.size, 4),
+            "input_bounds": bounds
+        })
+    summary["optimal_regions"] = regions
+    return summary
 
-        setattr(node, field, value)
-        ev_results.append(tree.expected_value())
 
-    mean = np.mean(ev_results)
-    std = np.std(ev_results)
-    min_val = np.min(ev_results)
-    max_val = np.max(ev_results)
+def sample_distribution(rng: np.random.Generator, distribution: str, params: dict, size) -> np.ndarray:
+    """
+    按指定分布一次性抽取 size 个样本
+
+    Args:
+        rng (np.random.Generator): 随机数生成器
+        distribution (str): 分布类型，见 distributions.SUPPORTED_DISTRIBUTIONS
+        params (dict): 分布参数
+        size: 样本数量
+
+    Returns:
+        np.ndarray: 样本数组
+    """
+    if distribution == "normal":
+        return rng.normal(params["mean"], params["stddev"], size=size)
+    elif distribution == "uniform":
+        return rng.uniform(params["low"], params["high"], size=size)
+    else:
+        validate_distribution(distribution, params)
+        return inverse_cdf(distribution, params, copula_uniforms(rng, None, size, 1)[:, 0])
+
+
+def summarize_samples(samples: np.ndarray, bins=10) -> dict:
+    """
+    统计样本的均值、标准差、极值，并生成直方图数据（用于前端绘图）
+    """
+    counts, bin_edges = np.histogram(samples, bins=bins)
+    return format_summary(np.mean(samples), np.std(samples), np.min(samples), np.max(samples), counts, bin_edges)
 
-    # 直方图数据（用于前端绘图）
-    counts, bin_edges = np.histogram(ev_results, bins=bins)
+
+def format_summary(mean, stddev, minimum, maximum, counts, bin_edges) -> dict:
+    """
+    把统计量和直方图整理为前端使用的结构（summarize_samples 与可合并的样本摘要共用）
+    """
     histogram = [
         {
-            "range": f"{round(bin_edges[i], 1)} - {round(bin_edges[i+1], 1)}",
+            "range": f"{round(float(bin_edges[i]), 1)} - {round(float(bin_edges[i+1]), 1)}",
             "count": int(counts[i])
         }
         for i in range(len(counts))
@@ -225,11 +453,333 @@ def monte_carlo_simulation(tree_data, target_path, field, distribution, params,
 
     return {
         "summary": {
-            "mean": round(mean, 3),
-            "stddev": round(std, 3),
-            "min": round(min_val, 3),
-            "max": round(max_val, 3)
+            "mean": round(float(mean), 3),
+            "stddev": round(float(stddev), 3),
+            "min": round(float(minimum), 3),
+            "max": round(float(maximum), 3)
         },
-        "histogram": histogram,
-        "raw_ev_samples": [round(x, 3) for x in ev_results]
-    }
\ No newline at end of file
+        "histogram": histogram
+    }
+
+
+class SampleSketch:
+    """
+    固定大小、可合并的样本摘要：蒙特卡洛各块只传递摘要，不传递或拼接原始样本
+
+    个数、均值、M2（按 Chan 公式合并）、极值和负值个数是精确的；在 [min, max] 上等宽划分的
+    SKETCH_BINS 个区间各自记录样本数和样本和，分位数和尾部均值由分段线性的累计量插值得到，
+    误差不超过一个区间宽度 (max - min) / SKETCH_BINS。
+    """
+
+    def __init__(self, count: int, mean: float, m2: float, minimum: float, maximum: float, negative: int,
+                 counts: np.ndarray, sums: np.ndarray):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+        self.negative = negative
+        self.counts = counts
+        self.sums = sums
+
+    @classmethod
+    def from_samples(cls, values: np.ndarray, size: int = SKETCH_BINS) -> Optional["SampleSketch"]:
+        """
+        由样本数组生成摘要；空样本返回 None
+        """
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return None
+        lo, hi = float(values.min()), float(values.max())
+        if hi > lo:
+            index = np.minimum(((values - lo) * (size / (hi - lo))).astype(np.int64), size - 1)
+        else:
+            index = np.zeros(len(values), dtype=np.int64)
+        mean = float(values.mean())
+        return cls(len(values), mean, float(np.square(values - mean).sum()), lo, hi, int((values < 0).sum()),
+                   np.bincount(index, minlength=size).astype(float), np.bincount(index, values, size))
+
+    @classmethod
+    def merge(cls, sketches: List[Optional["SampleSketch"]], size: int = SKETCH_BINS) -> Optional["SampleSketch"]:
+        """
+        合并多个摘要，直方图覆盖合并后的 [min, max]；跳过空摘要（None）
+        """
+        sketches = [sketch for sketch in sketches if sketch is not None]
+        if len(sketches) <= 1:
+            return sketches[0] if sketches else None
+        count = sum(sketch.count for sketch in sketches)
+        mean = sum(sketch.count * sketch.mean for sketch in sketches) / count
+        m2 = sum(sketch.m2 + sketch.count * (sketch.mean - mean) ** 2 for sketch in sketches)
+        lo, hi = min(sketch.min for sketch in sketches), max(sketch.max for sketch in sketches)
+        counts, sums = np.zeros(size), np.zeros(size)
+        if hi > lo:
+            edges = np.linspace(lo, hi, size + 1)
+            cumulative = [sketch.cumulative(edges) for sketch in sketches]
+            cum_counts = np.sum([c for c, _ in cumulative], axis=0)
+            cum_sums = np.sum([s for _, s in cumulative], axis=0)
+            # 等于整体最小值的样本归入第一个区间
+            cum_counts[0] = cum_sums[0] = 0
+            counts, sums = np.diff(cum_counts), np.diff(cum_sums)
+        else:
+            counts[0], sums[0] = count, count * lo
+        return cls(count, mean, m2, lo, hi, sum(sketch.negative for sketch in sketches), counts, sums)
+
+    def _edges(self) -> np.ndarray:
+        return np.linspace(self.min, self.max, len(self.counts) + 1)
+
+    def cumulative(self, x) -> tuple:
+        """
+        不超过 x 的样本 (个数, 和)
+        """
+        x = np.asarray(x, dtype=float)
+        if self.max > self.min:
+            edges = self._edges()
+            return (np.interp(x, edges, np.concatenate(([0.0], np.cumsum(self.counts)))),
+                    np.interp(x, edges, np.concatenate(([0.0], np.cumsum(self.sums)))))
+        reached = x >= self.min
+        return np.where(reached, float(self.count), 0.0), np.where(reached, self.count * self.min, 0.0)
+
+    def quantile(self, q) -> np.ndarray:
+        """
+        q 为 [0, 1] 内的概率
+        """
+        q = np.asarray(q, dtype=float)
+        if self.max == self.min:
+            return np.full(q.shape, self.min)
+        return np.interp(q * self.count, np.concatenate(([0.0], np.cumsum(self.counts))), self._edges())
+
+    def tail_mean(self, threshold: float) -> float:
+        """
+        不超过 threshold 的样本均值
+        """
+        count, total = self.cumulative(threshold)
+        return float(total / count) if count > 0 else self.min
+
+    def summary(self, bins: int = 10) -> dict:
+        """
+        与 summarize_samples 结构相同：均值 / 标准差 / 极值和 bins 个区间的直方图
+        """
+        if self.max > self.min:
+            edges = np.linspace(self.min, self.max, bins + 1)
+            cum_counts = self.cumulative(edges)[0]
+            cum_counts[0] = 0
+            raw = np.diff(cum_counts)
+            # 取整后各区间计数之和仍等于样本数（余数大的区间优先加一）
+            counts = np.floor(raw + 1e-9).astype(np.int64)
+            counts[np.argsort(counts - raw)[:max(self.count - int(counts.sum()), 0)]] += 1
+        else:
+            # 常数样本，按 np.histogram 的方式分箱
+            edges = np.linspace(self.min - 0.5, self.min + 0.5, bins + 1)
+            counts = np.zeros(bins, dtype=np.int64)
+            counts[min(bins // 2, bins - 1)] = self.count
+        return format_summary(self.mean, np.sqrt(self.m2 / self.count), self.min, self.max, counts, edges)
+
+
+def monte_carlo_blocks(runs: int, seed=None, block_size=MONTE_CARLO_BLOCK_SIZE) -> List[tuple]:
+    """
+    把模拟次数划分为固定大小的块，每块使用由 seed 派生的独立子种子
+
+    划分只取决于 runs 和 seed，因此串行、分块流式或多进程并行得到的样本完全一致。
+
+    Returns:
+        List[tuple]: (本块模拟次数, 本块种子) 列表
+    """
+    if isinstance(runs, bool) or not isinstance(runs, (int, np.integer)):
+        raise ValueError("runs must be an integer.")
+    if not 0 < runs <= MAX_MONTE_CARLO_RUNS:
+        raise ValueError(f"runs must be within [1, {MAX_MONTE_CARLO_RUNS}].")
+    count = -(-runs // block_size)
+    if count == 1:
+        return [(runs, seed)]
+    seeds = np.random.SeedSequence(seed).spawn(count)
+    return [(min(block_size, runs - i * block_size), s) for i, s in enumerate(seeds)]
+
+
+def monte_carlo_chunks(tree_data, target_path, field, distribution, params, runs=1000, seed=None, chunk_size=100000):
+    """
+    蒙特卡洛模拟的分块生成器：树的编译、路径查找和参数校验立即完成，
+    之后每次迭代抽取至多 chunk_size 个样本并返回对应的 EV 数组
+
+    同一种子下分块结果拼接后与 monte_carlo_simulation 完全一致。
+
+    Returns:
+        Iterator[np.ndarray]: 依次产生每块的 EV 数组
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive.")
+    blocks = monte_carlo_blocks(runs, seed)
+    tree = as_compiled(tree_data)
+    target = tree.find_index(target_path)
+    base_ev = tree.expected_values()
+    if distribution not in ("normal", "uniform"):
+        validate_distribution(distribution, params)
+
+    def generate():
+        for block_runs, block_seed in blocks:
+            # 每块独立的 Generator，线程、进程间互不干扰
+            rng = np.random.default_rng(block_seed)
+            for start in range(0, block_runs, chunk_size):
+                size = min(chunk_size, block_runs - start)
+                samples = sample_distribution(rng, distribution, params, size)
+                yield np.broadcast_to(tree.evaluate_overrides([(target, field, samples)], base_ev), (size,))
+
+    return generate()
+
+
+def monte_carlo_block(tree_data, target_path, field, distribution, params, runs, seed=None) -> np.ndarray:
+    """
+    计算 monte_carlo_blocks 划分出的一块，返回该块的 EV 样本（可在子进程中执行）
+    """
+    return np.concatenate(list(monte_carlo_chunks(tree_data, target_path, field, distribution, params, runs, seed)))
+
+
+def merge_monte_carlo(blocks: List[np.ndarray], bins=10) -> dict:
+    """
+    按顺序合并各块的 EV 样本，返回统计摘要 + EV分布数组 + 直方图数据
+    """
+    ev_results = np.concatenate(blocks)
+    result = summarize_samples(ev_results, bins)
+    result["raw_ev_samples"] = np.round(ev_results, 3).tolist()
+    return result
+
+
+def monte_carlo_simulation(tree_data, target_path, field, distribution, params, runs=1000, bins=10, seed=None):
+    """
+    执行蒙特卡洛模拟：对指定节点的某个字段值做随机采样，重复模拟期望值
+
+    样本按块抽取为数组，整批沿祖先路径计算，统计量用数组归约完成
+
+    Args:
+        seed (int): 可选，随机种子；相同种子得到相同结果
+
+    Returns:
+        dict: 含统计摘要 + EV分布数组 + 直方图数据
+    """
+    tree = as_compiled(tree_data)
+    blocks = [
+        monte_carlo_block(tree, target_path, field, distribution, params, block_runs, block_seed)
+        for block_runs, block_seed in monte_carlo_blocks(runs, seed)
+    ]
+    return merge_monte_carlo(blocks, bins)
+
+
+def multi_monte_carlo_block(tree_data, inputs: list, correlation=None, runs=10000, seed=None, chunk_size=100000) -> dict:
+    """
+    多变量蒙特卡洛模拟的一块：按 chunk_size 分块抽样计算，返回固定大小的 EV 样本摘要和 tornado 所需的累加量，
+    块间传递和合并的数据量与模拟次数无关
+
+    Returns:
+        dict: ev（EV 样本的 SampleSketch）, sums（形状 (7, 输入个数)：Σx, Σx², Σxy, 低/高十分位 EV 之和与计数）
+    """
+    if not inputs:
+        raise ValueError("At least one input is required.")
+    if runs <= 0 or chunk_size <= 0:
+        raise ValueError("runs and chunk_size must be positive.")
+
+    tree = as_compiled(tree_data)
+    base_ev = tree.expected_values()
+    targets = []
+    for item in inputs:
+        validate_distribution(item["distribution"], item["params"])
+        targets.append(tree.find_index(item["target_path"]))
+    factor = correlation_factor(correlation, len(inputs))
+
+    rng = np.random.default_rng(seed)
+    k = len(inputs)
+    ev_results = np.empty(runs)
+    sum_x, sum_xx, sum_xy, low_sum, low_count, high_sum, high_count = np.zeros((7, k))
+
+    for start in range(0, runs, chunk_size):
+        size = min(chunk_size, runs - start)
+        u = copula_uniforms(rng, factor, size, k)
+        samples = np.column_stack([
+            inverse_cdf(item["distribution"], item["params"], u[:, j]) for j, item in enumerate(inputs)
+        ])
+        overrides = [(target, item["field"], samples[:, j]) for j, (target, item) in enumerate(zip(targets, inputs))]
+        ev = np.broadcast_to(tree.evaluate_overrides(overrides, base_ev), (size,))
+        ev_results[start:start + size] = ev
+
+        sum_x += samples.sum(axis=0)
+        sum_xx += (samples ** 2).sum(axis=0)
+        sum_xy += ev @ samples
+        low, high = u < 0.1, u > 0.9
+        low_sum += ev @ low
+        low_count += low.sum(axis=0)
+        high_sum += ev @ high
+        high_count += high.sum(axis=0)
+
+    return {"ev": SampleSketch.from_samples(ev_results), "sums": np.stack([sum_x, sum_xx, sum_xy, low_sum, low_count, high_sum, high_count])}
+
+
+def merge_multi_monte_carlo(inputs: list, blocks: List[dict], bins=10, percentiles=(5, 25, 50, 75, 95)) -> dict:
+    """
+    合并多变量蒙特卡洛各块的结果，计算统计摘要、百分位和各输入的方差贡献（tornado）；
+    直方图和百分位取自合并后的样本摘要，误差不超过一个摘要区间
+    """
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise ValueError("percentiles must be within [0, 100].")
+    ev = SampleSketch.merge([block["ev"] for block in blocks])
+    sum_x, sum_xx, sum_xy, low_sum, low_count, high_sum, high_count = sum(block["sums"] for block in blocks)
+    runs = ev.count
+    k = len(inputs)
+
+    ev_mean = ev.mean
+    ev_var = ev.m2 / runs
+    x_mean = sum_x / runs
+    x_var = sum_xx / runs - x_mean ** 2
+    cov = sum_xy / runs - x_mean * ev_mean
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.where((x_var > 0) & (ev_var > 0), cov / np.sqrt(x_var * ev_var), 0.0)
+        low_ev = np.where(low_count > 0, low_sum / low_count, ev_mean)
+        high_ev = np.where(high_count > 0, high_sum / high_count, ev_mean)
+    r2 = corr ** 2
+    share = r2 / r2.sum() if r2.sum() > 0 else np.zeros(k)
+
+    attribution = [
+        {
+            "input": " → ".join(item["target_path"]) + f" ({item['field']})",
+            "correlation": round(float(corr[j]), 4),
+            "variance_share": round(float(share[j]), 4),
+            "ev_low": round(float(low_ev[j]), 3),
+            "ev_high": round(float(high_ev[j]), 3),
+            "swing": round(float(abs(high_ev[j] - low_ev[j])), 3)
+        }
+        for j, item in enumerate(inputs)
+    ]
+    attribution.sort(key=lambda x: x["swing"], reverse=True)
+
+    result = ev.summary(bins)
+    result["percentiles"] = {
+        f"p{p:g}": round(float(v), 3) for p, v in zip(percentiles, ev.quantile(np.asarray(percentiles) / 100))
+    }
+    result["tornado"] = attribution
+    return result
+
+
+def multi_monte_carlo_simulation(tree_data, inputs: list, correlation=None, runs=10000, bins=10,
+                                 percentiles=(5, 25, 50, 75, 95), chunk_size=100000, seed=None):
+    """
+    多变量蒙特卡洛模拟：同时对多个节点字段按各自分布抽样，可选高斯 Copula 相关结构
+
+    样本按 chunk_size 分块抽取和计算，中间数组大小与总次数无关；
+    每个输入的方差贡献（tornado）在同一遍计算中累加得到。
+
+    Args:
+        tree_data (dict): 原始树结构
+        inputs (list): 每个输入含 target_path, field, distribution, params
+        correlation (List[List[float]]): 可选，输入之间的相关系数矩阵
+        runs (int): 模拟次数
+        bins (int): 直方图分箱数
+        percentiles (list): 需要返回的 EV 百分位
+        chunk_size (int): 每块模拟次数
+        seed (int): 可选，随机种子
+
+    Returns:
+        dict: 统计摘要 + 直方图 + 百分位 + 各输入的方差贡献
+    """
+    tree = as_compiled(tree_data)
+    blocks = [
+        multi_monte_carlo_block(tree, inputs, correlation, block_runs, block_seed, chunk_size)
+        for block_runs, block_seed in monte_carlo_blocks(runs, seed)
+    ]
+    return merge_multi_monte_carlo(inputs, blocks, bins, percentiles)
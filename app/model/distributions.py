@@ -0,0 +1,111 @@
+from typing import List, Optional
+
+import numpy as np
+
+SUPPORTED_DISTRIBUTIONS = ("normal", "uniform", "triangular", "lognormal", "pert", "empirical")
+
+_EPS = 1e-12
+
+
+def validate_distribution(distribution: str, params: dict):
+    """
+    校验分布类型及其参数
+
+    各分布所需参数:
+        normal: mean, stddev
+        uniform: low, high
+        triangular / pert: low, mode, high（pert 可选 lambda，默认 4）
+        lognormal: mean, sigma（对数正态底层正态分布的参数）
+        empirical: values（历史样本）
+    """
+    required = {
+        "normal": ("mean", "stddev"),
+        "uniform": ("low", "high"),
+        "triangular": ("low", "mode", "high"),
+        "lognormal": ("mean", "sigma"),
+        "pert": ("low", "mode", "high"),
+        "empirical": ("values",),
+    }
+    if distribution not in required:
+        raise ValueError("Unsupported distribution type")
+    missing = [k for k in required[distribution] if k not in params]
+    if missing:
+        raise ValueError(f"Distribution '{distribution}' requires params: {', '.join(missing)}")
+    if distribution in ("triangular", "pert"):
+        if not params["low"] <= params["mode"] <= params["high"] or params["low"] == params["high"]:
+            raise ValueError(f"Distribution '{distribution}' requires low <= mode <= high and low < high")
+    if distribution == "empirical" and not params["values"]:
+        raise ValueError("Distribution 'empirical' requires at least one value")
+
+
+def inverse_cdf(distribution: str, params: dict, u: np.ndarray) -> np.ndarray:
+    """
+    分布的逆累积分布函数：把 (0, 1) 上的均匀样本映射为目标分布样本
+
+    Args:
+        distribution (str): 分布类型
+        params (dict): 分布参数
+        u (np.ndarray): (0, 1) 上的均匀样本
+
+    Returns:
+        np.ndarray: 目标分布样本，形状同 u
+    """
+    # scipy.special 导入较慢，只在首次用到时加载，不拖慢服务启动
+    from scipy.special import betaincinv, ndtri
+
+    if distribution == "normal":
+        return params["mean"] + params["stddev"] * ndtri(u)
+    elif distribution == "uniform":
+        return params["low"] + (params["high"] - params["low"]) * u
+    elif distribution == "triangular":
+        a, c, b = params["low"], params["mode"], params["high"]
+        split = (c - a) / (b - a)
+        return np.where(
+            u < split,
+            a + np.sqrt(u * (b - a) * (c - a)),
+            b - np.sqrt((1 - u) * (b - a) * (b - c)),
+        )
+    elif distribution == "lognormal":
+        return np.exp(params["mean"] + params["sigma"] * ndtri(u))
+    elif distribution == "pert":
+        a, m, b = params["low"], params["mode"], params["high"]
+        lam = params.get("lambda", 4)
+        alpha = 1 + lam * (m - a) / (b - a)
+        beta = 1 + lam * (b - m) / (b - a)
+        return a + (b - a) * betaincinv(alpha, beta, u)
+    elif distribution == "empirical":
+        values = np.sort(np.asarray(params["values"], dtype=float))
+        index = np.minimum((u * len(values)).astype(np.int64), len(values) - 1)
+        return values[index]
+    else:
+        raise ValueError("Unsupported distribution type")
+
+
+def correlation_factor(correlation: Optional[List[List[float]]], size: int) -> Optional[np.ndarray]:
+    """
+    校验相关系数矩阵并返回其 Cholesky 因子；未提供时返回 None（各输入独立）
+    """
+    if correlation is None:
+        return None
+    matrix = np.asarray(correlation, dtype=float)
+    if matrix.shape != (size, size):
+        raise ValueError(f"Correlation matrix must be {size}x{size}")
+    if not np.allclose(matrix, matrix.T) or not np.allclose(np.diag(matrix), 1):
+        raise ValueError("Correlation matrix must be symmetric with a unit diagonal")
+    try:
+        return np.linalg.cholesky(matrix)
+    except np.linalg.LinAlgError:
+        raise ValueError("Correlation matrix must be positive definite")
+
+
+def copula_uniforms(rng: np.random.Generator, factor: Optional[np.ndarray], runs: int, size: int) -> np.ndarray:
+    """
+    高斯 Copula 抽样：生成 (runs, size) 的均匀样本，列之间服从给定的相关结构
+    """
+    if factor is None:
+        u = rng.random((runs, size))
+    else:
+        from scipy.special import ndtr
+        u = ndtr(rng.standard_normal((runs, size)) @ factor.T)
+    # 避开 0 和 1，防止逆 CDF 得到无穷大
+    return np.clip(u, _EPS, 1 - _EPS)
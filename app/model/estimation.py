@@ -1,14 +1,22 @@
+from datetime import datetime, timezone
 from typing import Annotated, Optional, Dict, Literal, List, Tuple
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class EstimationBase(SQLModel):
     method: str = Field(index=True)
     size: float = Field(default=50, ge=0)
 
 
 class Estimation(EstimationBase, table=True):
+    __table_args__ = (Index("ix_estimation_method_created_at", "method", "created_at"),)
     id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=utc_now)
     complexity: Optional[str] = Field(default="semi")  # organic/semi/embedded
     experience: Optional[float] = Field(default=3, ge=0)
     effort: Optional[float] = Field(default=None)
@@ -41,7 +49,7 @@ class RegressionCreate(EstimationBase):
     historical_data: list[tuple[float, float]]  # 传入回归模型数据
 
 class EstimationPublic(EstimationBase):
-    id: int
+    id: Optional[int] = None  # None when the record is still in the write-behind queue
     method: str
     effort: float
     time: float
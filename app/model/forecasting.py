@@ -0,0 +1,220 @@
+from itertools import chain, product
+from statistics import NormalDist
+from typing import List, Optional
+
+import numpy as np
+
+FORECAST_MODELS = ("linear", "ses", "holt", "holt_winters")
+
+# smoothing parameters tried for every series when they are not given
+SMOOTHING_GRID = (0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+TREND_GRID = (0.01, 0.05, 0.1, 0.2)
+SEASONAL_GRID = (0.01, 0.05, 0.1, 0.2)
+# upper bound on series x parameter combinations x season slots held in memory at once
+SMOOTHING_CHUNK = 1 << 22
+
+
+def stack_series(series: List[List[float]]) -> tuple:
+    """
+    Stack ragged series into one matrix aligned at their first observation, padded with NaN
+
+    :param series: one list of historical values per series
+    :return: (matrix of shape (series, longest series), lengths)
+    """
+    if not series:
+        raise ValueError("At least one series is required.")
+    lengths = np.fromiter((len(s) for s in series), dtype=np.int64, count=len(series))
+    values = np.full((len(series), int(lengths.max())), np.nan)
+    values[np.arange(values.shape[1]) < lengths[:, None]] = np.fromiter(
+        chain.from_iterable(series), dtype=float, count=int(lengths.sum()))
+    return values, lengths
+
+
+def linear_trend(values: np.ndarray, lengths: np.ndarray, horizon: int, confidence: float = 0.95) -> dict:
+    """
+    Least-squares line y = a + b * t (t = 0, 1, ...) fitted to every series in closed form: the normal-equation
+    sums are reductions over the stacked matrix, so no per-series model object is built.
+    Prediction intervals use the Student t distribution with n - 2 degrees of freedom (NaN when n <= 2);
+    a single observation is forecast flat, as the baseline regression did.
+
+    :param values: stacked series, NaN-padded
+    :param lengths: number of observations per series
+    :param horizon: number of future periods
+    :param confidence: coverage of the prediction intervals
+    :return: forecast, lower, upper (shape (series, horizon)) and sigma (residual standard error)
+    """
+    if lengths.min() < 1:
+        raise ValueError("The linear model needs at least 1 observation per series.")
+    # scipy is slow to import, so it is only loaded by the first linear forecast
+    from scipy.special import stdtrit
+
+    observed = ~np.isnan(values)
+    y = np.where(observed, values, 0)
+    t = np.arange(values.shape[1], dtype=float)
+    n = lengths.astype(float)
+    t_mean = (n - 1) / 2
+    y_mean = y.sum(axis=1) / n
+    s_tt = n * (n * n - 1) / 12  # sum((t - t_mean)^2) for t = 0..n-1
+    s_ty = (y * t).sum(axis=1) - n * t_mean * y_mean
+    slope = np.divide(s_ty, s_tt, out=np.zeros_like(s_tt), where=s_tt > 0)
+    intercept = y_mean - slope * t_mean
+
+    residuals = np.where(observed, y - intercept[:, None] - slope[:, None] * t, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.where(n > 2, np.sqrt((residuals ** 2).sum(axis=1) / (n - 2)), np.nan)
+        future = lengths[:, None] + np.arange(horizon)
+        forecast = intercept[:, None] + slope[:, None] * future
+        spread = stdtrit(n - 2, (1 + confidence) / 2)[:, None] * sigma[:, None] * np.sqrt(
+            1 + 1 / n[:, None] + (future - t_mean[:, None]) ** 2 / s_tt[:, None])
+    return {"forecast": forecast, "lower": forecast - spread, "upper": forecast + spread, "sigma": sigma}
+
+
+def _parameter_grid(model: str, alpha: Optional[float], beta: Optional[float], gamma: Optional[float]) -> np.ndarray:
+    """
+    Candidate (alpha, beta, gamma) rows; a given parameter is fixed, a missing one is searched on its grid.
+    beta <= alpha and gamma <= 1 - alpha keep the additive error-correction form stable.
+    """
+    alphas = [alpha] if alpha is not None else SMOOTHING_GRID
+    betas = [0.0] if model == "ses" else [beta] if beta is not None else TREND_GRID
+    gammas = [0.0] if model != "holt_winters" else [gamma] if gamma is not None else SEASONAL_GRID
+    grid = [(a, b, g) for a, b, g in product(alphas, betas, gammas)
+            if (b <= a or beta is not None) and (g <= 1 - a or gamma is not None)]
+    return np.array(grid, dtype=float)
+
+
+def _smooth(values: np.ndarray, lengths: np.ndarray, params: np.ndarray, season_length: int,
+            with_trend: bool) -> tuple:
+    """
+    Run the additive error-correction recursions for all series and all parameter rows at once:
+        e = y - (level + trend + season),  level += trend + alpha * e,  trend += beta * e,  season += gamma * e
+    States stop updating after the last observation of each series.
+
+    :return: (sse, count, level, trend, season) with shapes (series, rows) and (series, rows, season_length)
+    """
+    m, width = values.shape
+    p = season_length
+    first = values[:, :p]
+    if p > 1:
+        # initial level / trend from the first two seasons, seasonal indices from the first season
+        level = first.mean(axis=1)
+        trend = (values[:, p:2 * p].mean(axis=1) - level) / p
+        season = first - level[:, None]
+        level = level - trend
+    else:
+        level = values[:, 0]
+        trend = np.where(lengths > 1, values[:, min(1, width - 1)] - values[:, 0], 0) if with_trend else np.zeros(m)
+        season = np.zeros((m, 1))
+        level = level - trend
+    k = len(params)
+    alpha, beta, gamma = params[:, 0], params[:, 1], params[:, 2]
+    level = np.repeat(level[:, None], k, axis=1)
+    trend = np.repeat(trend[:, None], k, axis=1)
+    # seasonal slots on the first axis so every step updates one contiguous (series, rows) block
+    season = np.repeat(season.T[:, :, None], k, axis=2)
+    sse = np.zeros((m, k))
+
+    for t in range(width):
+        y = values[:, t]
+        active = ~np.isnan(y)
+        if not active.any():
+            break
+        slot = t % p
+        error = y[:, None] - level - trend - season[slot]
+        if active.all():
+            level = level + trend + alpha * error
+        else:
+            error[~active] = 0
+            level = np.where(active[:, None], level + trend + alpha * error, level)
+        trend += beta * error
+        season[slot] += gamma * error
+        sse += error ** 2
+    return sse, np.minimum(lengths, width), level, trend, season.transpose(1, 2, 0)
+
+
+def exponential_smoothing(values: np.ndarray, lengths: np.ndarray, horizon: int, model: str = "ses",
+                          confidence: float = 0.95, season_length: int = 1, alpha: Optional[float] = None,
+                          beta: Optional[float] = None, gamma: Optional[float] = None) -> dict:
+    """
+    Simple exponential smoothing (ses), Holt's linear trend (holt) and additive Holt-Winters (holt_winters),
+    vectorised across series and across candidate parameters. Missing parameters are chosen per series by
+    the smallest one-step-ahead squared error on a grid. Prediction intervals use the additive ETS variance
+    sigma^2 * (1 + sum_{j<h} (alpha + beta * j + gamma * [j % season_length == 0])^2) with normal quantiles.
+
+    :param values: stacked series, NaN-padded
+    :param lengths: number of observations per series
+    :param horizon: number of future periods
+    :param model: ses / holt / holt_winters
+    :param season_length: periods per season (holt_winters only)
+    :return: forecast, lower, upper, sigma and the chosen alpha / beta / gamma per series
+    """
+    if model not in ("ses", "holt", "holt_winters"):
+        raise ValueError("model must be one of ses, holt, holt_winters")
+    p = season_length if model == "holt_winters" else 1
+    if p < 2 and model == "holt_winters":
+        raise ValueError("holt_winters needs season_length >= 2.")
+    needed = 2 * p if model == "holt_winters" else 2 if model == "holt" else 1
+    if lengths.min() < needed:
+        raise ValueError(f"The {model} model needs at least {needed} observations per series.")
+    for name, value in (("alpha", alpha), ("beta", beta), ("gamma", gamma)):
+        if value is not None and not 0 <= value <= 1:
+            raise ValueError(f"{name} must be within [0, 1].")
+    params = _parameter_grid(model, alpha, beta, gamma)
+    if not len(params):
+        raise ValueError("No admissible smoothing parameters: beta must not exceed alpha, gamma not 1 - alpha.")
+
+    m = len(values)
+    forecast, sigma = np.empty((m, horizon)), np.empty(m)
+    chosen = np.empty((m, 3))
+    steps = np.arange(1, horizon + 1)
+    chunk = max(1, SMOOTHING_CHUNK // (len(params) * p))
+    for begin in range(0, m, chunk):
+        rows = slice(begin, begin + chunk)
+        sse, count, level, trend, season = _smooth(values[rows], lengths[rows], params, p, model != "ses")
+        best = np.argmin(sse, axis=1)
+        pick = np.arange(len(best))
+        chosen[rows] = params[best]
+        sigma[rows] = np.sqrt(sse[pick, best] / count)
+        slots = (lengths[rows, None] + steps - 1) % p
+        forecast[rows] = (level[pick, best][:, None] + trend[pick, best][:, None] * steps
+                          + np.take_along_axis(season[pick, best], slots, axis=1))
+
+    j = np.arange(horizon)  # j-th coefficient of the h-step variance, j = 1..h-1 (0 is the unit term)
+    c = chosen[:, :1] + chosen[:, 1:2] * j + chosen[:, 2:3] * ((j % p) == 0)
+    c[:, 0] = 0
+    variance = 1 + np.cumsum(c ** 2, axis=1)
+    spread = NormalDist().inv_cdf((1 + confidence) / 2) * sigma[:, None] * np.sqrt(variance)
+    return {
+        "forecast": forecast,
+        "lower": forecast - spread,
+        "upper": forecast + spread,
+        "sigma": sigma,
+        "alpha": chosen[:, 0],
+        "beta": chosen[:, 1],
+        "gamma": chosen[:, 2]
+    }
+
+
+def forecast_series(series: List[List[float]], horizon: int, model: str = "linear", confidence: float = 0.95,
+                    season_length: int = 1, alpha: Optional[float] = None, beta: Optional[float] = None,
+                    gamma: Optional[float] = None) -> dict:
+    """
+    Forecast every series over the full horizon with prediction intervals
+
+    :param series: one list of historical values per series (lengths may differ)
+    :param horizon: number of future periods
+    :param model: linear / ses / holt / holt_winters
+    :param confidence: coverage of the prediction intervals
+    :return: dict of arrays, one row per series
+    """
+    if model not in FORECAST_MODELS:
+        raise ValueError(f"model must be one of {', '.join(FORECAST_MODELS)}")
+    if horizon < 1:
+        raise ValueError("future_periods must be positive.")
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be within (0, 1).")
+    values, lengths = stack_series(series)
+    if np.isnan(values[np.arange(values.shape[1]) < lengths[:, None]]).any():
+        raise ValueError("Historical data must not contain NaN.")
+    if model == "linear":
+        return linear_trend(values, lengths, horizon, confidence)
+    return exponential_smoothing(values, lengths, horizon, model, confidence, season_length, alpha, beta, gamma)
@@ -0,0 +1,273 @@
+import heapq
+
+from typing import Dict, List
+
+import numpy as np
+
+from app.model.cpm import ProjectNetwork
+from app.model.resource_calendar import ResourceCalendar
+
+
+class ResourceProfile:
+    """
+    资源占用矩阵（资源池 × 天，第 0 列不用）及对应的容量矩阵，移动活动时按区间原地加减
+
+    初始占用用差分数组一次性构建；之后每次移动只更新被移动活动覆盖的区间，
+    不再逐日逐活动重建。矩阵在活动被推迟到当前范围之外时自动扩容。
+
+    属性:
+        usage (np.ndarray): 每日资源占用，形状 (k, 天数)
+        capacity (np.ndarray): 每日资源容量，形状同 usage
+    """
+
+    def __init__(self, starts: np.ndarray, duration: np.ndarray, demand: np.ndarray, calendar: ResourceCalendar):
+        self.calendar = calendar
+        finish = starts + duration  # 结束后的第一天
+        horizon = max(int(finish.max()) if len(finish) else 1, calendar.horizon + 1)
+        diff = np.zeros((len(calendar), 2 * horizon + 1), dtype=np.int64)
+        np.add.at(diff, (slice(None), starts), demand.T)
+        np.add.at(diff, (slice(None), finish), -demand.T)
+        self.usage = np.cumsum(diff, axis=1)
+        self.capacity = calendar.capacity(self.usage.shape[1])
+
+    def _ensure(self, end: int):
+        length = self.usage.shape[1]
+        if end > length:
+            grown = np.zeros((len(self.calendar), max(end, 2 * length)), dtype=np.int64)
+            grown[:, :length] = self.usage
+            self.usage = grown
+            self.capacity = self.calendar.capacity(grown.shape[1])
+
+    def add(self, start: int, duration: int, amount: np.ndarray):
+        """
+        在 [start, start + duration) 区间内按各资源池增加（amount 为负时减少）资源占用
+        """
+        self._ensure(start + duration)
+        self.usage[:, start:start + duration] += amount[:, None]
+
+    def first_above(self, since: int = 0) -> int:
+        """
+        返回不早于 since 的第一个有资源池超载的日期，没有则返回 -1
+
+        按窗口分块扫描，超载日靠前时不必扫描整条曲线。
+        """
+        window = 256
+        while since < self.usage.shape[1]:
+            block = slice(since, since + window)
+            found = np.flatnonzero((self.usage[:, block] > self.capacity[:, block]).any(axis=0))
+            if len(found):
+                return since + int(found[0])
+            since += window
+            window *= 2
+        return -1
+
+
+def level_resources(network: ProjectNetwork, demand: np.ndarray, calendar: ResourceCalendar) -> np.ndarray:
+    """
+    资源受限的平衡：从 ES 出发，找到第一个超载日，推迟该日占用超载资源池、且前置活动最多的在用活动
+
+    被推迟的活动直接跳到超载日的下一天开始；被打破紧前关系的后继活动在扫描到其开始日时
+    顺延到最早可开始日。资源占用只按被移动活动的区间增量更新。
+
+    Args:
+        network (ProjectNetwork): 活动网络
+        demand (np.ndarray): 各活动对各资源池的每日需求，形状 (n, k)
+        calendar (ResourceCalendar): 资源池容量日历
+
+    Returns:
+        np.ndarray: 各活动的开始日（与 network.names 顺序一致）
+    """
+    calendar.check_demand(network.names, demand)
+    duration = network.duration
+    start = network.earliest_starts()
+    profile = ResourceProfile(start, duration, demand, calendar)
+    n_preds = np.array([len(p) for p in network.predecessors], dtype=np.int64)
+
+    def move(i: int, new_start: int):
+        profile.add(int(start[i]), int(duration[i]), -demand[i])
+        start[i] = new_start
+        profile.add(new_start, int(duration[i]), demand[i])
+        for s in network.successors[i]:
+            heapq.heappush(dirty, (int(start[s]), s))
+
+    # dirty: 前置活动被推迟、可能违反紧前关系的活动（按当前开始日排序）。
+    # 只有开始日不晚于扫描日的活动会影响当天的判断，因此顺延可以推迟到扫描到该日时再做，
+    # 避免每次推迟都级联移动全部后代活动。
+    dirty: List[tuple] = []
+    # 推迟只会移出当前超载日或移到其之后，因此第一个超载日单调不减，可从上次位置继续扫描
+    since = 0
+    while True:
+        day = profile.first_above(since)
+        if dirty and (day < 0 or dirty[0][0] <= day):
+            _, i = heapq.heappop(dirty)
+            earliest = max(int(start[p] + duration[p]) for p in network.predecessors[i])
+            if earliest > start[i]:
+                move(i, earliest)
+                since = min(since, earliest)
+            continue
+        if day < 0:
+            break
+        since = day
+        overloaded = profile.usage[:, day] > profile.capacity[:, day]
+        active = np.flatnonzero(
+            (start <= day) & (day < start + duration) & (demand[:, overloaded] > 0).any(axis=1))
+        # 前置活动最多者优先推迟，相同时取输入顺序靠前者；逐日后移直到离开超载日，等价于直接跳到下一天
+        act = int(active[np.argmax(n_preds[active])])
+        move(act, day + 1)
+
+    return start
+
+
+PRIORITY_RULES = ("lft", "min_slack", "most_resources", "longest_duration")
+
+
+def priority_keys(network: ProjectNetwork, demand: np.ndarray, calendar: ResourceCalendar, rule: str) -> np.ndarray:
+    """
+    计算各活动的优先级键，值越小越优先
+
+    lft: 最迟完成时间最早；min_slack: 总时差最小；
+    most_resources: 每日资源需求最多（各资源池需求按默认容量折算后求和）；longest_duration: 工期最长
+    """
+    if rule == "lft":
+        return network.critical_path()["lf"]
+    elif rule == "min_slack":
+        return network.critical_path()["total_float"]
+    elif rule == "most_resources":
+        return -(demand / calendar.base).sum(axis=1)
+    elif rule == "longest_duration":
+        return -network.duration
+    else:
+        raise ValueError(f"priority_rule must be one of {', '.join(PRIORITY_RULES)}")
+
+
+def _fits(capacity: np.ndarray, start: int, duration: int, amount: np.ndarray) -> bool:
+    """
+    检查 [start, start + duration) 内每天各资源池的剩余容量是否都不少于 amount
+    """
+    return bool((capacity[:, start:start + duration] >= amount[:, None]).all())
+
+
+def _earliest_fit(capacity: np.ndarray, earliest: int, duration: int, amount: np.ndarray) -> int:
+    """
+    返回不早于 earliest、连续 duration 天各资源池剩余容量都不少于 amount 的最早开始日
+
+    按窗口向量化查找容量不足的日期，相邻不足日之间的空档长度不少于 duration 即可放下；
+    窗口逐次加倍，容量长期被占满时不必逐段跳跃。
+    """
+    used = np.flatnonzero(amount > 0)
+    amount = amount[used, None]
+    window = max(4 * duration, 32)
+    day = earliest
+    while True:
+        short = np.flatnonzero((capacity[used, day:day + window + duration - 1] < amount).any(axis=0))
+        gap_start = np.concatenate(([0], short + 1))
+        gap_end = np.append(short, window + duration - 1)
+        found = np.flatnonzero((gap_end - gap_start >= duration) & (gap_start < window))
+        if len(found):
+            return day + int(gap_start[found[0]])
+        day += window
+        window *= 2
+
+
+def generate_schedule(network: ProjectNetwork, demand: np.ndarray, calendar: ResourceCalendar,
+                      scheme: str = "serial", rule: str = "lft") -> np.ndarray:
+    """
+    进度生成方案（SGS）：按优先级规则一次性排出满足紧前关系和各资源池容量的进度
+
+    serial: 每次从可排活动（前置活动均已排定）中取优先级最高者，放到其最早可行的开始日；
+    parallel: 按时间推进，在每个决策时点按优先级依次开工剩余容量放得下的已就绪活动。
+    可排活动集合用堆维护，剩余容量存放在 资源池 × 天 的矩阵中，整体复杂度约 O(n log n + 工期)。
+
+    Args:
+        network (ProjectNetwork): 活动网络
+        demand (np.ndarray): 各活动对各资源池的每日需求，形状 (n, k)
+        calendar (ResourceCalendar): 资源池容量日历
+        scheme (str): "serial" 或 "parallel"
+        rule (str): 优先级规则，见 PRIORITY_RULES
+
+    Returns:
+        np.ndarray: 各活动的开始日（与 network.names 顺序一致）
+    """
+    if scheme not in ("serial", "parallel"):
+        raise ValueError("scheme must be one of serial, parallel")
+    calendar.check_demand(network.names, demand)
+
+    keys = priority_keys(network, demand, calendar, rule).tolist()
+    duration = network.duration.tolist()
+    n = len(network)
+    # 日历结束后容量恒为默认值，逐个首尾相接也能排完，因此总工期不超过 日历长度 + 工期之和
+    capacity = calendar.capacity(calendar.horizon + sum(duration) + 2)
+    start = [0] * n
+    ready = [1] * n  # 前置活动全部完成后的第一天
+    waiting = [len(p) for p in network.predecessors]
+    eligible = [(keys[i], i) for i in range(n) if not waiting[i]]
+    heapq.heapify(eligible)
+
+    def place(i: int, day: int):
+        start[i] = day
+        capacity[:, day:day + duration[i]] -= demand[i][:, None]
+        for s in network.successors[i]:
+            ready[s] = max(ready[s], day + duration[i])
+            waiting[s] -= 1
+            if not waiting[s]:
+                heapq.heappush(eligible, (keys[s], s))
+
+    if scheme == "serial":
+        while eligible:
+            _, i = heapq.heappop(eligible)
+            place(i, _earliest_fit(capacity, ready[i], duration[i], demand[i]))
+        return np.array(start, dtype=np.int64)
+
+    # parallel：pending 为前置已排定、尚未到就绪日的活动（按就绪日排序）；
+    # released 为已就绪但尚未开工的活动（按需求向量分组、组内按优先级排序的堆）；
+    # finishes 为在建活动完工后的第一天
+    shape = [tuple(row) for row in demand.tolist()]
+    pending: List[tuple] = []
+    released: Dict[tuple, List[tuple]] = {}
+    finishes: List[int] = []
+    day, placed = 1, 0
+    while placed < n:
+        while eligible:
+            key, i = heapq.heappop(eligible)
+            heapq.heappush(pending, (ready[i], key, i))
+        while pending and pending[0][0] <= day:
+            _, key, i = heapq.heappop(pending)
+            heapq.heappush(released.setdefault(shape[i], []), (key, i))
+
+        # 每次在需求不超过当日剩余容量的活动中取优先级最高者开工
+        skipped = []
+        free = capacity[:, day].tolist()
+        while True:
+            heads = [
+                (queue[0], amount) for amount, queue in released.items()
+                if queue and all(a <= f for a, f in zip(amount, free))
+            ]
+            if not heads:
+                break
+            (key, i), amount = min(heads)
+            heapq.heappop(released[amount])
+            if _fits(capacity, day, duration[i], demand[i]):
+                place(i, day)
+                free = [f - a for f, a in zip(free, amount)]
+                heapq.heappush(finishes, day + duration[i])
+                placed += 1
+            else:
+                skipped.append((key, i))
+        for key, i in skipped:
+            heapq.heappush(released[shape[i]], (key, i))
+
+        # 下一个决策时点：最近的完工次日、就绪日或容量变化日
+        while finishes and finishes[0] <= day:
+            heapq.heappop(finishes)
+        blocked = any(released.values())
+        upcoming = [ready[i] for _, i in eligible]
+        if finishes:
+            upcoming.append(finishes[0])
+        elif blocked:
+            upcoming.append(day + 1)
+        if pending:
+            upcoming.append(pending[0][0])
+        if blocked and calendar.next_change(day) > 0:
+            upcoming.append(calendar.next_change(day))
+        day = min(upcoming, default=day + 1)
+    return np.array(start, dtype=np.int64)
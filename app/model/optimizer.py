@@ -0,0 +1,234 @@
+import math
+import time
+
+from typing import List, Optional
+
+import numpy as np
+
+from app.model.cpm import ProjectNetwork
+from app.model.resource_calendar import ResourceCalendar
+
+OBJECTIVES = ("makespan", "peak", "variance")
+ALGORITHMS = ("annealing", "genetic")
+
+TRACE_POINTS = 100
+
+
+class ScheduleProblem:
+    """
+    以“开始偏移量”编码的进度优化问题
+
+    按拓扑序解码：开始日 = 前置活动最晚完工日 + 偏移量，并截断到最迟开始日，因此任何偏移量都满足紧前关系。
+    makespan 目标允许工期延长（最迟开始日整体后移 工期之和 + 日历长度，足以排出资源可行的进度）；
+    peak / variance 目标固定 CPM 工期，偏移量不超过总时差，即在 ES..LS 内搜索。
+    超出容量的资源占用（按资源池默认容量折算）计入罚分。
+
+    属性:
+        objective (str): 优化目标
+        max_offset (np.ndarray): 各活动偏移量上限
+        penalty (float): 每单位超载的罚分
+    """
+
+    def __init__(self, network: ProjectNetwork, demand: np.ndarray, calendar: ResourceCalendar, objective: str):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"objective must be one of {', '.join(OBJECTIVES)}")
+        self.objective = objective
+        cpm = network.critical_path()
+        self.project_end = cpm["project_end"]
+        extension = 0 if objective != "makespan" else int(network.duration.sum()) + calendar.horizon
+        self.horizon = self.project_end + extension + 2
+        self.max_offset = cpm["total_float"] + extension
+        self.latest = (cpm["ls"] + extension).tolist()
+
+        self.order = network.order
+        self.predecessors = network.predecessors
+        self.duration = network.duration
+        self.duration_list = network.duration.tolist()
+        # 只保留被用到的资源池，并按默认容量归一化，使不同资源池可比
+        used = demand.any(axis=0)
+        self.demand = demand[:, used].T.astype(float)
+        self.base = calendar.base[used].astype(float)
+        self.capacity = calendar.capacity(self.horizon)[used]
+        self.penalty = float(self.horizon)
+
+    def decode(self, offsets: np.ndarray) -> List[int]:
+        """
+        把偏移量解码为开始日
+        """
+        offsets = offsets.tolist()
+        start = [0] * len(offsets)
+        finish = [0] * len(offsets)
+        for i in self.order:
+            s = min(max((finish[p] for p in self.predecessors[i]), default=1) + offsets[i], self.latest[i])
+            start[i], finish[i] = s, s + self.duration_list[i]
+        return start
+
+    def encode(self, start: np.ndarray) -> np.ndarray:
+        """
+        把一个满足紧前关系的进度转换为偏移量（开始日 - 前置活动最晚完工日）
+        """
+        offsets = np.zeros(len(start), dtype=np.int64)
+        for i in self.order:
+            ready = max((int(start[p] + self.duration[p]) for p in self.predecessors[i]), default=1)
+            offsets[i] = start[i] - ready
+        return np.clip(offsets, 0, self.max_offset)
+
+    def evaluate(self, start: List[int]) -> tuple:
+        """
+        计算进度的 (总代价, 目标值, 超载量)
+        """
+        start = np.asarray(start, dtype=np.int64)
+        finish = start + self.duration
+        end = int(finish.max()) - 1 if len(start) else 0
+        usage = np.empty((len(self.base), self.horizon + 1))
+        for k, amount in enumerate(self.demand):
+            usage[k] = np.cumsum(
+                np.bincount(start, amount, self.horizon + 1) - np.bincount(finish, amount, self.horizon + 1))
+        overload = float((np.maximum(usage[:, :self.horizon] - self.capacity, 0).sum(axis=1) / self.base).sum())
+        scaled = usage[:, 1:end + 1] / self.base[:, None]
+        if self.objective == "makespan":
+            value = float(end)
+        elif self.objective == "peak":
+            value = float(scaled.max()) if scaled.size else 0.0
+        else:
+            value = float(scaled.var(axis=1).sum()) if scaled.size else 0.0
+        return value + self.penalty * overload, value, overload
+
+    def mutate(self, rng: np.random.Generator, offsets: np.ndarray, count: int = 1) -> np.ndarray:
+        """
+        随机修改 count 个活动的偏移量：多数为小步长移动，少数在整个范围内重新取值
+        """
+        result = offsets.copy()
+        for i in rng.integers(0, len(offsets), count):
+            if self.max_offset[i] == 0:
+                continue
+            if rng.random() < 0.2:
+                result[i] = rng.integers(0, self.max_offset[i] + 1)
+            else:
+                step = max(1, int(abs(rng.normal(0, 1 + self.duration[i]))))
+                result[i] = min(max(result[i] + (step if rng.random() < 0.5 else -step), 0), self.max_offset[i])
+        return result
+
+
+class _Trace:
+    """
+    记录最优代价的收敛过程，点数超过上限时每隔一个点丢弃一个
+    """
+
+    def __init__(self, began: float):
+        self.began = began
+        self.points: List[dict] = []
+        self.step = 1
+
+    def record(self, iteration: int, best: float):
+        if iteration % self.step:
+            return
+        self.points.append({"time": round(time.monotonic() - self.began, 4), "iteration": iteration, "best": best})
+        if len(self.points) > TRACE_POINTS:
+            self.points = self.points[::2]
+            self.step *= 2
+
+
+def _anneal(problem: ScheduleProblem, rng: np.random.Generator, offsets: np.ndarray, deadline: float,
+            trace: _Trace) -> tuple:
+    cost = problem.evaluate(problem.decode(offsets))[0]
+    best, best_cost = offsets, cost
+    # 初始温度取随机邻域代价变化的平均幅度，结束温度为其千分之一，按已用时间比例几何降温
+    samples = [abs(problem.evaluate(problem.decode(problem.mutate(rng, offsets)))[0] - cost) for _ in range(20)]
+    t0 = max(float(np.mean(samples)), 1e-9)
+    began, budget = time.monotonic(), max(deadline - time.monotonic(), 1e-9)
+    iteration = 0
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        temperature = t0 * 1e-3 ** ((now - began) / budget)
+        candidate = problem.mutate(rng, offsets)
+        candidate_cost = problem.evaluate(problem.decode(candidate))[0]
+        delta = candidate_cost - cost
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            offsets, cost = candidate, candidate_cost
+            if cost < best_cost:
+                best, best_cost = offsets, cost
+        iteration += 1
+        trace.record(iteration, best_cost)
+    return best, iteration
+
+
+def _evolve(problem: ScheduleProblem, rng: np.random.Generator, offsets: np.ndarray, deadline: float,
+            trace: _Trace, population_size: int = 32) -> tuple:
+    n = len(offsets)
+    population = [offsets] + [problem.mutate(rng, offsets, max(1, n // 10)) for _ in range(population_size - 1)]
+    costs = [problem.evaluate(problem.decode(p))[0] for p in population]
+    generation = 0
+    while time.monotonic() < deadline:
+        ranked = np.argsort(costs)
+        children = [population[i] for i in ranked[:2]]  # 精英保留
+        child_costs = [costs[i] for i in ranked[:2]]
+        while len(children) < population_size and time.monotonic() < deadline:
+            # 锦标赛选择 + 均匀交叉 + 变异
+            parents = [min(rng.integers(0, population_size, 3), key=costs.__getitem__) for _ in range(2)]
+            mask = rng.random(n) < 0.5
+            child = np.where(mask, population[parents[0]], population[parents[1]])
+            child = problem.mutate(rng, child, max(1, rng.binomial(n, 1 / max(n, 1))))
+            children.append(child)
+            child_costs.append(problem.evaluate(problem.decode(child))[0])
+        population, costs = children, child_costs
+        generation += 1
+        trace.record(generation, min(costs))
+    best = int(np.argmin(costs))
+    return population[best], generation
+
+
+def optimize_schedule(network: ProjectNetwork, demand: np.ndarray, calendar: ResourceCalendar, objective: str,
+                      algorithm: str, time_budget: float, initial: np.ndarray, seed=None) -> dict:
+    """
+    单次元启发式搜索（一个独立的重启），在 time_budget 秒内返回找到的最优进度
+
+    Args:
+        network (ProjectNetwork): 活动网络
+        demand (np.ndarray): 各活动对各资源池的每日需求，形状 (n, k)
+        calendar (ResourceCalendar): 资源池容量日历
+        objective (str): makespan / peak / variance
+        algorithm (str): annealing（模拟退火）/ genetic（遗传算法）
+        time_budget (float): 墙钟时间预算（秒）
+        initial (np.ndarray): 初始进度（开始日）
+        seed: 随机种子（可为 SeedSequence）
+
+    Returns:
+        dict: start（开始日）、cost、value（目标值）、overload（超载量）、iterations、trace（收敛过程）
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"algorithm must be one of {', '.join(ALGORITHMS)}")
+    began = time.monotonic()
+    deadline = began + time_budget
+    problem = ScheduleProblem(network, demand, calendar, objective)
+    rng = np.random.default_rng(seed)
+    trace = _Trace(began)
+    offsets = problem.encode(np.asarray(initial, dtype=np.int64))
+    if len(offsets) and problem.max_offset.any():
+        search = _anneal if algorithm == "annealing" else _evolve
+        offsets, iterations = search(problem, rng, offsets, deadline, trace)
+    else:
+        iterations = 0
+
+    start = problem.decode(offsets)
+    cost, value, overload = problem.evaluate(start)
+    trace.points.append({"time": round(time.monotonic() - began, 4), "iteration": iterations, "best": cost})
+    return {
+        "start": start,
+        "cost": cost,
+        "value": value,
+        "overload": overload,
+        "iterations": iterations,
+        "trace": trace.points
+    }
+
+
+def optimize_seeds(restarts: int, seed: Optional[int] = None) -> list:
+    """
+    为各个独立重启派生互不相关的子种子
+    """
+    if restarts <= 0:
+        raise ValueError("restarts must be positive.")
+    return np.random.SeedSequence(seed).spawn(restarts)
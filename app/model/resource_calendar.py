@@ -0,0 +1,96 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from app.model.scheduler import ProjectData
+
+
+class ResourceCalendar:
+    """
+    多资源池的容量日历：按需生成 资源池 × 天 的容量矩阵
+
+    属性:
+        names (List[str]): 资源池名称
+        base (np.ndarray): 各资源池的默认每日容量，形状 (k,)
+        periods (List[Tuple[int, int, int, int]]): 容量例外时段 (资源池下标, 开始日, 结束日, 容量)
+        horizon (int): 最后一个例外时段的结束日，此后容量恒为默认值
+        change_days (np.ndarray): 容量可能发生变化的日期（升序）
+    """
+
+    def __init__(self, names: List[str], base: List[int], periods: List[Tuple[int, int, int, int]] = ()):
+        self.names = list(names)
+        self.base = np.asarray(base, dtype=np.int64)
+        self.periods = list(periods)
+        for _, start, end, _ in self.periods:
+            if end < start:
+                raise ValueError(f"Calendar period ends before it starts: {start} > {end}")
+        self.horizon = max((end for _, _, end, _ in self.periods), default=0)
+        self.change_days = np.unique(np.array(
+            [day for _, start, end, _ in self.periods for day in (start, end + 1)], dtype=np.int64))
+
+    def __len__(self):
+        return len(self.names)
+
+    def capacity(self, length: int) -> np.ndarray:
+        """
+        生成 (k, length) 的容量矩阵，列下标为天数（第 0 列不用）
+        """
+        matrix = np.repeat(self.base[:, None], length, axis=1)
+        for pool, start, end, capacity in self.periods:
+            matrix[pool, start:end + 1] = capacity
+        return matrix
+
+    def next_change(self, day: int) -> int:
+        """
+        day 之后第一个容量可能变化的日期，没有则返回 -1
+        """
+        i = np.searchsorted(self.change_days, day, side="right")
+        return int(self.change_days[i]) if i < len(self.change_days) else -1
+
+    def check_demand(self, names: List[str], demand: np.ndarray):
+        """
+        校验每个活动的需求不超过各资源池的默认容量，否则该活动永远无法排入
+        """
+        over = np.argwhere(demand > self.base)
+        if len(over):
+            i, k = over[0]
+            raise ValueError(
+                f"Activity '{names[i]}' needs {demand[i, k]} of '{self.names[k]}', above its capacity {self.base[k]}")
+
+
+def resource_model(data: ProjectData) -> Tuple[ResourceCalendar, np.ndarray]:
+    """
+    把请求中的资源定义转换为容量日历和 (活动数, 资源池数) 的需求矩阵
+
+    未提供 resources 时沿用单一资源池：容量为 resource_limit，需求为各活动的 resource。
+    """
+    if data.resources is None:
+        if data.resource_limit is None:
+            raise ValueError("resource_limit or resources is required")
+        missing = [a.name for a in data.activities if a.resource is None]
+        if missing:
+            raise ValueError(f"Activities without resource: {', '.join(missing)}")
+        calendar = ResourceCalendar(["resource"], [data.resource_limit])
+        demand = np.array([[a.resource] for a in data.activities], dtype=np.int64).reshape(-1, 1)
+        return calendar, demand
+
+    index = {}
+    for k, pool in enumerate(data.resources):
+        if pool.name in index:
+            raise ValueError(f"Duplicate resource pool: {pool.name}")
+        index[pool.name] = k
+    periods = [
+        (index[pool.name], period.start, period.end, period.capacity)
+        for pool in data.resources for period in pool.calendar
+    ]
+    calendar = ResourceCalendar(list(index), [pool.capacity for pool in data.resources], periods)
+
+    demand = np.zeros((len(data.activities), len(index)), dtype=np.int64)
+    for i, a in enumerate(data.activities):
+        for name, amount in a.demands.items():
+            if name not in index:
+                raise ValueError(f"Unknown resource pool for activity '{a.name}': {name}")
+            if amount < 0:
+                raise ValueError(f"Demand of activity '{a.name}' for '{name}' must be non-negative")
+            demand[i, index[name]] = amount
+    return calendar, demand
@@ -1,13 +1,40 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List, Literal, Optional
 
 class Activity(BaseModel):
     name: str = Field(..., description="活动名称")
     duration: int = Field(..., gt=0, description="持续时间（天）")
-    resource: int = Field(..., gt=0, description="资源需求人数")
+    resource: Optional[int] = Field(None, gt=0, description="资源需求人数（单一资源池时使用）")
+    demands: Dict[str, int] = Field(default_factory=dict, description="各资源池的每日需求（多资源池时使用），未列出的资源池需求为 0")
     predecessors: List[str] = Field(default_factory=list, description="前置活动列表")
 
 
+class CapacityPeriod(BaseModel):
+    start: int = Field(..., gt=0, description="开始日（含）")
+    end: int = Field(..., gt=0, description="结束日（含）")
+    capacity: int = Field(..., ge=0, description="该时段内的每日容量")
+
+
+class ResourcePool(BaseModel):
+    name: str = Field(..., description="资源池名称，如 developers、testers、build_agents")
+    capacity: int = Field(..., gt=0, description="默认每日容量")
+    calendar: List[CapacityPeriod] = Field(default_factory=list, description="容量例外时段（假期、扩编等），后出现的时段优先")
+
+
 class ProjectData(BaseModel):
     activities: List[Activity] = Field(..., description="活动列表")
-    resource_limit: int = Field(..., gt=0, description="资源总量限制")
+    resource_limit: Optional[int] = Field(None, gt=0, description="资源总量限制（单一资源池时使用）")
+    resources: Optional[List[ResourcePool]] = Field(None, description="多资源池及其日历；提供时使用各活动的 demands")
+    method: Literal["delay", "serial", "parallel"] = Field(
+        "delay", description="资源平衡方法：delay（逐个推迟超载日的活动）/ serial、parallel（进度生成方案）")
+    priority_rule: Literal["lft", "min_slack", "most_resources", "longest_duration"] = Field(
+        "lft", description="进度生成方案的优先级规则")
+
+
+class OptimizeData(ProjectData):
+    algorithm: Literal["annealing", "genetic"] = Field("annealing", description="搜索算法：模拟退火 / 遗传算法")
+    objective: Literal["makespan", "peak", "variance"] = Field(
+        "variance", description="优化目标：makespan（工期）/ peak（资源峰值）/ variance（资源方差）")
+    time_budget: float = Field(5.0, gt=0, le=600, description="每次重启的墙钟时间预算（秒）")
+    restarts: int = Field(4, ge=1, le=64, description="独立重启次数，分发到进程池并行执行")
+    seed: Optional[int] = Field(None, description="随机种子，指定后结果可复现（同一时间预算内的迭代次数仍受机器速度影响）")
@@ -0,0 +1,88 @@
+from typing import Tuple
+
+import numpy as np
+
+from app.model.cpm import ProjectNetwork
+from app.model.resource_calendar import ResourceCalendar
+
+
+def best_shift(usage: np.ndarray, capacity: np.ndarray, lo: int, hi: int, current: int, duration: int,
+               amount: np.ndarray) -> Tuple[int, int]:
+    """
+    在开始日范围 [lo, hi] 内为一个活动找出使各资源池平方和之和下降最多的开始日
+
+    工期固定时资源总量不变，方差最小等价于平方和最小。把需求为 r 的活动从窗口 A 移到窗口 B，
+    平方和的变化为 Σ_资源池 2r(ΣB u - ΣA u)，其中 u 为去掉该活动后的资源占用；
+    对 u 按天求一次前缀和即可 O(1) 得到每个候选开始日的变化量，超载天数同样用前缀和 O(1) 检查。
+
+    Args:
+        usage (np.ndarray): 每日资源占用（含该活动），形状 (k, 天数)
+        capacity (np.ndarray): 每日资源容量，形状同 usage
+        lo / hi (int): 可选开始日范围
+        current (int): 当前开始日
+        duration (int): 工期
+        amount (np.ndarray): 各资源池的每日需求，形状 (k,)
+
+    Returns:
+        Tuple[int, int]: (平方和变化量, 开始日)；没有改进时为 (0, current)
+    """
+    used = amount > 0
+    if hi <= lo or not used.any():
+        return 0, current
+    amount = amount[used, None]
+    seg = usage[used, lo:hi + duration].copy()
+    seg[:, current - lo:current - lo + duration] -= amount
+    sums = np.concatenate((np.zeros((len(seg), 1), dtype=np.int64), np.cumsum(seg, axis=1)), axis=1)
+    over = np.concatenate(([0], np.cumsum((seg + amount > capacity[used, lo:hi + duration]).any(axis=0))))
+    window_sum = sums[:, duration:] - sums[:, :-duration]
+    delta = (2 * amount * (window_sum - window_sum[:, [current - lo]])).sum(axis=0)
+    delta[over[duration:] != over[:-duration]] = 0
+    k = int(np.argmin(delta))
+    if delta[k] < 0:
+        return int(delta[k]), lo + k
+    return 0, current
+
+
+def smooth_resources(network: ProjectNetwork, demand: np.ndarray, calendar: ResourceCalendar,
+                     max_passes: int = 1000) -> np.ndarray:
+    """
+    资源平滑：在不改变工期、不违反紧前关系、不新增超载日的前提下移动活动，使各资源池每日占用的方差之和最小
+
+    从 ES 出发，每一轮依次把每个活动移到其可选范围内方差下降最多的开始日（而不是第一个能改进的开始日），
+    可选范围由前置活动的完工日和后继活动的开始日决定；资源占用只按被移动活动的区间增量更新。
+    直到一轮中没有活动移动为止。
+
+    Args:
+        network (ProjectNetwork): 活动网络
+        demand (np.ndarray): 各活动对各资源池的每日需求，形状 (n, k)
+        calendar (ResourceCalendar): 资源池容量日历
+        max_passes (int): 最多轮数
+
+    Returns:
+        np.ndarray: 各活动的开始日（与 network.names 顺序一致）
+    """
+    duration = network.duration.tolist()
+    starts = network.earliest_starts()
+    start = starts.tolist()
+    project_end = max((s + d - 1 for s, d in zip(start, duration)), default=0)
+
+    diff = np.zeros((len(calendar), project_end + 2), dtype=np.int64)
+    np.add.at(diff, (slice(None), starts), demand.T)
+    np.add.at(diff, (slice(None), starts + network.duration), -demand.T)
+    usage = np.cumsum(diff, axis=1)[:, :project_end + 1]
+    capacity = calendar.capacity(project_end + 1)
+
+    for _ in range(max_passes):
+        moved = False
+        for i in range(len(start)):
+            lo = max((start[p] + duration[p] for p in network.predecessors[i]), default=1)
+            hi = min((start[s] for s in network.successors[i]), default=project_end + 1) - duration[i]
+            delta, new_start = best_shift(usage, capacity, lo, hi, start[i], duration[i], demand[i])
+            if delta < 0:
+                usage[:, start[i]:start[i] + duration[i]] -= demand[i][:, None]
+                usage[:, new_start:new_start + duration[i]] += demand[i][:, None]
+                start[i] = new_start
+                moved = True
+        if not moved:
+            break
+    return np.array(start, dtype=np.int64)
@@ -0,0 +1,220 @@
+import sys
+import threading
+import uuid
+
+from typing import Dict, List, Optional
+
+from app.model.compiled_tree import CompiledTree, compile_tree
+
+
+def validate_fields(fields: dict):
+    """
+    校验节点的 value / probability：须为数值或 None，probability 须在 [0, 1] 内
+    """
+    for field, new in fields.items():
+        if new is not None and (isinstance(new, bool) or not isinstance(new, (int, float))):
+            raise ValueError(f"{field} must be a number or null")
+    if fields.get("probability") is not None and not 0 <= fields["probability"] <= 1:
+        raise ValueError("probability must be within [0, 1]")
+
+
+class TreeSession:
+    """
+    服务端可编辑的决策树会话
+
+    初始 EV 由编译后的树一次性算出；之后每次编辑只沿被修改节点的祖先路径重新计算，
+    一旦某个祖先的 EV 不再变化就提前停止，因此单次编辑的代价为 O(深度 × 分支宽度)。
+
+    属性:
+        session_id (str): 会话 ID
+        names / value / probability / ev / parent: 按节点 ID 存储的节点属性（已删除节点的 parent 为 None）
+        children (List[List[int]]): 每个节点的子节点 ID 列表（保持输入顺序）
+        child_ids (List[Dict[str, int]]): 每个节点的 子节点名称 -> ID 索引，按路径查找每层 O(1)
+    """
+
+    def __init__(self, tree: CompiledTree):
+        self.session_id = uuid.uuid4().hex
+        self.lock = threading.Lock()
+        self.names: List[str] = []
+        self.value: List[Optional[float]] = []
+        self.probability: List[Optional[float]] = []
+        self.ev: List[float] = []
+        self.parent: List[Optional[int]] = []
+        self.children: List[List[int]] = []
+        self.child_ids: List[Dict[str, int]] = []
+        self.alive: List[bool] = []
+        self._append(tree, None)
+
+    def _append(self, tree: CompiledTree, parent: Optional[int]) -> int:
+        """
+        把编译后的（子）树追加到会话中，返回其根节点 ID
+        """
+        tree.check_values()
+        offset = len(self.names)
+        ev = tree.expected_values().tolist()
+        self.names.extend(tree.names)
+        self.value.extend(None if v != v else v for v in tree.value.tolist())
+        self.probability.extend(None if p != p else p for p in tree.probability.tolist())
+        self.ev.extend(ev)
+        self.parent.extend(parent if p < 0 else p + offset for p in tree.parent.tolist())
+        self.alive.extend([True] * len(tree))
+        for i in range(len(tree)):
+            kids = [c + offset for c in tree.children(i)]
+            self.children.append(kids)
+            self.child_ids.append({self.names[c]: c for c in kids})
+        return offset
+
+    @property
+    def nbytes(self) -> int:
+        """
+        粗略估算会话占用的内存字节数
+        """
+        return sum(sys.getsizeof(name) + 200 for name in self.names)
+
+    def find(self, path: List[str]) -> int:
+        """
+        根据路径（列表）找到节点 ID，例如 ["Dev A", "A Success"]
+        """
+        current = 0
+        for name in path:
+            current = self.child_ids[current].get(name)
+            if current is None:
+                raise ValueError(f"Node path {' -> '.join(path)} not found.")
+        return current
+
+    def path_of(self, node: int) -> List[str]:
+        path = []
+        while self.parent[node] is not None:
+            path.append(self.names[node])
+            node = self.parent[node]
+        return path[::-1]
+
+    def _compute(self, node: int) -> float:
+        """
+        由子节点当前的 EV 计算节点 EV（叶子 / 机会节点 / 决策节点）
+        """
+        kids = self.children[node]
+        if not kids:
+            if self.value[node] is None:
+                raise ValueError(f"Leaf node '{self.names[node]}' has no value.")
+            return float(self.value[node])
+        if all(self.probability[c] is not None for c in kids):
+            return float(sum(self.probability[c] * self.ev[c] for c in kids))
+        return max(self.ev[c] for c in kids)
+
+    def _propagate(self, node: Optional[int], changed: Dict[int, float]):
+        """
+        从 node 开始向上重新计算 EV，遇到 EV 未变化的祖先即停止
+        """
+        while node is not None:
+            new_ev = self._compute(node)
+            if new_ev == self.ev[node]:
+                return
+            self.ev[node] = new_ev
+            changed[node] = new_ev
+            node = self.parent[node]
+
+    def _changed_nodes(self, changed: Dict[int, float]) -> List[dict]:
+        return [{"path": self.path_of(node), "ev": ev} for node, ev in changed.items()]
+
+    def update_node(self, path: List[str], changes: dict) -> dict:
+        """
+        修改节点的 value / probability（值为 None 表示清除），返回 EV 发生变化的节点
+        """
+        unknown = set(changes) - {"value", "probability"}
+        if unknown:
+            raise ValueError(f"Unsupported field: {', '.join(sorted(unknown))}")
+        node = self.find(path)
+        validate_fields(changes)
+        if "value" in changes and changes["value"] is None and not self.children[node]:
+            raise ValueError(f"Leaf node '{self.names[node]}' has no value.")
+
+        for field, new in changes.items():
+            getattr(self, field)[node] = new
+
+        changed = {}
+        self._propagate(node, changed)
+        # probability 只影响父节点的汇总，即使节点自身 EV 不变也要重新计算父节点
+        if "probability" in changes and node not in changed:
+            self._propagate(self.parent[node], changed)
+        return {"changed": self._changed_nodes(changed), "optimal_expected_value": self.ev[0]}
+
+    def add_child(self, path: List[str], child_data: dict) -> dict:
+        """
+        在 path 指向的节点下追加子树，返回新增子树（含 EV）及 EV 发生变化的祖先
+        """
+        parent = self.find(path)
+        stack = [child_data]
+        while stack:
+            data = stack.pop()
+            validate_fields({field: data[field] for field in ("value", "probability") if field in data})
+            stack.extend(data.get("children") or [])
+        if child_data.get("name") in self.child_ids[parent]:
+            raise ValueError(f"Duplicate sibling names at: {' -> '.join(list(path) + [child_data['name']])}")
+        child = self._append(compile_tree(child_data), parent)
+        self.children[parent].append(child)
+        self.child_ids[parent][self.names[child]] = child
+
+        changed = {}
+        self._propagate(parent, changed)
+        return {
+            "added": self.export(child),
+            "changed": self._changed_nodes(changed),
+            "optimal_expected_value": self.ev[0]
+        }
+
+    def remove_node(self, path: List[str]) -> dict:
+        """
+        删除 path 指向的节点及其子树，返回 EV 发生变化的祖先
+        """
+        if not path:
+            raise ValueError("The root node cannot be removed.")
+        node = self.find(path)
+        parent = self.parent[node]
+        if len(self.children[parent]) == 1 and self.value[parent] is None:
+            raise ValueError(f"Node '{self.names[parent]}' has no value and cannot lose its last child.")
+
+        self.children[parent].remove(node)
+        del self.child_ids[parent][self.names[node]]
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self.alive[current] = False
+            self.parent[current] = None
+            stack.extend(self.children[current])
+
+        changed = {}
+        self._propagate(parent, changed)
+        return {"changed": self._changed_nodes(changed), "optimal_expected_value": self.ev[0]}
+
+    def export(self, node: int = 0) -> dict:
+        """
+        导出以 node 为根的子树为嵌套 JSON，包含每个节点的 ev、value、probability
+        """
+        def as_dict(i):
+            result = {"name": self.names[i], "ev": self.ev[i]}
+            if self.value[i] is not None:
+                result["value"] = self.value[i]
+            if self.probability[i] is not None:
+                result["probability"] = self.probability[i]
+            return result
+
+        root = as_dict(node)
+        stack = [(node, root)]
+        while stack:
+            current, result = stack.pop()
+            if self.children[current]:
+                result["children"] = [as_dict(c) for c in self.children[current]]
+                stack.extend(zip(self.children[current], result["children"]))
+        return root
+
+    def summary(self) -> dict:
+        """
+        与 /decision-tree/evaluate 相同结构的结果
+        """
+        return {
+            "session_id": self.session_id,
+            "branch_expected_values": {self.names[c]: self.ev[c] for c in self.children[0]},
+            "optimal_expected_value": self.ev[0],
+            "tree_with_ev": self.export()
+        }
@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+
+from datetime import datetime, timezone
+from typing import Annotated, AsyncIterator, Literal, Optional, Type
+
+from fastapi import Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select as core_select
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.dependencies import engine
+
+# 分页与导出配置：单页上限、导出时每次从服务端游标读取的行数
+max_page_size = 1000
+export_chunk_size = 1000
+
+
+class RecordFilter:
+    """
+    历史记录的公共过滤条件：计算方法与创建时间区间 [since, until)，由 (method, created_at) 复合索引支持
+    """
+
+    def __init__(self, method: Optional[str] = None, since: Optional[datetime] = None,
+                 until: Optional[datetime] = None):
+        self.method = method
+        # 不带时区的时间按 UTC 处理，与 created_at 的存储方式一致
+        self.since = since.replace(tzinfo=timezone.utc) if since is not None and since.tzinfo is None else since
+        self.until = until.replace(tzinfo=timezone.utc) if until is not None and until.tzinfo is None else until
+
+    def apply(self, statement, model: Type[SQLModel]):
+        if self.method is not None:
+            statement = statement.where(model.method == self.method)
+        if self.since is not None:
+            statement = statement.where(model.created_at >= self.since)
+        if self.until is not None:
+            statement = statement.where(model.created_at < self.until)
+        return statement
+
+
+RecordFilterDep = Annotated[RecordFilter, Depends()]
+
+
+async def read_page(session: AsyncSession, response: Response, model: Type[SQLModel], filters: RecordFilter,
+                    after_id: Optional[int], limit: int, offset: int = 0) -> list:
+    """
+    按主键的键集（keyset）分页：返回 id > after_id 的前 limit 条记录，按 id 升序。
+    取满一页时在响应头 X-Next-Cursor 中给出下一页的 after_id；offset 仅为兼容旧调用保留。
+    """
+    statement = filters.apply(select(model), model)
+    if after_id is not None:
+        statement = statement.where(model.id > after_id)
+    statement = statement.order_by(model.id).offset(offset).limit(limit)
+    records = (await session.exec(statement)).all()
+    if len(records) == limit:
+        response.headers["X-Next-Cursor"] = str(records[-1].id)
+    return records
+
+
+async def _stream_rows(model: Type[SQLModel], filters: RecordFilter, fmt: str) -> AsyncIterator[str]:
+    """
+    用服务端游标按 export_chunk_size 行分批读取并逐批编码，内存占用与表大小无关。
+    生成器自行打开连接，不依赖请求结束即关闭的会话。
+    """
+    table = model.__table__
+    names = [column.name for column in table.columns]
+    statement = filters.apply(core_select(table), model).order_by(table.c.id)
+    async with engine.connect() as conn:
+        result = await conn.stream(statement.execution_options(yield_per=export_chunk_size))
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            async for rows in result.partitions():
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            async for rows in result.partitions():
+                yield "".join(json.dumps(dict(zip(names, row)), default=str) + "\n" for row in rows)
+
+
+def export_response(model: Type[SQLModel], filters: RecordFilter, fmt: str) -> StreamingResponse:
+    """
+    以 CSV 或 NDJSON 流式导出过滤后的全部记录
+    """
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"{model.__tablename__}.{'csv' if fmt == 'csv' else 'ndjson'}"
+    return StreamingResponse(_stream_rows(model, filters, fmt), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+PageSize = Annotated[int, Query(ge=1, le=max_page_size)]
+ExportFormat = Annotated[Literal["csv", "ndjson"], Query(alias="format")]
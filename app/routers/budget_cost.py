@@ -1,14 +1,21 @@
 import numpy as np
-import numpy_financial as npf
 
-from sklearn.linear_model import LinearRegression
-from fastapi import APIRouter, Query
-from sqlmodel import select
-from typing import List, Annotated
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from typing import List, Annotated, Optional
 
 from app.dependencies import SessionDep
+from app.executor import run_tasks
+from app.records import ExportFormat, PageSize, RecordFilterDep, export_response, read_page
 from app.model.budget_cost import ROI, ROICreate, ROIPublic, NPV, NPVCreate, NPVPublic, IRR, IRRCreate, IRRPublic, \
-    PaybackPeriod, PaybackPeriodCreate, PaybackPeriodPublic, ForecastPublic, ForecastCreate
+    PaybackPeriod, PaybackPeriodCreate, PaybackPeriodPublic, ForecastPublic, ForecastCreate, BatchCreate, BatchPublic, \
+    NPVCurveCreate, NPVCurvePublic, SimulationCreate, SimulationPublic, ForecastBatchCreate, ForecastBatchPublic
+from app.model.cash_flow_simulation import merge_cash_flow_blocks, simulate_cash_flow_block, stochastic_inputs
+from app.model.cash_flows import as_column, break_even_rates, curve_npv, irr_batch, mirr, npv_batch, npv_curve, \
+    pad_cash_flows, payback_batch, IRR_MULTIPLE, IRR_NO_SIGN_CHANGE
+from app.model.decision_tree import monte_carlo_blocks
+from app.model.forecasting import forecast_series
+from app.write_behind import save_record
 
 router = APIRouter(
     prefix="/cost",
@@ -18,89 +25,157 @@ router = APIRouter(
 
 
 @router.get("/roi", response_model=list[ROIPublic])
-def read_roi_records(
+async def read_roi_records(
         session: SessionDep,
-        offset: int = 0,
-        limit: Annotated[int, Query(le=100)] = 100,
+        response: Response,
+        filters: RecordFilterDep,
+        after_id: Optional[int] = None,
+        limit: PageSize = 100,
+        offset: Annotated[int, Query(deprecated=True)] = 0,
 ):
     """
-    Show all record.
+    Show records.
+    Keyset pagination: pass the X-Next-Cursor response header as after_id to get the next page.
     """
-    roi_records = session.exec(select(ROI).offset(offset).limit(limit)).all()
+    roi_records = await read_page(session, response, ROI, filters, after_id, limit, offset)
     return roi_records
 
 
+@router.get("/roi/export")
+async def export_roi_records(filters: RecordFilterDep, fmt: ExportFormat = "csv"):
+    """
+    Stream all matching records as CSV or NDJSON.
+    """
+    return export_response(ROI, filters, fmt)
+
+
 def roi(gain: float, cost: float) -> float:
     return ((gain - cost) / cost) * 100
 
 
 @router.post("/roi", response_model=ROIPublic)
-def roi_calculate(cost: ROICreate, session: SessionDep) -> ROIPublic:
+async def roi_calculate(cost: ROICreate, session: SessionDep) -> ROIPublic:
     # calculate
     db_cost = ROI.model_validate(cost)
     db_cost.roi_value = roi(cost.gain, cost.cost)
     # database
-    session.add(db_cost)
-    session.commit()
-    session.refresh(db_cost)
+    await save_record(session, db_cost)
     return db_cost
 
 
 @router.get("/npv", response_model=list[NPVPublic])
-def read_npv_records(
+async def read_npv_records(
         session: SessionDep,
-        offset: int = 0,
-        limit: Annotated[int, Query(le=100)] = 100,
+        response: Response,
+        filters: RecordFilterDep,
+        after_id: Optional[int] = None,
+        limit: PageSize = 100,
+        offset: Annotated[int, Query(deprecated=True)] = 0,
 ):
     """
-    Show all record.
+    Show records.
+    Keyset pagination: pass the X-Next-Cursor response header as after_id to get the next page.
     """
-    npv_records = session.exec(select(NPV).offset(offset).limit(limit)).all()
+    npv_records = await read_page(session, response, NPV, filters, after_id, limit, offset)
     return npv_records
 
 
+@router.get("/npv/export")
+async def export_npv_records(filters: RecordFilterDep, fmt: ExportFormat = "csv"):
+    """
+    Stream all matching records as CSV or NDJSON.
+    """
+    return export_response(NPV, filters, fmt)
+
+
 def npv(c: List[float], r: float) -> float:
     return sum(r_t / (1 + r) ** t for t, r_t in enumerate(c, start=1)) - c[0]
 
 
 @router.post("/npv", response_model=NPVPublic)
-def npv_calculate(cost: NPVCreate, session: SessionDep) -> NPVPublic:
+async def npv_calculate(cost: NPVCreate, session: SessionDep) -> NPVPublic:
     # calculate
     db_cost = NPV.model_validate(cost)
     db_cost.npv_value = npv(cost.cash_flows, cost.discount_rate)
     # database
-    session.add(db_cost)
-    session.commit()
-    session.refresh(db_cost)
+    await save_record(session, db_cost)
     return db_cost
 
 
+@router.post("/npv/curve", response_model=NPVCurvePublic)
+def npv_curve_calculate(cost: NPVCurveCreate) -> NPVCurvePublic:
+    """
+    NPV of one cash-flow series over a whole grid of flat rates (same convention as /cost/npv), the rates where
+    it changes sign, optionally NPV under per-period rate curves and the modified IRR. Results are not stored.
+    """
+    if cost.rates is not None:
+        rates = np.array(cost.rates, dtype=float)
+    else:
+        rates = np.linspace(cost.rate_min, cost.rate_max, cost.rate_steps)
+    if not len(rates) or np.any(rates <= -1):
+        raise HTTPException(status_code=400, detail="Rates must be non-empty and greater than -1.")
+    flows = np.array(cost.cash_flows, dtype=float)
+    values = npv_curve(flows, rates)
+    order = np.argsort(rates, kind="stable")
+    res = {"break_even_rates": break_even_rates(flows, rates[order], values[order]).tolist()}
+    if cost.rate_curves is not None:
+        try:
+            res["curve_npv"] = curve_npv(flows, cost.rate_curves).tolist()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if cost.finance_rate is not None or cost.reinvest_rate is not None:
+        finance_rate = cost.finance_rate if cost.finance_rate is not None else cost.reinvest_rate
+        reinvest_rate = cost.reinvest_rate if cost.reinvest_rate is not None else cost.finance_rate
+        value = mirr(flows, finance_rate, reinvest_rate)
+        res["mirr"] = None if np.isnan(value) else value
+    return NPVCurvePublic(method=cost.method, rates=rates.tolist(), npv=values.tolist(), msg="NPV curve has been solved",
+                          **res)
+
+
 @router.get("/irr", response_model=list[IRRPublic])
-def read_irr_records(
+async def read_irr_records(
         session: SessionDep,
-        offset: int = 0,
-        limit: Annotated[int, Query(le=100)] = 100,
+        response: Response,
+        filters: RecordFilterDep,
+        after_id: Optional[int] = None,
+        limit: PageSize = 100,
+        offset: Annotated[int, Query(deprecated=True)] = 0,
 ):
     """
-    Show all record.
+    Show records.
+    Keyset pagination: pass the X-Next-Cursor response header as after_id to get the next page.
     """
-    irr_records = session.exec(select(IRR).offset(offset).limit(limit)).all()
+    irr_records = await read_page(session, response, IRR, filters, after_id, limit, offset)
     return irr_records
 
 
+@router.get("/irr/export")
+async def export_irr_records(filters: RecordFilterDep, fmt: ExportFormat = "csv"):
+    """
+    Stream all matching records as CSV or NDJSON.
+    """
+    return export_response(IRR, filters, fmt)
+
+
 @router.post("/irr", response_model=IRRPublic)
-def irr_calculate(cost: IRRCreate, session: SessionDep) -> IRRPublic:
+async def irr_calculate(cost: IRRCreate, session: SessionDep) -> IRRPublic:
     # calculate
     db_cost = IRR.model_validate(cost)
-    res = npf.irr(cost.cash_flows) * 100  # 转换为百分比
+    if not cost.cash_flows:
+        return IRRPublic(method=db_cost.method, irr_value=None, msg="Incorrect input value")
+    rate, status = irr_batch(pad_cash_flows([cost.cash_flows]))
+    res = rate[0] * 100  # 转换为百分比
     if np.isnan(res):
+        if status[0] == IRR_NO_SIGN_CHANGE:
+            return IRRPublic(method=db_cost.method, irr_value=None, msg="Cash flows never change sign, IRR does not exist")
         return IRRPublic(method=db_cost.method, irr_value=None, msg="Incorrect input value")
     db_cost.irr_value = float(res)
     # database
-    session.add(db_cost)
-    session.commit()
-    session.refresh(db_cost)
-    return IRRPublic(method=db_cost.method, irr_value=db_cost.irr_value, msg="IRR has been solved")
+    await save_record(session, db_cost)
+    msg = "IRR has been solved"
+    if status[0] == IRR_MULTIPLE:
+        msg += " (cash flows change sign more than once, the IRR closest to 0 is returned)"
+    return IRRPublic(method=db_cost.method, irr_value=db_cost.irr_value, msg=msg)
 
 
 def payback_period(cash_flows: List[float]):
@@ -113,44 +188,138 @@ def payback_period(cash_flows: List[float]):
 
 
 @router.get("/pp", response_model=list[PaybackPeriodPublic])
-def read_pp_records(
+async def read_pp_records(
         session: SessionDep,
-        offset: int = 0,
-        limit: Annotated[int, Query(le=100)] = 100,
+        response: Response,
+        filters: RecordFilterDep,
+        after_id: Optional[int] = None,
+        limit: PageSize = 100,
+        offset: Annotated[int, Query(deprecated=True)] = 0,
 ):
     """
-    Show all record.
+    Show records.
+    Keyset pagination: pass the X-Next-Cursor response header as after_id to get the next page.
     """
-    pp_records = session.exec(select(PaybackPeriod).offset(offset).limit(limit)).all()
+    pp_records = await read_page(session, response, PaybackPeriod, filters, after_id, limit, offset)
     return pp_records
 
 
+@router.get("/pp/export")
+async def export_pp_records(filters: RecordFilterDep, fmt: ExportFormat = "csv"):
+    """
+    Stream all matching records as CSV or NDJSON.
+    """
+    return export_response(PaybackPeriod, filters, fmt)
+
+
 @router.post("/pp", response_model=PaybackPeriodPublic)
-def payback_period_calculate(cost: PaybackPeriodCreate, session: SessionDep) -> PaybackPeriodPublic:
+async def payback_period_calculate(cost: PaybackPeriodCreate, session: SessionDep) -> PaybackPeriodPublic:
     # calculate
     db_cost = PaybackPeriod.model_validate(cost)
     res = payback_period(cost.cash_flows)
-    if np.isnan(res) or res is None:
+    if res is None:
         return PaybackPeriodPublic(method=db_cost.method, pp_value=None, msg="Incorrect input value")
     db_cost.pp_value = res
     # database
-    session.add(db_cost)
-    session.commit()
-    session.refresh(db_cost)
+    await save_record(session, db_cost)
     return PaybackPeriodPublic(method=db_cost.method, pp_value=db_cost.pp_value, msg="Payback Period has been solved")
 
 
+@router.post("/batch", response_model=BatchPublic)
+def batch_calculate(cost: BatchCreate) -> BatchPublic:
+    """
+    NPV / IRR / payback period of many cash-flow series in one request, returned as columns in input order.
+    IRR is in percent like /cost/irr and irr_status holds a status code per series (see IRR_OK etc.).
+    Results are not stored.
+    """
+    try:
+        flows = pad_cash_flows(cost.cash_flows)
+        res = {}
+        if "npv" in cost.metrics:
+            res["npv"] = as_column(npv_batch(flows, np.array(cost.discount_rates)))
+        if "irr" in cost.metrics:
+            rate, status = irr_batch(flows, cost.irr_guess, cost.irr_tol, cost.irr_max_iter)
+            res["irr"] = as_column(rate * 100)  # 转换为百分比
+            res["irr_status"] = status.tolist()
+        if "pp" in cost.metrics:
+            res["pp"] = as_column(payback_batch(flows))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BatchPublic(method=cost.method, msg="Batch has been solved", **res)
+
+
+@router.post("/simulation", response_model=SimulationPublic)
+async def cash_flow_simulation(request: Request, cost: SimulationCreate) -> SimulationPublic:
+    """
+    Monte Carlo over uncertain cash flows and discount rates: every period is a fixed value or a distribution
+    (normal/uniform/triangular/lognormal/pert/empirical, optionally correlated through a Gaussian copula).
+    Scenarios are simulated in fixed-size blocks on the process pool and return NPV / IRR distributions,
+    the probability of a negative NPV and VaR / CVaR. Results are not stored.
+    """
+    try:
+        cash_flows = [item.model_dump() for item in cost.cash_flows]
+        discount_rates = [item.model_dump() for item in cost.discount_rates]
+        stochastic_inputs(cash_flows, discount_rates)
+        blocks = await run_tasks(
+            request,
+            [
+                (simulate_cash_flow_block, (cash_flows, discount_rates, cost.correlation, block_runs, block_seed,
+                                            cost.chunk_size, cost.irr))
+                for block_runs, block_seed in monte_carlo_blocks(cost.runs, cost.seed)
+            ],
+            timeout=cost.timeout
+        )
+        res = await run_in_threadpool(merge_cash_flow_blocks, blocks, cost.bins, cost.confidence, cost.percentiles)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SimulationPublic(method=cost.method, msg="Simulation has been solved", **res)
+
+
+def forecast_options(cost) -> dict:
+    return {
+        "model": cost.model,
+        "confidence": cost.confidence,
+        "season_length": cost.season_length,
+        "alpha": cost.alpha,
+        "beta": cost.beta,
+        "gamma": cost.gamma
+    }
+
+
 @router.post("/forecast", response_model=ForecastPublic)
-def forecast_costs(cost: ForecastCreate, session: SessionDep) -> ForecastPublic:
-    print(f"cost: {cost}")
-    historical_data = cost.historical_data
-    future_periods = cost.future_periods
-
-    X = np.array(range(len(historical_data))).reshape(-1, 1)
-    y = np.array(historical_data)
-    model = LinearRegression().fit(X, y)
-    future = np.array(range(len(historical_data), len(historical_data) + future_periods)).reshape(-1, 1)
-    res = model.predict(future)
-    if res is None:
-        return ForecastPublic(method="forecast", res=None, msg="Incorrect input value or the model dose not work")
-    return ForecastPublic(method="forecast", res=float(res[-1]), msg="Has been solved")
+def forecast_costs(cost: ForecastCreate) -> ForecastPublic:
+    """
+    Forecast one cost series over future_periods; res is the last forecast value,
+    forecast / lower / upper cover the whole horizon with prediction intervals
+    """
+    try:
+        res = forecast_series([cost.historical_data], cost.future_periods, **forecast_options(cost))
+    except ValueError as e:
+        return ForecastPublic(method="forecast", res=None, msg=f"Incorrect input value or the model dose not work: {e}")
+    forecast = res["forecast"][0]
+    return ForecastPublic(method="forecast", res=float(forecast[-1]), forecast=forecast.tolist(),
+                          lower=as_column(res["lower"][0]), upper=as_column(res["upper"][0]), msg="Has been solved")
+
+
+@router.post("/forecast/batch", response_model=ForecastBatchPublic)
+def forecast_costs_batch(cost: ForecastBatchCreate) -> ForecastBatchPublic:
+    """
+    Forecast many cost series (lengths may differ) in one request, one row per series in input order.
+    Smoothing models also return the alpha / beta / gamma chosen for every series.
+    """
+    try:
+        res = forecast_series(cost.series, cost.future_periods, **forecast_options(cost))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    columns = {
+        "forecast": res["forecast"].tolist(),
+        "lower": [as_column(row) for row in res["lower"]],
+        "upper": [as_column(row) for row in res["upper"]],
+        "sigma": as_column(res["sigma"])
+    }
+    for name in ("alpha", "beta", "gamma"):
+        if name in res:
+            columns[name] = res[name].tolist()
+    return ForecastBatchPublic(method=cost.method, msg="Forecast has been solved", **columns)
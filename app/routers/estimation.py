@@ -1,13 +1,14 @@
 import random
 import numpy as np
 
-from fastapi import APIRouter, HTTPException, Query
-from sqlmodel import select
-from typing import Annotated, List, Tuple, Dict
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Annotated, List, Optional, Tuple, Dict
 
 from app.dependencies import SessionDep
+from app.records import ExportFormat, PageSize, RecordFilterDep, export_response, read_page
 from app.model.estimation import EstimationPublic, CocomoCreate, Estimation, FunctionPointsCreate, ExpertCreate, \
     DelphiCreate, RegressionCreate, EstimationBase
+from app.write_behind import save_record
 
 router = APIRouter(
     prefix="/estimate",
@@ -17,20 +18,32 @@ router = APIRouter(
 
 
 @router.get("/", response_model=list[EstimationPublic])
-def read_estimations(
+async def read_estimations(
         session: SessionDep,
-        offset: int = 0,
-        limit: Annotated[int, Query(le=100)] = 100,
+        response: Response,
+        filters: RecordFilterDep,
+        after_id: Optional[int] = None,
+        limit: PageSize = 100,
+        offset: Annotated[int, Query(deprecated=True)] = 0,
 ):
     """
-    Show all estimations.
+    Show estimations.
+    Keyset pagination: pass the X-Next-Cursor response header as after_id to get the next page.
     """
-    estimations = session.exec(select(Estimation).offset(offset).limit(limit)).all()
+    estimations = await read_page(session, response, Estimation, filters, after_id, limit, offset)
     print(f"Estimations: {estimations}")
     return estimations
 
 
-def common_db_post(res: Dict, estimation: EstimationBase, session: SessionDep) -> EstimationPublic:
+@router.get("/export")
+async def export_estimations(filters: RecordFilterDep, fmt: ExportFormat = "csv"):
+    """
+    Stream all matching estimations as CSV or NDJSON.
+    """
+    return export_response(Estimation, filters, fmt)
+
+
+async def common_db_post(res: Dict, estimation: EstimationBase, session: SessionDep) -> EstimationPublic:
     """
     common operation of DB while creating an estimation
     """
@@ -38,9 +51,7 @@ def common_db_post(res: Dict, estimation: EstimationBase, session: SessionDep) -
     db_estimation.effort = res['effort']
     db_estimation.time = res['time']
     # write to database
-    session.add(db_estimation)
-    session.commit()
-    session.refresh(db_estimation)
+    await save_record(session, db_estimation)
     return db_estimation
 
 
@@ -72,14 +83,14 @@ def cocomo_model(kloc: float, complexity: str) -> Dict:
 
 
 @router.post("/empirical/cocomo", response_model=EstimationPublic)
-def cocomo_estimate(estimation: CocomoCreate, session: SessionDep) -> EstimationPublic:
+async def cocomo_estimate(estimation: CocomoCreate, session: SessionDep) -> EstimationPublic:
     """
     Interface of COCOMO model
     """
     # calculate
     res = cocomo_model(estimation.size, estimation.complexity)
     # database
-    db_estimation = common_db_post(res, estimation, session)
+    db_estimation = await common_db_post(res, estimation, session)
     return db_estimation
 
 
@@ -107,14 +118,14 @@ def function_points_analysis(fp: float, complexity: str) -> Dict:
 
 
 @router.post("/empirical/fpa", response_model=EstimationPublic)
-def function_points_estimate(estimation: FunctionPointsCreate, session: SessionDep) -> EstimationPublic:
+async def function_points_estimate(estimation: FunctionPointsCreate, session: SessionDep) -> EstimationPublic:
     """
     Interface of Function Points Analysis (FPA)
     """
     # calculate
     res = function_points_analysis(estimation.size, estimation.complexity)
     # database
-    db_estimation = common_db_post(res, estimation, session)
+    db_estimation = await common_db_post(res, estimation, session)
     return db_estimation
 
 
@@ -141,14 +152,14 @@ def expert_judgment(size: float, experience: int) -> Dict:
 
 
 @router.post("/heuristic/expert", response_model=EstimationPublic)
-def expert_judgment_estimate(estimation: ExpertCreate, session: SessionDep) -> EstimationPublic:
+async def expert_judgment_estimate(estimation: ExpertCreate, session: SessionDep) -> EstimationPublic:
     """
     Interface of Expert Judgment
     """
     # calculate
     res = expert_judgment(estimation.size, estimation.experience)
     # database
-    db_estimation = common_db_post(res, estimation, session)
+    db_estimation = await common_db_post(res, estimation, session)
     return db_estimation
 
 
@@ -174,7 +185,7 @@ def delphi_method(size: float, experience_list: List[int]) -> Dict:
 
 
 @router.post("/heuristic/delphi", response_model=EstimationPublic)
-def delphi_method_estimate(estimation: DelphiCreate, session: SessionDep) -> EstimationPublic:
+async def delphi_method_estimate(estimation: DelphiCreate, session: SessionDep) -> EstimationPublic:
     """
     Interface of Delphi Method Estimation
     """
@@ -183,7 +194,7 @@ def delphi_method_estimate(estimation: DelphiCreate, session: SessionDep) -> Est
     # just record the average of all experience
     estimation.experience = sum(estimation.experience_list) / len(estimation.experience_list)
     # database
-    db_estimation = common_db_post(res, estimation, session)
+    db_estimation = await common_db_post(res, estimation, session)
     return db_estimation
 
 
@@ -211,12 +222,12 @@ def regression_analysis(size: float, history: List[Tuple[float, float]]) -> Dict
 
 
 @router.post("/mathematical/regression", response_model=EstimationPublic)
-def regression_analysis_estimate(estimation: RegressionCreate, session: SessionDep) -> EstimationPublic:
+async def regression_analysis_estimate(estimation: RegressionCreate, session: SessionDep) -> EstimationPublic:
     """
     Interface of regression analysis estimation
     """
     # calculate
     res = regression_analysis(estimation.size, estimation.historical_data)
     # database
-    db_estimation = common_db_post(res, estimation, session)
+    db_estimation = await common_db_post(res, estimation, session)
     return db_estimation
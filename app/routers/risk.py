@@ -1,7 +1,19 @@
-from fastapi import FastAPI, HTTPException, Body, APIRouter
-from typing import Optional, List
-from app.model.decision_tree import build_tree, export_tree_with_ev, sensitivity_analysis, format_for_chart, multi_sensitivity_analysis, monte_carlo_simulation
+import json
+import numpy as np
+
+from fastapi import FastAPI, HTTPException, Body, APIRouter, Request, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, List, Iterable, Tuple, Callable, Awaitable, Any
+from app.cache import canonical_hash, result_cache, tree_cache, session_store
+from app.executor import max_workers, run_task, run_tasks
+from app.model.compiled_tree import CompiledTree, compile_tree
+from app.model.decision_tree import evaluate_tree, sensitivity_analysis, format_for_chart, sensitivity_axes, \
+    build_sensitivity_grid, split_sensitivity_fields, merge_sensitivity_grids, iter_sensitivity_rows, format_dense_grid, \
+    summarize_grid, monte_carlo_blocks, monte_carlo_block, monte_carlo_chunks, merge_monte_carlo, \
+    multi_monte_carlo_block, merge_multi_monte_carlo, summarize_samples
 from app.model.tree_node import TreeNodeInput
+from app.model.tree_session import TreeSession
 
 
 router = APIRouter(
@@ -10,8 +22,74 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+STREAM_CHUNK_SIZE = 65536
+# 网格点数超过该值时沿第一轴切分到多个进程计算
+PARALLEL_GRID_POINTS = 100000
+
+
+def stream_mode(payload: dict) -> Optional[str]:
+    """
+    解析请求中的 stream 参数：true / "ndjson" -> "ndjson"，"binary" -> "binary"，缺省 -> None
+    """
+    stream = payload.get("stream")
+    if not stream:
+        return None
+    if stream is True or stream == "ndjson":
+        return "ndjson"
+    if stream == "binary":
+        return "binary"
+    raise ValueError("stream must be true, \"ndjson\" or \"binary\"")
+
+
+async def load_tree(tree_data: dict) -> Tuple[str, CompiledTree]:
+    """
+    按树的规范化哈希查找已编译的决策树，未命中时编译并缓存，后续分析可跳过编译
+
+    Returns:
+        Tuple[str, CompiledTree]: (树的哈希, 编译后的树)
+    """
+    tree_key = await run_in_threadpool(canonical_hash, tree_data)
+    found, tree = tree_cache.get(tree_key)
+    if not found:
+        tree = await run_in_threadpool(compile_tree, tree_data)
+        tree_cache.put(tree_key, tree, tree.nbytes)
+    return tree_key, tree
+
+
+async def cached_analysis(kind: str, tree_key: str, params: Any, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    以 (分析类型, 树哈希, 分析参数) 的规范化哈希为键缓存分析结果
+    """
+    key = canonical_hash([kind, tree_key, params])
+    found, result = result_cache.get(key)
+    if not found:
+        result = await compute()
+        result_cache.put(key, result)
+    return result
+
+
+def ndjson_response(items: Iterable[dict]) -> StreamingResponse:
+    """
+    把逐条生成的结果以 NDJSON（每行一个 JSON 对象）流式返回
+    """
+    return StreamingResponse(
+        (json.dumps(item, ensure_ascii=False) + "\n" for item in items),
+        media_type="application/x-ndjson"
+    )
+
+
+def binary_response(arrays: Iterable[np.ndarray]) -> StreamingResponse:
+    """
+    把逐块生成的数组以小端 float64 原始字节流式返回（前端可直接用 Float64Array 解析）
+    """
+    return StreamingResponse(
+        (np.ascontiguousarray(array, dtype="<f8").tobytes() for array in arrays),
+        media_type="application/octet-stream"
+    )
+
 @router.post("/sensitivity")
-def run_sensitivity_analysis(
+async def run_sensitivity_analysis(
+    request: Request,
     payload: dict = Body(
             ...,
             example={
@@ -41,16 +119,21 @@ def run_sensitivity_analysis(
     对某个节点执行敏感性分析，并返回图表友好的结构
     """
     try:
-        result = sensitivity_analysis(
-            tree_data=payload["tree"],
-            target_path=payload["target_path"],
-            field=payload["field"],
-            value_range=payload["range"]
+        tree_key, tree = await load_tree(payload["tree"])
+        result = await cached_analysis(
+            "sensitivity", tree_key, [payload["target_path"], payload["field"], payload["range"]],
+            lambda: run_task(
+                request, sensitivity_analysis,
+                tree, payload["target_path"], payload["field"], payload["range"],
+                timeout=payload.get("timeout")
+            )
         )
         return {
             "chart_data": format_for_chart(result),  # 图表格式
             "sensitivity_result": result              # 原始结构
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 """
@@ -67,7 +150,8 @@ option = {
 """
 
 @router.post("/sensitivity/multi")
-def run_multi_sensitivity(
+async def run_multi_sensitivity(
+    request: Request,
 payload: dict = Body(
         ...,
         example={
@@ -107,19 +191,49 @@ payload: dict = Body(
 ):
     """
     多字段敏感性分析接口，返回所有组合下的 EV 值
+
+    可选参数:
+        output: "rows"（默认，逐组合列出）/ "dense"（按轴排列的 EV 多维数组）/ "summary"（EV 上下界及最优分支区域）
+        stream: output 为 "rows" 时可选 true / "ndjson"（逐行 NDJSON）或 "binary"（按 C 顺序展开的 float64 EV 网格）
     """
     try:
-        result = multi_sensitivity_analysis(
-            tree_data=payload["tree"],
-            fields=payload["fields"]
-        )
-        return {"grid_data": result}
+        output = payload.get("output", "rows")
+        if output not in ("rows", "dense", "summary"):
+            raise ValueError("output must be one of rows, dense, summary")
+        fields = payload["fields"]
+        points = int(np.prod([len(axis) for axis in sensitivity_axes(fields)]))
+        parts = split_sensitivity_fields(fields, max_workers if points > PARALLEL_GRID_POINTS else 1)
+        tree_key, tree = await load_tree(payload["tree"])
+
+        async def compute():
+            grids = await run_tasks(
+                request,
+                [(build_sensitivity_grid, (tree, part, output == "summary")) for part in parts],
+                timeout=payload.get("timeout")
+            )
+            return merge_sensitivity_grids(grids)
+
+        grid = await cached_analysis("sensitivity/multi", tree_key, [fields, output == "summary"], compute)
+        if output == "dense":
+            return await run_in_threadpool(format_dense_grid, grid, fields)
+        if output == "summary":
+            return summarize_grid(grid, fields)
+        mode = stream_mode(payload)
+        if mode == "ndjson":
+            return ndjson_response(iter_sensitivity_rows(grid, STREAM_CHUNK_SIZE))
+        if mode == "binary":
+            flat = grid["ev"].ravel()
+            return binary_response(flat[i:i + STREAM_CHUNK_SIZE] for i in range(0, flat.size, STREAM_CHUNK_SIZE))
+        rows = await run_in_threadpool(lambda: list(iter_sensitivity_rows(grid)))
+        return {"grid_data": rows}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/evaluate")
-def evaluate_decision_tree(input_tree: dict = Body(
+async def evaluate_decision_tree(request: Request, input_tree: dict = Body(
         ...,
         example={
             "name": "Choose Project",
@@ -153,20 +267,30 @@ def evaluate_decision_tree(input_tree: dict = Body(
         }
     """
     try:
-        root = build_tree(input_tree)
-        results = {}
-        for child in root.children:
-            results[child.name] = child.expected_value()
-
-        return {
-            "branch_expected_values": results,
-            "optimal_expected_value": root.expected_value(),
-            "tree_with_ev": export_tree_with_ev(root)
-        }
+        tree_key, tree = await load_tree(input_tree)
+        return await cached_analysis("evaluate", tree_key, None, lambda: run_task(request, evaluate_tree, tree))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+def iter_monte_carlo_lines(chunks: Iterable[np.ndarray], runs: int, bins: int):
+    """
+    逐块输出 EV 样本，同时写入紧凑的 float 数组，全部输出后再追加统计摘要
+    """
+    ev_results = np.empty(runs)
+    offset = 0
+    for chunk in chunks:
+        ev_results[offset:offset + len(chunk)] = chunk
+        yield {"offset": offset, "ev": np.round(chunk, 3).tolist()}
+        offset += len(chunk)
+    yield summarize_samples(ev_results, bins)
+
+
 @router.post("/monte-carlo")
-def run_monte_carlo(
+async def run_monte_carlo(
+    request: Request,
     payload: dict = Body(
         ...,
         example={
@@ -190,23 +314,269 @@ def run_monte_carlo(
                 "stddev": 15
             },
             "runs": 1000,
-            "bins": 10
+            "bins": 10,
+            "seed": 42
         }
     )
 ):
     """
     蒙特卡洛模拟接口：模拟节点某字段的随机变化下，整体期望值分布
+
+    可选参数 stream:
+        true / "ndjson": 每块样本一行 {"offset", "ev"}，最后一行为 {"summary", "histogram"}
+        "binary": 只返回 float64 EV 样本的原始字节流
     """
     try:
-        result = monte_carlo_simulation(
-            tree_data=payload["tree"],
-            target_path=payload["target_path"],
-            field=payload["field"],
-            distribution=payload["distribution"],
-            params=payload["params"],
-            runs=payload.get("runs", 1000),
-            bins=payload.get("bins", 10)
-        )
-        return result
+        mode = stream_mode(payload)
+        if mode:
+            runs = payload.get("runs", 1000)
+            _, tree = await load_tree(payload["tree"])
+            chunks = monte_carlo_chunks(
+                tree_data=tree,
+                target_path=payload["target_path"],
+                field=payload["field"],
+                distribution=payload["distribution"],
+                params=payload["params"],
+                runs=runs,
+                seed=payload.get("seed"),
+                chunk_size=STREAM_CHUNK_SIZE
+            )
+            if mode == "binary":
+                return binary_response(chunks)
+            return ndjson_response(iter_monte_carlo_lines(chunks, runs, payload.get("bins", 10)))
+
+        tree_key, tree = await load_tree(payload["tree"])
+        runs, bins, seed = payload.get("runs", 1000), payload.get("bins", 10), payload.get("seed")
+
+        async def compute():
+            blocks = await run_tasks(
+                request,
+                [
+                    (monte_carlo_block, (tree, payload["target_path"], payload["field"],
+                                         payload["distribution"], payload["params"], block_runs, block_seed))
+                    for block_runs, block_seed in monte_carlo_blocks(runs, seed)
+                ],
+                timeout=payload.get("timeout")
+            )
+            return await run_in_threadpool(merge_monte_carlo, blocks, bins)
+
+        # 未指定种子时每次结果都不同，不缓存
+        if seed is None:
+            return await compute()
+        params = [payload["target_path"], payload["field"], payload["distribution"], payload["params"], runs, bins, seed]
+        return await cached_analysis("monte-carlo", tree_key, params, compute)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+
+@router.post("/monte-carlo/multi")
+async def run_multi_monte_carlo(
+    request: Request,
+    payload: dict = Body(
+        ...,
+        example={
+            "tree": {
+                "name": "Choose Project",
+                "children": [
+                    {
+                        "name": "Dev A",
+                        "children": [
+                            {"name": "A Success", "value": 100, "probability": 0.7},
+                            {"name": "A Failure", "value": -20, "probability": 0.3}
+                        ]
+                    },
+                    {
+                        "name": "Dev B",
+                        "children": [
+                            {"name": "B Success", "value": 150, "probability": 0.5},
+                            {"name": "B Failure", "value": -40, "probability": 0.5}
+                        ]
+                    }
+                ]
+            },
+            "inputs": [
+                {
+                    "target_path": ["Dev A", "A Success"],
+                    "field": "value",
+                    "distribution": "triangular",
+                    "params": {"low": 80, "mode": 100, "high": 130}
+                },
+                {
+                    "target_path": ["Dev B", "B Success"],
+                    "field": "value",
+                    "distribution": "pert",
+                    "params": {"low": 100, "mode": 150, "high": 180}
+                }
+            ],
+            "correlation": [[1, 0.6], [0.6, 1]],
+            "runs": 10000,
+            "bins": 10,
+            "percentiles": [5, 50, 95],
+            "seed": 42
+        }
+    )
+):
+    """
+    多变量蒙特卡洛模拟接口：多个节点字段按各自分布（normal/uniform/triangular/lognormal/pert/empirical）
+    同时抽样，可选相关系数矩阵（高斯 Copula），返回 EV 分布、百分位和各输入的方差贡献（tornado）
+    """
+    try:
+        inputs = payload["inputs"]
+        tree_key, tree = await load_tree(payload["tree"])
+        correlation, seed = payload.get("correlation"), payload.get("seed")
+        runs, chunk_size = payload.get("runs", 10000), payload.get("chunk_size", 100000)
+        bins, percentiles = payload.get("bins", 10), payload.get("percentiles", [5, 25, 50, 75, 95])
+
+        async def compute():
+            blocks = await run_tasks(
+                request,
+                [
+                    (multi_monte_carlo_block, (tree, inputs, correlation, block_runs, block_seed, chunk_size))
+                    for block_runs, block_seed in monte_carlo_blocks(runs, seed)
+                ],
+                timeout=payload.get("timeout")
+            )
+            return await run_in_threadpool(merge_multi_monte_carlo, inputs, blocks, bins, percentiles)
+
+        # 未指定种子时每次结果都不同，不缓存
+        if seed is None:
+            return await compute()
+        params = [inputs, correlation, runs, chunk_size, bins, percentiles, seed]
+        return await cached_analysis("monte-carlo/multi", tree_key, params, compute)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_tree_session(session_id: str) -> TreeSession:
+    found, session = session_store.get(session_id)
+    if not found:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
+
+
+def edit_tree_session(session_id: str, edit: Callable[[TreeSession], dict]) -> dict:
+    """
+    在会话锁内执行一次编辑，并刷新会话的空闲时间与内存估算
+    """
+    session = get_tree_session(session_id)
+    try:
+        with session.lock:
+            result = edit(session)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    session_store.put(session_id, session, session.nbytes)
+    return result
+
+
+@router.post("/sessions")
+async def create_tree_session(input_tree: dict = Body(
+        ...,
+        example={
+            "name": "Choose Project",
+            "children": [
+                {
+                    "name": "Dev A",
+                    "children": [
+                        {"name": "A Success", "value": 100, "probability": 0.7},
+                        {"name": "A Failure", "value": -20, "probability": 0.3}
+                    ]
+                },
+                {
+                    "name": "Dev B",
+                    "children": [
+                        {"name": "B Success", "value": 150, "probability": 0.5},
+                        {"name": "B Failure", "value": -40, "probability": 0.5}
+                    ]
+                }
+            ]
+        }
+    )):
+    """
+    创建决策树编辑会话：树只上传一次，之后按路径增量修改节点
+
+    返回值: 与 /decision-tree/evaluate 相同的结构，另含 session_id
+    """
+    try:
+        _, tree = await load_tree(input_tree)
+        session = await run_in_threadpool(TreeSession, tree)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    session_store.put(session.session_id, session, session.nbytes)
+    return session.summary()
+
+
+@router.get("/sessions/{session_id}")
+def read_tree_session(session_id: str):
+    """
+    返回会话中当前的完整决策树及各节点期望值
+    """
+    session = get_tree_session(session_id)
+    with session.lock:
+        return session.summary()
+
+
+@router.patch("/sessions/{session_id}/nodes")
+def update_tree_session_node(
+    session_id: str,
+    payload: dict = Body(..., example={"path": ["Dev A", "A Success"], "probability": 0.8})
+):
+    """
+    修改节点的 value / probability，只沿祖先路径重新计算 EV，返回 EV 发生变化的节点
+    """
+    changes = {k: v for k, v in payload.items() if k != "path"}
+    return edit_tree_session(session_id, lambda session: session.update_node(payload.get("path", []), changes))
+
+
+@router.post("/sessions/{session_id}/nodes")
+def add_tree_session_node(
+    session_id: str,
+    payload: dict = Body(..., example={
+        "path": ["Dev B"],
+        "node": {"name": "B Delay", "value": 20, "probability": 0.1}
+    })
+):
+    """
+    在 path 指向的节点下新增子节点（可以是一棵子树），返回新增子树及 EV 发生变化的祖先
+    """
+    return edit_tree_session(session_id, lambda session: session.add_child(payload.get("path", []), payload["node"]))
+
+
+@router.delete("/sessions/{session_id}/nodes")
+def remove_tree_session_node(session_id: str, path: List[str] = Query(...)):
+    """
+    删除 path 指向的节点及其子树（path 以重复的查询参数传递），返回 EV 发生变化的祖先
+    """
+    return edit_tree_session(session_id, lambda session: session.remove_node(path))
+
+
+@router.delete("/sessions/{session_id}")
+def delete_tree_session(session_id: str):
+    """
+    结束会话并释放其内存
+    """
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"session_id": session_id, "deleted": True}
+
+
+@router.get("/cache")
+async def read_cache_stats():
+    """
+    查看结果缓存与决策树编译缓存的命中、未命中、容量等统计
+    """
+    return {"results": result_cache.stats(), "trees": tree_cache.stats()}
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """
+    清空结果缓存与决策树编译缓存
+    """
+    result_cache.clear()
+    tree_cache.clear()
+    return {"results": result_cache.stats(), "trees": tree_cache.stats()}
@@ -1,9 +1,15 @@
-import numpy as np
+import math
 
-from typing import Dict
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 
-from app.model.scheduler import Activity, ProjectData
+from app.executor import default_timeout, max_workers, run_tasks
+from app.model.cpm import ProjectNetwork
+from app.model.leveling import generate_schedule, level_resources
+from app.model.optimizer import optimize_schedule, optimize_seeds
+from app.model.resource_calendar import resource_model
+from app.model.scheduler import OptimizeData, ProjectData
+from app.model.smoothing import smooth_resources
 
 router = APIRouter(
     prefix="/resource",
@@ -12,112 +18,99 @@ router = APIRouter(
 )
 
 
-def calc_earliest_start_times(activities: Dict[str, Activity]) -> Dict[str, int]:
-    ES = {}
-    while len(ES) < len(activities):
-        for act, info in activities.items():
-            if act in ES:
-                continue
-            if all(pred in ES for pred in info.predecessors):
-                ES[act] = max([ES[pred] + activities[pred].duration for pred in info.predecessors] or [1])
-    return ES
-
-
-def calc_latest_start_times(activities: Dict[str, Activity], ES: Dict[str, int]) -> Dict[str, int]:
-    project_end = max(ES[act] + activities[act].duration - 1 for act in activities)
-    LF = {}
-    while len(LF) < len(activities):
-        for act, info in activities.items():
-            if act in LF:
-                continue
-            successors = [a for a, i in activities.items() if act in i.predecessors]
-            if all(suc in LF for suc in successors):
-                if successors:
-                    LF[act] = min([LF[suc] - info.duration for suc in successors])
-                else:
-                    LF[act] = project_end - info.duration + 1
-    return LF
+@router.post("/cpm", summary="critical path method", tags=["Resource Optimization"])
+def critical_path_api(data: ProjectData):
+    """
+    关键路径法：返回每个活动的 ES/EF/LS/LF、总时差、自由时差，以及关键活动和工期
+    """
+    try:
+        network = ProjectNetwork(data.activities)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cpm = network.critical_path()
+    columns = {key: cpm[key].tolist() for key in ("es", "ef", "ls", "lf", "total_float", "free_float")}
+    schedule = {
+        name: {key: values[i] for key, values in columns.items()}
+        for i, name in enumerate(network.names)
+    }
+    critical = [network.names[i] for i in network.order if cpm["total_float"][i] == 0]
+    return {"activities": schedule, "critical_activities": critical, "project_end": cpm["project_end"]}
 
 
 @router.post("/leveling", summary="resource leveling algorithm", tags=["Resource Optimization"])
 def resource_leveling_api(data: ProjectData):
-    # 转换活动为字典
-    activities = {a.name: a for a in data.activities}
-    resource_limit = data.resource_limit
-
-    ES = calc_earliest_start_times(activities)
-    start_times = ES.copy()
-    project_end = max(start_times[act] + activities[act].duration - 1 for act in activities)
-
-    while True:
-        daily_resources = {day: 0 for day in range(1, project_end + 10)}
-        for act, info in activities.items():
-            st = start_times[act]
-            for d in range(st, st + info.duration):
-                daily_resources[d] += info.resource
-
-        overloaded_days = [d for d, r in daily_resources.items() if r > resource_limit]
-        if not overloaded_days:
-            break
-        od = overloaded_days[0]
-
-        candidates = []
-        for act, info in activities.items():
-            st = start_times[act]
-            if st <= od < st + info.duration:
-                candidates.append(act)
-        candidates.sort(key=lambda x: len(activities[x].predecessors), reverse=True)
-        to_delay = candidates[0]
-        start_times[to_delay] += 1
-        project_end = max(project_end, start_times[to_delay] + activities[to_delay].duration - 1)
-
+    try:
+        network = ProjectNetwork(data.activities)
+        calendar, demand = resource_model(data)
+        if data.method == "delay":
+            start = level_resources(network, demand, calendar)
+        else:
+            start = generate_schedule(network, demand, calendar, data.method, data.priority_rule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    start_times = dict(zip(network.names, start.tolist()))
+    project_end = int((start + network.duration).max()) - 1 if len(network) else 0
     return {"start_times": start_times, "project_end": project_end}
 
 
 @router.post("/smoothing", summary="resource smoothing algorithm", tags=["Resource Optimization"])
 def resource_smoothing_api(data: ProjectData):
-    activities = {a.name: a for a in data.activities}
-    resource_limit = data.resource_limit
-
-    ES = calc_earliest_start_times(activities)
-    LF = calc_latest_start_times(activities, ES)
-    start_times = ES.copy()
-    project_end = max(ES[act] + activities[act].duration - 1 for act in activities)
-
-    max_iter = 1000
-    for _ in range(max_iter):
-        daily_resources = {day: 0 for day in range(1, project_end + 1)}
-        for act, info in activities.items():
-            st = start_times[act]
-            for d in range(st, st + info.duration):
-                daily_resources[d] += info.resource
-
-        variance_before = np.var(list(daily_resources.values()))
-        improved = False
+    try:
+        network = ProjectNetwork(data.activities)
+        calendar, demand = resource_model(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    start = smooth_resources(network, demand, calendar)
+    start_times = dict(zip(network.names, start.tolist()))
+    project_end = int((start + network.duration).max()) - 1 if len(network) else 0
+    return {"start_times": start_times, "project_end": project_end}
 
-        for act, info in activities.items():
-            current_start = start_times[act]
-            for new_start in range(ES[act], LF[act] + 1):
-                if new_start == current_start:
-                    continue
-                start_times[act] = new_start
-                daily_resources_tmp = {day: 0 for day in range(1, project_end + 1)}
-                for a, i in activities.items():
-                    st = start_times[a]
-                    for d in range(st, st + i.duration):
-                        daily_resources_tmp[d] += i.resource
-                if max(daily_resources_tmp.values()) > resource_limit:
-                    continue
-                variance_after = np.var(list(daily_resources_tmp.values()))
-                if variance_after < variance_before:
-                    variance_before = variance_after
-                    improved = True
-                    break
-                else:
-                    start_times[act] = current_start
-            if improved:
-                break
-        if not improved:
-            break
 
-    return {"start_times": start_times, "project_end": project_end}
+def optimize_timeout(time_budget: float, restarts: int) -> float:
+    """
+    重启数超过进程数时多出的重启要排队，每一轮都要用满 time_budget；线程池中所有重启同时运行
+    """
+    rounds = math.ceil(restarts / max_workers) if max_workers > 0 else 1
+    return rounds * time_budget + default_timeout
+
+
+@router.post("/optimize", summary="metaheuristic schedule optimizer", tags=["Resource Optimization"])
+async def resource_optimize_api(request: Request, data: OptimizeData):
+    """
+    元启发式进度优化：以贪心结果为起点（makespan 用串行进度生成方案，peak / variance 用资源平滑），
+    在进程池中并行运行 restarts 次独立的模拟退火 / 遗传搜索，每次受 time_budget 秒的墙钟时间约束，
+    返回最优进度及其收敛过程
+    """
+    try:
+        network = ProjectNetwork(data.activities)
+        calendar, demand = resource_model(data)
+        if data.objective == "makespan":
+            initial = await run_in_threadpool(generate_schedule, network, demand, calendar)
+        else:
+            initial = await run_in_threadpool(smooth_resources, network, demand, calendar)
+        results = await run_tasks(
+            request,
+            [
+                (optimize_schedule, (network, demand, calendar, data.objective, data.algorithm,
+                                     data.time_budget, initial, seed))
+                for seed in optimize_seeds(data.restarts, data.seed)
+            ],
+            timeout=optimize_timeout(data.time_budget, data.restarts)
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    best = min(results, key=lambda r: r["cost"])
+    start = best["start"]
+    return {
+        "start_times": dict(zip(network.names, start)),
+        "project_end": max((s + d - 1 for s, d in zip(start, network.duration.tolist())), default=0),
+        "objective": data.objective,
+        "value": best["value"],
+        "overload": best["overload"],
+        "iterations": best["iterations"],
+        "restarts": [{"cost": r["cost"], "value": r["value"], "iterations": r["iterations"]} for r in results],
+        "trace": best["trace"]
+    }
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import time
+
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Table, insert
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.dependencies import engine
+
+logger = logging.getLogger(__name__)
+
+# 写后（write-behind）持久化配置：DB_WRITE_BEHIND=true 时计算记录先进入内存队列，由后台任务批量写库
+write_behind = os.getenv("DB_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+queue_size = int(os.getenv("DB_WRITE_QUEUE_SIZE", "10000"))
+batch_size = int(os.getenv("DB_WRITE_BATCH_SIZE", "500"))
+flush_interval = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "0.5"))
+enqueue_timeout = float(os.getenv("DB_WRITE_ENQUEUE_TIMEOUT", "5"))
+
+_STOP = object()
+
+
+def _row(record: SQLModel) -> Tuple[Table, dict]:
+    """
+    在入队时把记录取值为 (表, 列值) 快照；自增主键为空时不写入，由数据库生成
+    """
+    table = record.__table__
+    row = {column.name: getattr(record, column.name) for column in table.columns}
+    for column in table.primary_key.columns:
+        if row.get(column.name) is None:
+            row.pop(column.name, None)
+    return table, row
+
+
+class WriteBehindQueue:
+    """
+    有界的写后队列：请求只负责入队，后台任务攒满 batch_size 条或距本批第一条记录 flush_interval 秒后，
+    按表分组用一条 executemany 的 INSERT 写入。队列满时入队最多等待 enqueue_timeout 秒（反压），
+    仍无空位则返回 503。
+
+    属性:
+        maxsize (int): 队列容量
+        batch_size (int): 每批最多写入的记录数
+        flush_interval (float): 一批记录最长等待时间（秒）
+        enqueue_timeout (float): 队列满时入队的最长等待时间（秒）
+        enqueued / written / failed / rejected (int): 入队、写入成功、写入失败、因队列满被拒绝的记录数
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, flush_interval: float, enqueue_timeout: float):
+        self.maxsize = maxsize
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.peak_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    def start(self):
+        """
+        在当前事件循环中创建队列并启动后台写入任务（在 lifespan 开始时调用）
+        """
+        if self._task is None:
+            self._queue = asyncio.Queue(self.maxsize)
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        停止接收新记录，写完队列中剩余的记录后结束后台任务（在 lifespan 结束时调用）
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        # 发出停止信号时仍在等待空位的请求，其记录排在停止标记之后，在这里补写
+        leftover = []
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+        if leftover:
+            await self._flush(leftover)
+        self._task = None
+        self._queue = None
+
+    async def put(self, record: SQLModel):
+        """
+        记录入队；队列满时等待空位，超过 enqueue_timeout 返回 503
+        """
+        item = _row(record)
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(item), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Write queue is full, please retry later")
+        self.enqueued += 1
+        self.peak_depth = max(self.peak_depth, self._queue.qsize())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Table, dict]]):
+        """
+        按表分组批量写入一批记录；写入失败时记录日志并丢弃该批，避免阻塞后续记录
+        """
+        groups: Dict[Table, List[dict]] = {}
+        for table, row in batch:
+            groups.setdefault(table, []).append(row)
+        began = time.perf_counter()
+        try:
+            async with engine.begin() as conn:
+                for table, rows in groups.items():
+                    await conn.execute(insert(table), rows)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("write-behind flush of %d records failed", len(batch))
+        else:
+            self.written += len(batch)
+        elapsed = (time.perf_counter() - began) * 1000
+        self.batches += 1
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        self._total_flush_ms += elapsed
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "capacity": self.maxsize,
+            "peak_depth": self.peak_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 3) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 3)
+        }
+
+
+write_queue = WriteBehindQueue(queue_size, batch_size, flush_interval, enqueue_timeout)
+
+
+async def save_record(session: AsyncSession, record: SQLModel) -> SQLModel:
+    """
+    保存一条计算记录：写后模式下入队后立即返回（自增主键为空），否则在当前会话中提交并刷新
+    """
+    if write_queue.running:
+        await write_queue.put(record)
+        return record
+    session.add(record)
+    await session.commit()
+    await session.refresh(record)
+    return record
@@ -1,16 +1,21 @@
 from contextlib import asynccontextmanager
 
-import uvicorn
-
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import estimation, budget_cost, risk, scheduler
-from app.dependencies import create_db_and_tables
+from app.dependencies import create_db_and_tables, dispose_engine
+from app.executor import shutdown_pool
+from app.write_behind import write_behind, write_queue
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    await create_db_and_tables()
+    if write_behind:
+        write_queue.start()
     yield
+    await write_queue.stop()  # 写完队列中剩余的记录后再释放连接池
+    shutdown_pool()
+    await dispose_engine()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -30,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # 分页游标，前端需要读取
 )
 
 @app.get("/")
@@ -37,5 +43,15 @@ async def root():
     return {"message": "Hello Bigger Applications!"}
 
 
+@app.get("/write-behind")
+async def write_behind_stats():
+    """
+    Queue depth and flush latency of the write-behind persistence
+    """
+    return write_queue.stats()
+
+
 if __name__ == '__main__':
+    import uvicorn  # 只在直接运行时需要，作为 ASGI 应用被导入时不加载
+
     uvicorn.run(app, host="localhost", port=8000)
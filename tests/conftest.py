@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 测试使用临时 SQLite 数据库；分析任务在线程池中执行，不启动进程池
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ["RISK_WORKERS"] = "0"
+os.environ["DB_WRITE_BEHIND"] = "false"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def random_tree(rng, depth=4, name="Root"):
+    """
+    随机生成机会节点 / 决策节点混合的决策树；机会节点的子节点概率之和为 1
+    """
+    node = {"name": name}
+    if depth == 0 or (name != "Root" and rng.random() < 0.3):
+        node["value"] = float(rng.integers(-100, 200))
+        return node
+    width = int(rng.integers(2, 4))
+    children = [random_tree(rng, depth - 1, f"{name}.{k}") for k in range(width)]
+    if rng.random() < 0.5:
+        for child, probability in zip(children, rng.dirichlet(np.ones(width))):
+            child["probability"] = float(probability)
+    node["children"] = children
+    return node
+
+
+def paths(node, prefix=()):
+    """
+    深度优先遍历嵌套字典形式的树，依次产生每个非根节点的 (路径, 节点)
+    """
+    for child in node.get("children", []):
+        path = prefix + (child["name"],)
+        yield list(path), child
+        yield from paths(child, path)
@@ -0,0 +1,53 @@
+import time
+
+from app.cache import ResultCache, canonical_hash
+
+
+def test_canonical_hash_ignores_key_order():
+    assert canonical_hash({"a": 1, "b": [1, {"c": 2, "d": 3}]}) == canonical_hash({"b": [1, {"d": 3, "c": 2}], "a": 1})
+    assert canonical_hash({"a": 1}) != canonical_hash({"a": 1.5})
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResultCache(max_bytes=300, ttl=0)
+    cache.put("a", "A", size=100)
+    cache.put("b", "B", size=100)
+    cache.put("c", "C", size=100)
+    assert cache.get("a") == (True, "A")
+    cache.put("d", "D", size=100)
+    assert cache.get("b") == (False, None)
+    assert [cache.get(key)[0] for key in "acd"] == [True, True, True]
+    stats = cache.stats()
+    assert (stats["entries"], stats["size_bytes"], stats["evictions"]) == (3, 300, 1)
+    assert (stats["hits"], stats["misses"]) == (4, 1)
+
+    # 超过容量上限的单个条目不缓存，也不挤掉已有条目
+    cache.put("huge", "H", size=301)
+    assert cache.get("huge") == (False, None)
+    assert cache.stats()["entries"] == 3
+
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(max_bytes=1000, ttl=0.05)
+    cache.put("a", [1.0, 2.0])
+    assert cache.get("a") == (True, [1.0, 2.0])
+    time.sleep(0.1)
+    assert cache.get("a") == (False, None)
+    assert cache.stats()["size_bytes"] == 0
+
+
+def test_repeated_analysis_hits_cache(client):
+    tree = {"name": "Root", "children": [{"name": "A", "value": 5}, {"name": "B", "value": 7}]}
+    before = client.delete("/decision-tree/cache").json()
+    first = client.post("/decision-tree/evaluate", json=tree).json()
+    # 键顺序不同的同一棵树命中同一条缓存
+    reordered = {"children": tree["children"], "name": tree["name"]}
+    assert client.post("/decision-tree/evaluate", json=reordered).json() == first
+    stats = client.get("/decision-tree/cache").json()
+    assert stats["results"]["hits"] - before["results"]["hits"] == 1
+    assert stats["results"]["misses"] - before["results"]["misses"] == 1
+    assert stats["trees"]["hits"] - before["trees"]["hits"] == 1
+    assert stats["trees"]["entries"] == 1
+
+    cleared = client.delete("/decision-tree/cache").json()
+    assert cleared["results"]["entries"] == 0 and cleared["trees"]["entries"] == 0
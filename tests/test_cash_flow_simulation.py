@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from app.model.cash_flow_simulation import SampleSketch, merge_cash_flow_blocks, simulate_cash_flow_block
+from app.model.decision_tree import summarize_samples
+
+
+def _mixed_sample(seed=1):
+    rng = np.random.default_rng(seed)
+    return np.concatenate([rng.normal(100, 30, 60000), rng.lognormal(3, 1, 40000) - 50, rng.normal(-20, 5, 20000)])
+
+
+def test_merged_sketch_matches_exact_statistics():
+    x = _mixed_sample()
+    parts = np.array_split(np.random.default_rng(2).permutation(x), 7)
+    sketch = SampleSketch.merge([SampleSketch.from_samples(p) for p in parts])
+    width = (x.max() - x.min()) / len(sketch.counts)
+
+    assert sketch.count == len(x)
+    assert sketch.mean == pytest.approx(x.mean())
+    assert np.sqrt(sketch.m2 / sketch.count) == pytest.approx(x.std())
+    assert (sketch.min, sketch.max) == (x.min(), x.max())
+    assert sketch.negative == (x < 0).sum()
+
+    q = np.array([0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99])
+    assert np.abs(sketch.quantile(q) - np.quantile(x, q)).max() < width
+    threshold = np.quantile(x, 0.05)
+    assert sketch.tail_mean(threshold) == pytest.approx(x[x <= threshold].mean(), abs=width)
+
+    exact, merged = summarize_samples(x, 10), sketch.summary(10)
+    assert merged["summary"] == exact["summary"]
+    assert [h["range"] for h in merged["histogram"]] == [h["range"] for h in exact["histogram"]]
+    counts = np.array([h["count"] for h in merged["histogram"]])
+    assert counts.sum() == len(x)
+    assert np.abs(counts - [h["count"] for h in exact["histogram"]]).max() <= 7
+
+
+def test_constant_sample_sketch():
+    sketches = [SampleSketch.from_samples(np.full(10, 5.0)), None, SampleSketch.from_samples(np.full(5, 5.0))]
+    sketch = SampleSketch.merge(sketches)
+    assert sketch.quantile(0.3) == 5.0
+    assert sketch.summary(10) == summarize_samples(np.full(15, 5.0), 10)
+    assert SampleSketch.from_samples(np.array([])) is None
+
+
+def test_blocks_merge_without_raw_samples():
+    cash_flows = [{"value": -1000}, {"distribution": "normal", "params": {"mean": 400, "stddev": 100}},
+                  {"distribution": "uniform", "params": {"low": 200, "high": 600}}, {"value": 300}]
+    rates = [{"value": 0.1}]
+    blocks = [simulate_cash_flow_block(cash_flows, rates, None, 20000, seed) for seed in range(3)]
+    # 每块只返回固定大小的摘要
+    assert all(block["npv"].counts.nbytes <= 8 * 4096 for block in blocks)
+    result = merge_cash_flow_blocks(blocks, bins=5, confidence=0.9)
+    assert sum(h["count"] for h in result["npv"]["histogram"]) == 60000
+    # NPV = c1/1.1 + c2/1.21 + c3/1.331 + c4/1.4641 - c0 (the repo's npv convention)
+    expected_mean = -1000 / 1.1 + 400 / 1.21 + 400 / 1.331 + 300 / 1.4641 + 1000
+    assert result["npv"]["summary"]["mean"] == pytest.approx(expected_mean, abs=1)
+    # 90% VaR 是 NPV 第 10 百分位数的相反数，位于 p5 与 p25 之间；CVaR 是更深的尾部均值
+    assert -result["npv"]["percentiles"]["p25"] <= result["value_at_risk"] <= -result["npv"]["percentiles"]["p5"]
+    assert result["conditional_value_at_risk"] >= result["value_at_risk"]
+    assert result["irr_unsolved_share"] == 0
+    assert sum(h["count"] for h in result["irr"]["histogram"]) == 60000
+
+
+def test_simulation_endpoint(client):
+    payload = {
+        "cash_flows": [{"value": 1000}, {"distribution": "normal", "params": {"mean": 400, "stddev": 100}},
+                       {"value": 500}, {"value": 300}],
+        "discount_rates": [{"distribution": "uniform", "params": {"low": 0.05, "high": 0.15}}],
+        "runs": 30000,
+        "seed": 7
+    }
+    response = client.post("/cost/simulation", json=payload)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert sum(h["count"] for h in result["npv"]["histogram"]) == 30000
+    assert result["conditional_value_at_risk"] >= result["value_at_risk"]
+    assert client.post("/cost/simulation", json=payload).json() == result
+    assert client.post("/cost/simulation", json=dict(payload, percentiles=[150])).status_code == 400
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+import app.model.cash_flows as cash_flows
+from app.model.cash_flows import break_even_rates, curve_discount_factors, curve_npv, discount_factors, mirr, \
+    npv_batch, npv_curve, pad_cash_flows, payback_batch
+from app.routers.budget_cost import npv, payback_period
+
+
+def _random_series(seed: int, count: int, longest: int) -> list:
+    rng = np.random.default_rng(seed)
+    return [[-float(rng.integers(100, 1000))] + list(np.round(rng.normal(50, 120, rng.integers(1, longest)), 2))
+            for _ in range(count)]
+
+
+def test_npv_batch_matches_npv():
+    series = _random_series(1, 500, 25)
+    flows = pad_cash_flows(series)
+    # 短序列补零后 NPV 不变
+    assert flows.shape == (500, max(len(s) for s in series))
+    np.testing.assert_allclose(npv_batch(flows, np.array([0.08])), [npv(s, 0.08) for s in series], rtol=1e-12)
+    rates = np.random.default_rng(2).uniform(-0.5, 2, len(series))
+    np.testing.assert_allclose(npv_batch(flows, rates), [npv(s, r) for s, r in zip(series, rates)], rtol=1e-12)
+
+
+def test_npv_batch_rejects_bad_rates():
+    flows = pad_cash_flows([[-100, 50], [-10, 20]])
+    with pytest.raises(ValueError):
+        npv_batch(flows, np.array([0.1, 0.2, 0.3]))
+    with pytest.raises(ValueError):
+        npv_batch(flows, np.array([-1.0]))
+    with pytest.raises(ValueError):
+        pad_cash_flows([[-100, 50], []])
+
+
+def test_payback_batch_matches_payback_period():
+    series = _random_series(3, 500, 15) + [[5, -1], [-1, 0, 0], [0]]
+    expected = [payback_period(s) for s in series]
+    assert any(e is None for e in expected)
+    result = payback_batch(pad_cash_flows(series))
+    assert [None if np.isnan(p) else int(p) for p in result] == expected
+
+
+def test_batch_endpoint(client):
+    series = [[-1000, 300, 400, 500], [-100, 20], [100, 20], [-100, 230, -132]]
+    body = client.post("/cost/batch", json={"cash_flows": series, "discount_rates": [0.1]}).json()
+    assert body["npv"] == pytest.approx([npv(s, 0.1) for s in series])
+    assert body["pp"] == [payback_period(s) for s in series] == [3, None, 0, 1]
+    assert body["irr"][1:] == [pytest.approx(-80), None, pytest.approx(10)]
+    assert body["irr_status"] == [0, 0, 2, 1]
+
+    npv_only = client.post("/cost/batch", json={"cash_flows": series, "discount_rates": [0.1, 0.2, 0.3, 0.4],
+                                                "metrics": ["npv"]}).json()
+    assert npv_only["irr"] is None and npv_only["pp"] is None
+    assert npv_only["npv"] == pytest.approx([npv(s, r) for s, r in zip(series, [0.1, 0.2, 0.3, 0.4])])
+    response = client.post("/cost/batch", json={"cash_flows": series, "discount_rates": [0.1, 0.2]})
+    assert response.status_code == 400
+
+
+def test_npv_and_payback_endpoints(client):
+    body = client.post("/cost/npv", json={"cash_flows": [-1000, 300, 400, 500], "discount_rate": 0.1}).json()
+    assert body["npv_value"] == pytest.approx(npv([-1000, 300, 400, 500], 0.1))
+    body = client.post("/cost/pp", json={"cash_flows": [-1000, 300, 400, 500]}).json()
+    assert body["pp_value"] == 3
+    body = client.post("/cost/pp", json={"cash_flows": [-1000, 300]}).json()
+    assert body["pp_value"] is None
+
+
+def test_mirr_matches_numpy_financial():
+    npf = pytest.importorskip("numpy_financial")
+    for flows in _random_series(4, 200, 12) + [[-100, 230, -132], [-50, -20, 10, 90]]:
+        flows = np.array(flows)
+        expected = npf.mirr(flows, 0.07, 0.12)
+        value = mirr(flows, 0.07, 0.12)
+        assert (np.isnan(value) and np.isnan(expected)) or value == pytest.approx(expected, rel=1e-10)
+    assert np.isnan(mirr(np.array([100.0, 20.0]), 0.1, 0.1))
+
+
+def test_flat_curves_match_flat_rates():
+    factors = curve_discount_factors([[0.05], [0.1, 0.1, 0.1, 0.1, 0.1, 0.1]], 5)
+    np.testing.assert_allclose(factors, discount_factors(np.array([0.05, 0.1]), 5), rtol=1e-14)
+    # 期限结构：第 t 期按前 t 期利率连乘折现，曲线短于序列时沿用最后一个利率
+    np.testing.assert_allclose(curve_discount_factors([[0.1, 0.2]], 3)[0], [1 / 1.1, 1 / 1.1 / 1.2, 1 / 1.1 / 1.2 ** 2])
+    with pytest.raises(ValueError):
+        curve_discount_factors([[0.1, -1.0]], 3)
+
+
+def test_npv_curve_in_chunks(monkeypatch):
+    flows = np.array(_random_series(7, 1, 40)[0])
+    rates = np.linspace(-0.2, 0.8, 53)
+    curves = [list(row) for row in np.random.default_rng(7).uniform(0, 0.3, (17, 5))]
+    full = npv_curve(flows, rates), curve_npv(flows, curves)
+    # 每块只放得下 3 行折现因子，分块结果与整块计算一致
+    monkeypatch.setattr(cash_flows, "NPV_CURVE_CELLS", 3 * len(flows))
+    np.testing.assert_allclose(npv_curve(flows, rates), full[0], rtol=1e-12)
+    np.testing.assert_allclose(curve_npv(flows, curves), full[1], rtol=1e-12)
+    np.testing.assert_allclose(full[0], [npv(list(flows), r) for r in rates], rtol=1e-9)
+    with pytest.raises(ValueError, match="Rate curve 5 is empty"):
+        curve_npv(flows, curves[:5] + [[]])
+
+
+def test_break_even_rates_are_npv_roots():
+    # NPV 约定下 -c0 + Σ c_(t-1) x^t 的根：这条序列的 NPV 在 0（恰好落在网格上）和约 13.7% 处为 0
+    flows = np.array([-150.0, -150.0, 100.0, 50.0])
+    rates = np.linspace(-0.5, 0.5, 101)
+    values = discount_factors(rates, len(flows)) @ flows - flows[0]
+    roots = break_even_rates(flows, rates, values)
+    assert len(roots) == 2 and roots[0] == 0
+    for root in roots:
+        assert npv(list(flows), root) == pytest.approx(0, abs=1e-9)
+
+
+def test_npv_curve_endpoint(client):
+    # 首项为 0 时 NPV 即各期现金流按期末折现之和，在 0~50% 之间有一个盈亏平衡利率
+    flows = [0, -1000, 300, 400, 500]
+    payload = {"cash_flows": flows, "rate_min": 0, "rate_max": 0.5, "rate_steps": 11,
+               "rate_curves": [[0.1], [0.05, 0.08]], "finance_rate": 0.06, "reinvest_rate": 0.1}
+    body = client.post("/cost/npv/curve", json=payload).json()
+    assert body["rates"] == pytest.approx(np.linspace(0, 0.5, 11).tolist())
+    assert body["npv"] == pytest.approx([npv(flows, r) for r in body["rates"]])
+    assert body["curve_npv"][0] == pytest.approx(npv(flows, 0.1))
+    assert len(body["break_even_rates"]) == 1
+    assert npv(flows, body["break_even_rates"][0]) == pytest.approx(0, abs=1e-8)
+    assert body["mirr"] == pytest.approx(mirr(np.array(flows, dtype=float), 0.06, 0.1))
+
+    assert client.post("/cost/npv/curve", json={"cash_flows": flows, "rates": [0.1, -1.5]}).status_code == 400
+    too_many = {"cash_flows": flows, "rates": [0.1] * 100002}
+    assert client.post("/cost/npv/curve", json=too_many).status_code == 422
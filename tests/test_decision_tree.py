@@ -0,0 +1,313 @@
+from itertools import product
+
+import numpy as np
+import pytest
+
+from app.model.compiled_tree import compile_tree
+from app.model.decision_tree import build_tree, evaluate_tree, find_node_by_path, sensitivity_analysis, sweep_values, \
+    monte_carlo_simulation, monte_carlo_chunks, monte_carlo_blocks, multi_monte_carlo_simulation, \
+    multi_sensitivity_analysis, build_sensitivity_grid, split_sensitivity_fields, merge_sensitivity_grids, summarize_grid, \
+    multi_monte_carlo_block, merge_multi_monte_carlo, MAX_MONTE_CARLO_RUNS, SKETCH_BINS
+from app.model.distributions import copula_uniforms, correlation_factor, inverse_cdf
+from conftest import paths, random_tree
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compiled_ev_matches_recursive(seed):
+    tree_data = random_tree(np.random.default_rng(seed))
+    root = build_tree(tree_data)
+    compiled = compile_tree(tree_data)
+    ev = compiled.expected_values()
+    assert ev[0] == pytest.approx(root.expected_value())
+    for path, _ in paths(tree_data):
+        node = root.path_index[tuple(path)]
+        assert ev[compiled.find_index(path)] == pytest.approx(node.expected_value())
+
+
+def test_evaluate_tree_exports_every_node():
+    tree_data = random_tree(np.random.default_rng(7))
+    root = build_tree(tree_data)
+    result = evaluate_tree(tree_data)
+    assert result["optimal_expected_value"] == pytest.approx(root.expected_value())
+    assert result["branch_expected_values"] == pytest.approx(
+        {child.name: child.expected_value() for child in root.children})
+
+    def check(exported, node):
+        assert exported["name"] == node.name
+        assert exported["ev"] == pytest.approx(node.expected_value())
+        assert [c["name"] for c in exported.get("children", [])] == [c.name for c in node.children]
+        for c, n in zip(exported.get("children", []), node.children):
+            check(c, n)
+
+    check(result["tree_with_ev"], root)
+
+
+def baseline_sensitivity(tree_data, target_path, field, value_range):
+    """
+    原实现：每个扫描点重建一次树并递归计算 EV
+    """
+    results = []
+    val = value_range["start"]
+    while val <= value_range["end"] + 1e-8:
+        tree_copy = build_tree(tree_data)
+        setattr(find_node_by_path(tree_copy, target_path), field, val)
+        results.append({"input_value": round(val, 3), "ev": round(tree_copy.expected_value(), 3)})
+        val += value_range["step"]
+    return results
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sensitivity_matches_baseline(seed):
+    rng = np.random.default_rng(seed)
+    tree_data = random_tree(rng)
+    for path, node in paths(tree_data):
+        if "probability" in node:
+            field, value_range = "probability", {"start": 0.0, "end": 1.0, "step": 0.1}
+        elif "value" in node:
+            field, value_range = "value", {"start": -150.0, "end": 250.0, "step": 12.5}
+        else:
+            continue
+        assert sensitivity_analysis(tree_data, path, field, value_range) == \
+            baseline_sensitivity(tree_data, path, field, value_range)
+        # 步长不能整除区间时不包含结束值
+        uneven = dict(value_range, step=value_range["step"] * 1.5)
+        assert sensitivity_analysis(tree_data, path, field, uneven) == \
+            baseline_sensitivity(tree_data, path, field, uneven)
+
+
+@pytest.mark.parametrize("distribution, params", [
+    ("normal", {"mean": 50, "stddev": 40}),
+    ("uniform", {"low": -100, "high": 200})
+])
+def test_monte_carlo_matches_recursive(distribution, params):
+    tree_data = random_tree(np.random.default_rng(3))
+    path = next(path for path, node in paths(tree_data) if "value" in node)
+    result = monte_carlo_simulation(tree_data, path, "value", distribution, params, runs=200, seed=11)
+
+    # 单块模拟时样本就是同一种子的 Generator 依次抽取的值
+    rng = np.random.default_rng(11)
+    samples = getattr(rng, distribution)(*params.values(), size=200)
+    expected = []
+    for sample in samples:
+        root = build_tree(tree_data)
+        find_node_by_path(root, path).value = sample
+        expected.append(round(root.expected_value(), 3))
+    assert result["raw_ev_samples"] == pytest.approx(expected, abs=1e-3)
+    assert sum(bar["count"] for bar in result["histogram"]) == 200
+    assert result["summary"]["mean"] == pytest.approx(np.mean(expected), abs=1e-3)
+
+
+def test_leaf_without_value_can_be_analysis_target():
+    tree_data = random_tree(np.random.default_rng(6))
+    path, node = next((path, node) for path, node in paths(tree_data) if "value" in node and "children" not in node)
+    other = next(p for p, n in paths(tree_data) if "value" in n and "children" not in n and p != path)
+    del node["value"]
+    value_range = {"start": -100, "end": 100, "step": 25}
+
+    # 被替换 value 的叶子可以没有 value，结果与逐点设置 value 后的原递归实现一致
+    result = sensitivity_analysis(tree_data, path, "value", value_range)
+    expected = []
+    for x in sweep_values(value_range):
+        root = build_tree(tree_data)
+        find_node_by_path(root, path).value = x
+        expected.append(root.expected_value())
+    assert [point["ev"] for point in result] == pytest.approx(expected, abs=1e-3)
+    params = {"mean": 0, "stddev": 10}
+    assert monte_carlo_simulation(tree_data, path, "value", "normal", params, runs=50, seed=1)["summary"]
+
+    # 其余场景仍要求每个叶子都有 value
+    with pytest.raises(ValueError, match="has no value"):
+        evaluate_tree(tree_data)
+    with pytest.raises(ValueError, match="has no value"):
+        sensitivity_analysis(tree_data, other, "value", value_range)
+
+
+def test_monte_carlo_chunks_match_blocks():
+    tree_data = random_tree(np.random.default_rng(4))
+    path = next(path for path, node in paths(tree_data) if "value" in node)
+    params = {"mean": 0, "stddev": 100}
+    runs = 1000
+    blocks = monte_carlo_blocks(runs, seed=5, block_size=300)
+    assert [size for size, _ in blocks] == [300, 300, 300, 100]
+
+    full = monte_carlo_simulation(tree_data, path, "value", "normal", params, runs=runs, seed=5)
+    chunks = monte_carlo_chunks(tree_data, path, "value", "normal", params, runs=runs, seed=5, chunk_size=64)
+    assert np.round(np.concatenate(list(chunks)), 3).tolist() == full["raw_ev_samples"]
+
+
+def test_multi_monte_carlo_matches_recursive():
+    tree_data = random_tree(np.random.default_rng(8))
+    targets = [(path, node) for path, node in paths(tree_data) if "value" in node or "probability" in node][:3]
+    inputs = [
+        {"target_path": path, "field": "value", "distribution": "triangular",
+         "params": {"low": -50, "mode": 20, "high": 150}} if "value" in node else
+        {"target_path": path, "field": "probability", "distribution": "pert",
+         "params": {"low": 0.1, "mode": 0.3, "high": 0.9}}
+        for path, node in targets
+    ]
+    correlation = np.full((len(inputs), len(inputs)), 0.5)
+    np.fill_diagonal(correlation, 1)
+    runs = 300
+    result = multi_monte_carlo_simulation(tree_data, inputs, correlation.tolist(), runs=runs, seed=2)
+
+    u = copula_uniforms(np.random.default_rng(2), correlation_factor(correlation, len(inputs)), runs, len(inputs))
+    samples = [inverse_cdf(item["distribution"], item["params"], u[:, j]) for j, item in enumerate(inputs)]
+    expected = []
+    for row in zip(*samples):
+        root = build_tree(tree_data)
+        for item, sample in zip(inputs, row):
+            setattr(find_node_by_path(root, item["target_path"]), item["field"], sample)
+        expected.append(root.expected_value())
+
+    assert result["summary"]["mean"] == pytest.approx(np.mean(expected), abs=1e-3)
+    assert result["summary"]["stddev"] == pytest.approx(np.std(expected), abs=1e-3)
+    # 百分位取自样本摘要：落在相邻的两个顺序统计量之间，误差不超过一个摘要区间
+    ordered = np.sort(expected)
+    bin_width = (ordered[-1] - ordered[0]) / SKETCH_BINS + 1e-3
+    for q, value in zip([0.05, 0.25, 0.5, 0.75, 0.95], result["percentiles"].values()):
+        rank = q * runs
+        low, high = ordered[max(int(np.floor(rank)) - 1, 0)], ordered[min(int(np.ceil(rank)), runs - 1)]
+        assert low - bin_width <= value <= high + bin_width
+    assert sum(item["count"] for item in result["histogram"]) == runs
+    assert len(result["tornado"]) == len(inputs)
+
+
+def test_multi_monte_carlo_blocks_are_fixed_size():
+    tree_data = random_tree(np.random.default_rng(9))
+    path = next(path for path, node in paths(tree_data) if "value" in node)
+    inputs = [{"target_path": path, "field": "value", "distribution": "uniform", "params": {"low": 0, "high": 100}}]
+    small, large = (multi_monte_carlo_block(tree_data, inputs, runs=runs, seed=3) for runs in (100, 20000))
+    # 块间只传递固定大小的摘要，与模拟次数无关
+    assert small["ev"].counts.shape == large["ev"].counts.shape == (SKETCH_BINS,)
+    assert small["sums"].shape == large["sums"].shape
+
+    merged = merge_multi_monte_carlo(inputs, [small, large])
+    assert sum(item["count"] for item in merged["histogram"]) == 20100
+    assert merged["summary"]["mean"] == pytest.approx(
+        (small["ev"].count * small["ev"].mean + large["ev"].count * large["ev"].mean) / 20100, abs=1e-3)
+    with pytest.raises(ValueError):
+        merge_multi_monte_carlo(inputs, [small], percentiles=[101])
+    for runs in (0, MAX_MONTE_CARLO_RUNS + 1, 1.5, "100"):
+        with pytest.raises(ValueError):
+            monte_carlo_blocks(runs)
+
+
+def baseline_multi_sensitivity(tree_data, fields):
+    """
+    原实现：对 itertools.product 的每个组合重建一次树并递归计算 EV
+    """
+    axes = [
+        [round(f["range"]["start"] + i * f["range"]["step"], 5)
+         for i in range(int((f["range"]["end"] - f["range"]["start"]) / f["range"]["step"]) + 1)]
+        for f in fields
+    ]
+    labels = [" → ".join(f["target_path"]) for f in fields]
+    results = []
+    for values in product(*axes):
+        root = build_tree(tree_data)
+        for f, val in zip(fields, values):
+            setattr(find_node_by_path(root, f["target_path"]), f["field"], val)
+        results.append({"inputs": dict(zip(labels, values)), "ev": round(root.expected_value(), 3)})
+    return results
+
+
+def sensitivity_fields(tree_data, count):
+    fields = []
+    for path, node in paths(tree_data):
+        if "probability" in node:
+            fields.append({"target_path": path, "field": "probability",
+                           "range": {"start": 0.0, "end": 1.0, "step": 0.25}})
+        elif "value" in node:
+            fields.append({"target_path": path, "field": "value",
+                           "range": {"start": -100.0, "end": 200.0, "step": 37.5}})
+        if len(fields) == count:
+            return fields
+    return fields
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_multi_sensitivity_matches_baseline(seed):
+    tree_data = random_tree(np.random.default_rng(seed))
+    fields = sensitivity_fields(tree_data, 3)
+    assert multi_sensitivity_analysis(tree_data, fields) == baseline_multi_sensitivity(tree_data, fields)
+
+
+def test_split_grid_merges_back():
+    tree_data = random_tree(np.random.default_rng(9))
+    fields = sensitivity_fields(tree_data, 3)
+    whole = build_sensitivity_grid(tree_data, fields, with_regions=True)
+    parts = split_sensitivity_fields(fields, 3)
+    assert len(parts) == 3
+    merged = merge_sensitivity_grids([build_sensitivity_grid(tree_data, part, with_regions=True) for part in parts])
+    np.testing.assert_array_equal(merged["ev"], whole["ev"])
+    np.testing.assert_array_equal(merged["best"], whole["best"])
+    assert summarize_grid(merged, fields) == summarize_grid(whole, fields)
+
+
+TWO_BRANCHES = {
+    "name": "Choose Project",
+    "children": [
+        {"name": "Dev A", "children": [
+            {"name": "A Success", "value": 100, "probability": 0.7},
+            {"name": "A Failure", "value": -20, "probability": 0.3}
+        ]},
+        {"name": "Dev B", "children": [
+            {"name": "B Success", "value": 150, "probability": 0.5},
+            {"name": "B Failure", "value": -40, "probability": 0.5}
+        ]}
+    ]
+}
+
+TWO_BRANCH_FIELDS = [
+    {"target_path": ["Dev A", "A Success"], "field": "probability", "range": {"start": 0.0, "end": 1.0, "step": 0.125}},
+    {"target_path": ["Dev B", "B Success"], "field": "probability", "range": {"start": 0.0, "end": 1.0, "step": 0.125}}
+]
+
+
+def test_grid_summary_regions():
+    rows = baseline_multi_sensitivity(TWO_BRANCHES, TWO_BRANCH_FIELDS)
+    summary = summarize_grid(build_sensitivity_grid(TWO_BRANCHES, TWO_BRANCH_FIELDS, with_regions=True),
+                             TWO_BRANCH_FIELDS)
+    evs = [row["ev"] for row in rows]
+    assert summary["ev_bounds"]["min"]["ev"] == min(evs)
+    assert summary["ev_bounds"]["max"]["ev"] == max(evs)
+    # 只改成功概率，失败分支不变：A = 100p - 6，B = 150q - 20
+    counts = {"Dev A": 0, "Dev B": 0}
+    for row in rows:
+        p, q = row["inputs"].values()
+        counts["Dev A" if 100 * p - 6 > 150 * q - 20 else "Dev B"] += 1
+    assert {region["branch"]: region["count"] for region in summary["optimal_regions"]} == counts
+
+
+
+def walk(root, path):
+    """
+    原实现：逐层遍历子节点查找路径
+    """
+    current = root
+    for name in path:
+        current = next(child for child in current.children if child.name == name)
+    return current
+
+
+def test_path_index_matches_walk():
+    tree_data = random_tree(np.random.default_rng(12), depth=5)
+    root = build_tree(tree_data)
+    compiled = compile_tree(tree_data)
+    for path, node in paths(tree_data):
+        assert find_node_by_path(root, path) is walk(root, path)
+        assert compiled.names[compiled.find_index(path)] == node["name"]
+    assert compiled.find_index([]) == 0
+    for lookup in (lambda path: find_node_by_path(root, path), compiled.find_index):
+        with pytest.raises(ValueError, match="not found"):
+            lookup(["Root.0", "missing"])
+
+
+def test_duplicate_siblings_are_rejected():
+    tree_data = {"name": "Root", "children": [
+        {"name": "A", "children": [{"name": "X", "value": 1}, {"name": "X", "value": 2}]},
+        {"name": "B", "value": 3}
+    ]}
+    for build in (build_tree, compile_tree):
+        with pytest.raises(ValueError, match="A -> X"):
+            build(tree_data)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from app.model.distributions import copula_uniforms, correlation_factor, inverse_cdf, validate_distribution
+
+stats = pytest.importorskip("scipy.stats")
+
+U = (np.arange(1, 2000) / 2000)
+
+
+@pytest.mark.parametrize("distribution, params, frozen", [
+    ("normal", {"mean": 3, "stddev": 2}, lambda: stats.norm(3, 2)),
+    ("uniform", {"low": -1, "high": 5}, lambda: stats.uniform(-1, 6)),
+    ("triangular", {"low": 1, "mode": 2, "high": 6}, lambda: stats.triang(0.2, loc=1, scale=5)),
+    ("lognormal", {"mean": 0.5, "sigma": 0.3}, lambda: stats.lognorm(0.3, scale=np.exp(0.5))),
+    # PERT(a, m, b) 即 a + (b - a) * Beta(1 + 4(m - a)/(b - a), 1 + 4(b - m)/(b - a))
+    ("pert", {"low": 0, "mode": 2, "high": 10}, lambda: stats.beta(1.8, 4.2, loc=0, scale=10))
+])
+def test_inverse_cdf_matches_scipy(distribution, params, frozen):
+    validate_distribution(distribution, params)
+    assert inverse_cdf(distribution, params, U) == pytest.approx(frozen().ppf(U), rel=1e-9, abs=1e-9)
+
+
+def test_empirical_inverse_cdf_resamples_history():
+    values = [5, 1, 3, 2]
+    samples = inverse_cdf("empirical", {"values": values}, U)
+    assert set(samples.tolist()) == set(map(float, values))
+    assert np.all(np.diff(samples) >= 0)
+
+
+@pytest.mark.parametrize("distribution, params", [
+    ("gamma", {}),
+    ("normal", {"mean": 1}),
+    ("triangular", {"low": 3, "mode": 1, "high": 5}),
+    ("empirical", {"values": []})
+])
+def test_validate_distribution_rejects(distribution, params):
+    with pytest.raises(ValueError):
+        validate_distribution(distribution, params)
+
+
+def test_copula_uniforms_follow_correlation():
+    correlation = [[1, 0.8, -0.3], [0.8, 1, 0], [-0.3, 0, 1]]
+    u = copula_uniforms(np.random.default_rng(0), correlation_factor(correlation, 3), 200000, 3)
+    assert u.shape == (200000, 3)
+    assert np.all((u > 0) & (u < 1))
+    # 各列边缘分布为均匀分布，正态分数的相关系数即给定矩阵
+    assert u.mean(axis=0) == pytest.approx(0.5, abs=0.005)
+    assert np.corrcoef(stats.norm.ppf(u), rowvar=False) == pytest.approx(np.array(correlation), abs=0.01)
+
+
+@pytest.mark.parametrize("correlation", [
+    [[1, 0.5], [0.4, 1]],
+    [[2, 0], [0, 1]],
+    [[1, 1.2], [1.2, 1]],
+    [[1, 0], [0, 1], [0, 0]]
+])
+def test_correlation_factor_rejects(correlation):
+    with pytest.raises(ValueError):
+        correlation_factor(correlation, 2)
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from app.dependencies import build_engine, sql_url
+from app.model.estimation import Estimation
+from app.write_behind import save_record
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+HISTORY = [[10, 25.0], [20, 41.0], [35, 80.0], [50, 98.0]]
+
+
+def test_estimation_endpoints(client):
+    body = client.post("/estimate/empirical/cocomo", json={"size": 32, "complexity": "embedded"}).json()
+    effort = 3.6 * 32 ** 1.20
+    assert body["effort"] == pytest.approx(effort)
+    assert body["time"] == pytest.approx(2.5 * effort ** 0.32)
+    assert body["id"] is not None and body["method"] == "cocomo"
+
+    body = client.post("/estimate/empirical/fpa", json={"size": 120, "complexity": "organic"}).json()
+    assert (body["effort"], body["time"]) == (120.0, -1)
+
+    # 专家判断带 ±20% 的随机波动
+    body = client.post("/estimate/heuristic/expert", json={"size": 100, "experience": 2}).json()
+    assert 100 * 0.8 * 0.3 <= body["effort"] <= 100 * 1.2 * 0.3
+    body = client.post("/estimate/heuristic/delphi",
+                       json={"method": "delphi_check", "size": 100, "experience_list": [1, 2, 3]}).json()
+    export = client.get("/estimate/export", params={"method": "delphi_check", "format": "ndjson"})
+    assert json.loads(export.text)["experience"] == 2
+    assert 100 * 0.8 * 0.3 <= body["effort"] <= 100 * 1.2 * 0.6
+
+    body = client.post("/estimate/mathematical/regression", json={"size": 40, "historical_data": HISTORY}).json()
+    slope, intercept = np.polyfit(*np.array(HISTORY).T, 1)
+    assert body["effort"] == pytest.approx(slope * 40 + intercept)
+
+
+def test_record_round_trip(client):
+    created = client.post("/estimate/empirical/cocomo", json={"method": "round_trip", "size": 7}).json()
+    stored = client.get("/estimate/", params={"method": "round_trip"}).json()
+    assert len(stored) == 1
+    assert {key: stored[0][key] for key in created} == created
+
+    roi = client.post("/cost/roi", json={"method": "round_trip", "gain": 30, "cost": 10}).json()
+    stored = client.get("/cost/roi", params={"method": "round_trip"}).json()
+    assert [record["roi_value"] for record in stored] == [roi["roi_value"]]
+
+
+def test_concurrent_sessions(client):
+    async def run():
+        # 独立的引擎绑定到本事件循环，多个会话并发提交，每条记录都拿到各自的自增主键
+        engine = build_engine(sql_url)
+
+        async def save(size):
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                record = await save_record(session, Estimation(method="concurrent", size=size, effort=size, time=-1))
+                return record.id
+
+        try:
+            ids = await asyncio.gather(*(save(size) for size in range(20)))
+            async with AsyncSession(engine) as session:
+                records = (await session.exec(select(Estimation).where(Estimation.method == "concurrent"))).all()
+        finally:
+            await engine.dispose()
+        return ids, records
+
+    ids, records = asyncio.run(run())
+    assert len(set(ids)) == 20
+    assert sorted(record.id for record in records) == sorted(ids)
+    assert sorted(record.size for record in records) == list(range(20))
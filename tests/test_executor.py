@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app import executor
+from app.model.compiled_tree import compile_tree
+from app.model.decision_tree import evaluate_tree
+
+TREE = {
+    "name": "Root",
+    "children": [
+        {"name": "A", "children": [{"name": "A1", "value": 10, "probability": 0.5},
+                                   {"name": "A2", "value": 30, "probability": 0.5}]},
+        {"name": "B", "value": 15}
+    ]
+}
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after=None):
+        self.disconnect_after = disconnect_after
+        self.began = time.monotonic()
+
+    async def is_disconnected(self):
+        return self.disconnect_after is not None and time.monotonic() - self.began >= self.disconnect_after
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    monkeypatch.setattr(executor, "max_workers", 2)
+    yield
+    executor.shutdown_pool()
+
+
+def test_process_pool_keeps_call_order(process_pool):
+    tree = compile_tree(TREE)
+    calls = [(pow, (2, k)) for k in range(6)] + [(evaluate_tree, (tree,))]
+    *powers, evaluated = asyncio.run(executor.run_tasks(FakeRequest(), calls, timeout=60))
+    assert powers == [1, 2, 4, 8, 16, 32]
+    # 编译后的树可以被 pickle 发送到子进程
+    assert evaluated == evaluate_tree(TREE)
+
+
+def test_thread_pool_fallback(monkeypatch):
+    monkeypatch.setattr(executor, "max_workers", 0)
+    assert executor.get_pool() is None
+    assert asyncio.run(executor.run_task(FakeRequest(), max, 3, 9, 4)) == 9
+
+
+def test_timeout_returns_504(monkeypatch):
+    monkeypatch.setattr(executor, "max_workers", 0)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(executor.run_task(FakeRequest(), time.sleep, 1, timeout=0.1))
+    assert error.value.status_code == 504
+
+
+def test_disconnect_returns_499(monkeypatch):
+    monkeypatch.setattr(executor, "max_workers", 0)
+    monkeypatch.setattr(executor, "disconnect_poll_interval", 0.05)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(executor.run_task(FakeRequest(disconnect_after=0.1), time.sleep, 2, timeout=10))
+    assert error.value.status_code == 499
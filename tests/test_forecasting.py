@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from app.model.forecasting import SMOOTHING_GRID, exponential_smoothing, forecast_series, stack_series
+
+stats = pytest.importorskip("scipy.stats")
+
+
+def _random_series(seed: int, count: int, shortest: int = 3, longest: int = 40) -> list:
+    rng = np.random.default_rng(seed)
+    return [list(rng.normal(100, 20) + rng.normal(2, 1) * np.arange(n) + rng.normal(0, 5, n))
+            for n in rng.integers(shortest, longest, count)]
+
+
+def baseline_forecast(historical_data, future_periods):
+    """
+    原 /cost/forecast 的实现：对每条序列单独拟合 sklearn 线性回归
+    """
+    linear_model = pytest.importorskip("sklearn.linear_model")
+    X = np.arange(len(historical_data)).reshape(-1, 1)
+    model = linear_model.LinearRegression().fit(X, np.array(historical_data))
+    return model.predict(np.arange(len(historical_data), len(historical_data) + future_periods).reshape(-1, 1))
+
+
+def test_linear_matches_baseline_regression():
+    series = _random_series(1, 50)
+    result = forecast_series(series, 6)
+    for row, s in zip(result["forecast"], series):
+        np.testing.assert_allclose(row, baseline_forecast(s, 6), rtol=1e-9)
+
+
+def test_linear_short_series():
+    result = forecast_series([[4.0], [1.0, 3.0], [2.0, 1.0, 5.0]], 3)
+    for row, s in zip(result["forecast"], [[4.0], [1.0, 3.0], [2.0, 1.0, 5.0]]):
+        np.testing.assert_allclose(row, baseline_forecast(s, 3), rtol=1e-9)
+    # 少于 3 个观测值时残差没有自由度，区间为 NaN
+    assert np.isnan(result["lower"][:2]).all() and np.isnan(result["sigma"][:2]).all()
+    assert not np.isnan(result["lower"][2]).any()
+    with pytest.raises(ValueError):
+        forecast_series([[1.0], []], 3)
+
+
+def test_linear_prediction_interval():
+    series = _random_series(2, 20)
+    result = forecast_series(series, 4, confidence=0.9)
+    for i, s in enumerate(series):
+        n, t = len(s), np.arange(len(s))
+        slope, intercept = np.polyfit(t, s, 1)
+        sigma = np.sqrt(((s - intercept - slope * t) ** 2).sum() / (n - 2))
+        future = np.arange(n, n + 4)
+        spread = stats.t.ppf(0.95, n - 2) * sigma * np.sqrt(
+            1 + 1 / n + (future - t.mean()) ** 2 / ((t - t.mean()) ** 2).sum())
+        assert result["sigma"][i] == pytest.approx(sigma, rel=1e-9)
+        np.testing.assert_allclose(result["upper"][i] - result["forecast"][i], spread, rtol=1e-9)
+        np.testing.assert_allclose(result["forecast"][i] - result["lower"][i], spread, rtol=1e-9)
+
+
+def reference_smoothing(y, model, alpha, beta=0.0, gamma=0.0, season_length=1, horizon=1):
+    """
+    逐条序列、逐期执行的加法误差修正递推，返回 (一步预测误差平方和, 各期预测)
+    """
+    p = season_length if model == "holt_winters" else 1
+    if p > 1:
+        level = np.mean(y[:p])
+        trend = (np.mean(y[p:2 * p]) - level) / p
+        season = list(np.array(y[:p]) - level)
+        level -= trend
+    else:
+        trend = y[1] - y[0] if model == "holt" and len(y) > 1 else 0.0
+        level, season = y[0] - trend, [0.0]
+    sse = 0.0
+    for t, value in enumerate(y):
+        error = value - (level + trend + season[t % p])
+        level += trend + alpha * error
+        trend += beta * error
+        season[t % p] += gamma * error
+        sse += error ** 2
+    forecast = [level + trend * h + season[(len(y) + h - 1) % p] for h in range(1, horizon + 1)]
+    return sse, np.array(forecast)
+
+
+@pytest.mark.parametrize("model, params, season_length", [
+    ("ses", {"alpha": 0.3}, 1),
+    ("holt", {"alpha": 0.5, "beta": 0.1}, 1),
+    ("holt_winters", {"alpha": 0.2, "beta": 0.05, "gamma": 0.1}, 4)
+])
+def test_smoothing_matches_reference(model, params, season_length):
+    series = _random_series(3, 30, shortest=2 * season_length + 1)
+    values, lengths = stack_series(series)
+    result = exponential_smoothing(values, lengths, 5, model, season_length=season_length, **params)
+    for i, s in enumerate(series):
+        sse, forecast = reference_smoothing(s, model, season_length=season_length, horizon=5, **params)
+        np.testing.assert_allclose(result["forecast"][i], forecast, rtol=1e-9)
+        assert result["sigma"][i] == pytest.approx(np.sqrt(sse / len(s)), rel=1e-9)
+
+
+def test_smoothing_picks_best_grid_alpha():
+    series = _random_series(4, 20)
+    values, lengths = stack_series(series)
+    result = exponential_smoothing(values, lengths, 3, "ses")
+    for i, s in enumerate(series):
+        errors = [reference_smoothing(s, "ses", alpha)[0] for alpha in SMOOTHING_GRID]
+        assert result["alpha"][i] == SMOOTHING_GRID[int(np.argmin(errors))]
+
+
+def test_forecast_endpoints(client):
+    history = [120.0, 135.0, 149.0, 160.0, 178.0, 190.0]
+    body = client.post("/cost/forecast", json={"historical_data": history, "future_periods": 3}).json()
+    expected = baseline_forecast(history, 3)
+    assert body["res"] == pytest.approx(expected[-1])
+    assert body["forecast"] == pytest.approx(expected.tolist())
+    assert all(lo < f < hi for lo, f, hi in zip(body["lower"], body["forecast"], body["upper"]))
+    # 单个观测值与原实现一样给出水平预测，区间为空；空序列无法预测
+    body = client.post("/cost/forecast", json={"historical_data": [7.5], "future_periods": 3}).json()
+    assert body["res"] == 7.5 and body["forecast"] == baseline_forecast([7.5], 3).tolist()
+    assert body["lower"] == body["upper"] == [None] * 3
+    body = client.post("/cost/forecast", json={"historical_data": [], "future_periods": 3}).json()
+    assert body["res"] is None
+
+    series = _random_series(5, 4)
+    body = client.post("/cost/forecast/batch", json={"series": series, "future_periods": 2, "model": "holt"}).json()
+    assert len(body["forecast"]) == 4 and all(len(row) == 2 for row in body["forecast"])
+    assert all(beta <= alpha for alpha, beta in zip(body["alpha"], body["beta"]))
+    response = client.post("/cost/forecast/batch", json={"series": series, "future_periods": 2,
+                                                         "model": "holt_winters", "season_length": 1})
+    assert response.status_code == 400
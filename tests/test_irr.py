@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from app.model.cash_flows import IRR_MULTIPLE, IRR_NO_SIGN_CHANGE, IRR_NOT_FOUND, IRR_OK, irr_batch, pad_cash_flows
+
+npf = pytest.importorskip("numpy_financial")
+
+
+def _random_series(seed: int, count: int, longest: int) -> list:
+    rng = np.random.default_rng(seed)
+    return [list(np.round(rng.normal(0, 80, rng.integers(2, longest)), 1)) for _ in range(count)]
+
+
+@pytest.mark.parametrize("seed, longest", [(1, 30), (2, 6), (3, 12)])
+def test_irr_matches_numpy_financial(seed, longest):
+    series = _random_series(seed, 3000, longest)
+    rates, status = irr_batch(pad_cash_flows(series))
+    expected = np.array([npf.irr(s) for s in series])
+    # 求解范围为 -99% 以上（见 IRR_NOT_FOUND）；更低的 IRR 不参与比较
+    comparable = ~np.isnan(expected) & (expected > -0.99)
+    assert comparable.sum() > 1000
+    np.testing.assert_allclose(rates[comparable], expected[comparable], rtol=1e-6, atol=1e-8)
+    assert np.all(status[comparable] != IRR_NOT_FOUND)
+
+
+def test_two_roots_in_one_grid_cell():
+    flows = [65.8, -48.8, -54.3, -76.2, 0.6, 156, -6.6, -95.4, 103.6]
+    rates, status = irr_batch(pad_cash_flows([flows]))
+    assert rates[0] == pytest.approx(npf.irr(flows), rel=1e-8)
+    assert status[0] == IRR_MULTIPLE
+
+
+def test_leading_zero_flows_are_ignored():
+    rates, status = irr_batch(pad_cash_flows([[0.0, -5.8, -27.3, 13.7], [-5.8, -27.3, 13.7]]))
+    assert rates[0] == pytest.approx(rates[1])
+    assert rates[0] == pytest.approx(npf.irr([0.0, -5.8, -27.3, 13.7]))
+    assert status[0] == IRR_OK
+
+
+def test_status_codes():
+    rates, status = irr_batch(pad_cash_flows([[-1000, 200, 300, 400, 500], [100, 200], [-100, 230, -132]]))
+    assert rates[0] == pytest.approx(npf.irr([-1000, 200, 300, 400, 500]))
+    assert np.isnan(rates[1]) and status[1] == IRR_NO_SIGN_CHANGE
+    # 两个 IRR（10% 和 20%），返回最接近 0 的一个
+    assert rates[2] == pytest.approx(0.1) and status[2] == IRR_MULTIPLE
+
+
+def test_irr_endpoint(client):
+    response = client.post("/cost/irr", json={"cash_flows": [-1000, 200, 300, 400, 500]})
+    assert response.status_code == 200
+    assert response.json()["irr_value"] == pytest.approx(npf.irr([-1000, 200, 300, 400, 500]) * 100)
+    assert client.post("/cost/irr", json={"cash_flows": [100, 200]}).json()["irr_value"] is None
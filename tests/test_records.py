@@ -0,0 +1,55 @@
+import csv
+import io
+import json
+
+
+def _page_through(client, path, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, **({"after_id": cursor} if cursor is not None else {}))
+        response = client.get(path, params=query)
+        assert response.status_code == 200, response.text
+        pages += 1
+        ids.extend(record["id"] for record in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids, pages
+
+
+def test_keyset_pagination_covers_history(client):
+    for i in range(23):
+        client.post("/estimate/empirical/cocomo", json={"method": "paging", "size": 10 + i})
+        client.post("/estimate/empirical/cocomo", json={"method": "paging_other", "size": 10 + i})
+
+    ids, pages = _page_through(client, "/estimate/", method="paging", limit=5)
+    assert pages == 5
+    assert len(ids) == 23
+    assert len(set(ids)) == 23
+    assert ids == sorted(ids)
+
+    export = client.get("/estimate/export", params={"method": "paging", "format": "ndjson"})
+    assert [json.loads(line)["id"] for line in export.text.splitlines()] == ids
+
+    # 页大小恰好整除时最后一页为空，之后不再给出游标
+    ids, pages = _page_through(client, "/estimate/", method="paging_other", limit=23)
+    assert (len(ids), pages) == (23, 2)
+
+
+def test_cursor_header_is_exposed_to_browsers(client):
+    client.post("/cost/roi", json={"gain": 30, "cost": 10})
+    response = client.get("/cost/roi", params={"limit": 1}, headers={"Origin": "http://localhost:9000"})
+    assert "X-Next-Cursor" in response.headers
+    assert "x-next-cursor" in response.headers["access-control-expose-headers"].lower()
+
+
+def test_time_filter_and_csv_export(client):
+    for _ in range(3):
+        client.post("/cost/npv", json={"cash_flows": [1, 2, 4], "discount_rate": 0.6})
+    assert client.get("/cost/npv", params={"until": "2000-01-01T00:00:00"}).json() == []
+    assert len(client.get("/cost/npv", params={"since": "2000-01-01T00:00:00"}).json()) >= 3
+
+    export = client.get("/cost/npv/export")
+    assert export.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(export.text)))
+    assert len(rows) >= 3
+    assert float(rows[-1]["npv_value"]) == 1.3828125
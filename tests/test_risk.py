@@ -0,0 +1,233 @@
+import json
+
+import numpy as np
+import pytest
+
+TREE = {
+    "name": "Choose Project",
+    "children": [
+        {
+            "name": "Dev A",
+            "children": [
+                {"name": "A Success", "value": 100, "probability": 0.7},
+                {"name": "A Failure", "value": -20, "probability": 0.3}
+            ]
+        },
+        {
+            "name": "Dev B",
+            "children": [
+                {"name": "B Success", "value": 60, "probability": 0.9},
+                {"name": "B Failure", "value": -10, "probability": 0.1}
+            ]
+        }
+    ]
+}
+
+
+def test_sensitivity_endpoint(client):
+    payload = {
+        "tree": TREE,
+        "target_path": ["Dev A", "A Success"],
+        "field": "probability",
+        "range": {"start": 0.6, "end": 0.9, "step": 0.05}
+    }
+    # 第二次请求命中已编译树与结果缓存
+    for _ in range(2):
+        response = client.post("/decision-tree/sensitivity", json=payload)
+        assert response.status_code == 200, response.text
+        result = response.json()["sensitivity_result"]
+        assert [point["input_value"] for point in result] == [0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9]
+        # 0.6: max(0.6 * 100 - 0.3 * 20, 53) = 54
+        assert result[0]["ev"] == pytest.approx(54.0)
+        assert result[-1]["ev"] == pytest.approx(84.0)
+
+
+def test_sensitivity_endpoint_unknown_path(client):
+    payload = {
+        "tree": TREE,
+        "target_path": ["Dev C"],
+        "field": "value",
+        "range": {"start": 0, "end": 1, "step": 1}
+    }
+    assert client.post("/decision-tree/sensitivity", json=payload).status_code == 400
+
+
+def test_leaf_without_value_endpoints(client):
+    tree = json.loads(json.dumps(TREE))
+    del tree["children"][0]["children"][0]["value"]
+    payload = {"tree": tree, "target_path": ["Dev A", "A Success"], "field": "value",
+               "range": {"start": 0, "end": 100, "step": 50}}
+    response = client.post("/decision-tree/sensitivity", json=payload)
+    assert response.status_code == 200, response.text
+    # Dev A = 0.7 * x - 6，与 Dev B 的 53 取较大者
+    assert [point["ev"] for point in response.json()["sensitivity_result"]] == [53, 53, 64]
+    assert client.post("/decision-tree/evaluate", json=tree).status_code == 400
+
+
+def test_evaluate_endpoint(client):
+    response = client.post("/decision-tree/evaluate", json=TREE)
+    assert response.status_code == 200
+    body = response.json()
+    # Dev A: 0.7 * 100 + 0.3 * -20 = 64，Dev B: 0.9 * 60 + 0.1 * -10 = 53
+    assert body["branch_expected_values"] == pytest.approx({"Dev A": 64.0, "Dev B": 53.0})
+    assert body["optimal_expected_value"] == pytest.approx(64.0)
+    assert body["tree_with_ev"]["children"][1]["children"][0] == {"name": "B Success", "ev": 60.0, "value": 60.0,
+                                                                   "probability": 0.9}
+
+
+def test_monte_carlo_endpoint(client):
+    payload = {
+        "tree": TREE,
+        "target_path": ["Dev A", "A Success"],
+        "field": "value",
+        "distribution": "uniform",
+        "params": {"low": 200, "high": 300},
+        "runs": 500,
+        "seed": 3
+    }
+    first = client.post("/decision-tree/monte-carlo", json=payload)
+    assert first.status_code == 200
+    body = first.json()
+    # A Success 取 [200, 300] 时始终选 Dev A：EV = 0.7 * value - 6
+    samples = np.array(body["raw_ev_samples"])
+    assert len(samples) == 500
+    assert samples.min() >= 134 and samples.max() <= 204
+    assert body["summary"]["mean"] == pytest.approx(169, abs=3)
+    assert client.post("/decision-tree/monte-carlo", json=payload).json() == body
+
+    response = client.post("/decision-tree/monte-carlo", json=dict(payload, distribution="cauchy"))
+    assert response.status_code == 400
+
+
+def test_multi_monte_carlo_endpoint(client):
+    payload = {
+        "tree": TREE,
+        "inputs": [
+            {"target_path": ["Dev A", "A Success"], "field": "value", "distribution": "uniform",
+             "params": {"low": 200, "high": 300}},
+            {"target_path": ["Dev B", "B Success"], "field": "value", "distribution": "triangular",
+             "params": {"low": 0, "mode": 5, "high": 10}}
+        ],
+        "correlation": [[1, 0.6], [0.6, 1]],
+        "runs": 2000,
+        "seed": 1
+    }
+    response = client.post("/decision-tree/monte-carlo/multi", json=payload)
+    assert response.status_code == 200
+    body = response.json()
+    percentiles = list(body["percentiles"].values())
+    assert percentiles == sorted(percentiles)
+    # Dev B 的 EV 不超过 0.9 * 10 - 1，始终选 Dev A，EV 只取决于 A Success
+    tornado = {item["input"]: item for item in body["tornado"]}
+    assert tornado["Dev A → A Success (value)"]["correlation"] == pytest.approx(1, abs=1e-6)
+    assert tornado["Dev A → A Success (value)"]["variance_share"] > 0.5
+    assert body["tornado"][0]["input"] == "Dev A → A Success (value)"
+
+    singular = dict(payload, correlation=[[1, 1.5], [1.5, 1]])
+    assert client.post("/decision-tree/monte-carlo/multi", json=singular).status_code == 400
+    for runs in (0, 10 ** 9, "many"):
+        assert client.post("/decision-tree/monte-carlo/multi", json=dict(payload, runs=runs)).status_code == 400
+
+
+MULTI_FIELDS = [
+    {"target_path": ["Dev A", "A Success"], "field": "probability", "range": {"start": 0.5, "end": 0.9, "step": 0.1}},
+    {"target_path": ["Dev B", "B Success"], "field": "value", "range": {"start": 40, "end": 100, "step": 20}}
+]
+
+
+def test_multi_sensitivity_endpoint(client):
+    payload = {"tree": TREE, "fields": MULTI_FIELDS}
+    rows = client.post("/decision-tree/sensitivity/multi", json=payload).json()["grid_data"]
+    assert len(rows) == 5 * 4
+    for row in rows:
+        p, b = row["inputs"].values()
+        assert row["ev"] == pytest.approx(max(100 * p - 6, 0.9 * b - 1), abs=1e-3)
+
+    dense = client.post("/decision-tree/sensitivity/multi", json=dict(payload, output="dense")).json()
+    assert dense["shape"] == [5, 4]
+    assert [ev for line in dense["ev_grid"] for ev in line] == [row["ev"] for row in rows]
+
+    summary = client.post("/decision-tree/sensitivity/multi", json=dict(payload, output="summary")).json()
+    # B Success = 100 时 Dev B 的 EV 为 89，高于 Dev A 的最大值 84，取第一个最大点
+    assert summary["ev_bounds"]["max"] == {"ev": 89.0, "inputs": {"Dev A → A Success": 0.5,
+                                                                  "Dev B → B Success": 100.0}}
+    assert sum(region["count"] for region in summary["optimal_regions"]) == 20
+
+    assert client.post("/decision-tree/sensitivity/multi", json=dict(payload, output="cube")).status_code == 400
+
+
+def test_multi_sensitivity_streams(client, monkeypatch):
+    from app.routers import risk
+
+    # 20 个网格点按 3 个一块输出，块边界上不能丢失或错位组合
+    monkeypatch.setattr(risk, "STREAM_CHUNK_SIZE", 3)
+    payload = {"tree": TREE, "fields": MULTI_FIELDS}
+    rows = client.post("/decision-tree/sensitivity/multi", json=payload).json()["grid_data"]
+
+    response = client.post("/decision-tree/sensitivity/multi", json=dict(payload, stream="ndjson"))
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == rows
+
+    response = client.post("/decision-tree/sensitivity/multi", json=dict(payload, stream="binary"))
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert np.round(np.frombuffer(response.content, dtype="<f8"), 3).tolist() == [row["ev"] for row in rows]
+
+    assert client.post("/decision-tree/sensitivity/multi", json=dict(payload, stream="xml")).status_code == 400
+
+
+def test_monte_carlo_streams(client, monkeypatch):
+    from app.routers import risk
+
+    monkeypatch.setattr(risk, "STREAM_CHUNK_SIZE", 400)
+    payload = {
+        "tree": TREE,
+        "target_path": ["Dev A", "A Success"],
+        "field": "value",
+        "distribution": "normal",
+        "params": {"mean": 100, "stddev": 30},
+        "runs": 1500,
+        "seed": 4
+    }
+    body = client.post("/decision-tree/monte-carlo", json=payload).json()
+
+    lines = [json.loads(line) for line in
+             client.post("/decision-tree/monte-carlo", json=dict(payload, stream=True)).text.splitlines()]
+    *chunks, summary = lines
+    assert [chunk["offset"] for chunk in chunks] == [0, 400, 800, 1200]
+    assert [ev for chunk in chunks for ev in chunk["ev"]] == body["raw_ev_samples"]
+    assert summary == {"summary": body["summary"], "histogram": body["histogram"]}
+
+    raw = client.post("/decision-tree/monte-carlo", json=dict(payload, stream="binary")).content
+    assert np.round(np.frombuffer(raw, dtype="<f8"), 3).tolist() == body["raw_ev_samples"]
+
+
+def test_session_endpoints(client):
+    created = client.post("/decision-tree/sessions", json=TREE).json()
+    session_id = created["session_id"]
+    assert created["branch_expected_values"] == pytest.approx({"Dev A": 64.0, "Dev B": 53.0})
+    url = f"/decision-tree/sessions/{session_id}"
+
+    # A Success 概率 0.7 -> 0.3：Dev A = 30 - 6 = 24，根节点改选 Dev B
+    patched = client.patch(f"{url}/nodes", json={"path": ["Dev A", "A Success"], "probability": 0.3}).json()
+    assert {tuple(item["path"]): item["ev"] for item in patched["changed"]} == pytest.approx(
+        {("Dev A",): 24.0, (): 53.0})
+    added = client.post(f"{url}/nodes", json={"path": [], "node": {"name": "Dev C", "value": 70}}).json()
+    assert added["optimal_expected_value"] == 70
+    removed = client.delete(f"{url}/nodes", params={"path": ["Dev C"]}).json()
+    assert removed["optimal_expected_value"] == pytest.approx(53.0)
+
+    current = client.get(url).json()
+    assert list(current["branch_expected_values"]) == ["Dev A", "Dev B"]
+    assert client.patch(f"{url}/nodes", json={"path": ["Dev X"], "value": 1}).status_code == 400
+    bad_node = {"path": [], "node": {"name": "z", "value": 5, "probability": 2}}
+    assert client.post(f"{url}/nodes", json=bad_node).status_code == 400
+
+    assert client.delete(url).json() == {"session_id": session_id, "deleted": True}
+    assert client.get(url).status_code == 404
+
+
+def test_duplicate_siblings_endpoint(client):
+    tree = {"name": "Root", "children": [{"name": "A", "value": 1}, {"name": "A", "value": 2}]}
+    response = client.post("/decision-tree/evaluate", json=tree)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Duplicate sibling names at: A"
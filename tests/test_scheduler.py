@@ -0,0 +1,467 @@
+import numpy as np
+import pytest
+
+from app.executor import default_timeout
+from app.model.cpm import ProjectNetwork
+from app.model.leveling import PRIORITY_RULES, generate_schedule, level_resources, priority_keys
+from app.model.optimizer import ScheduleProblem, optimize_schedule
+from app.model.resource_calendar import ResourceCalendar, resource_model
+from app.model.scheduler import Activity, ProjectData
+from app.model.smoothing import best_shift, smooth_resources
+
+ACTIVITIES = [
+    {"name": "A", "duration": 4, "resource": 4, "predecessors": []},
+    {"name": "B", "duration": 3, "resource": 3, "predecessors": ["A"]},
+    {"name": "C", "duration": 5, "resource": 2, "predecessors": ["A"]},
+    {"name": "D", "duration": 2, "resource": 3, "predecessors": ["B"]},
+    {"name": "E", "duration": 4, "resource": 2, "predecessors": ["C", "D"]}
+]
+
+
+def random_project(rng, n=30, max_resource=5):
+    """
+    随机生成无环的活动网络；活动按打乱后的顺序给出，前置活动只从拓扑序更靠前的活动中选
+    """
+    activities = []
+    for i in range(n):
+        count = int(rng.integers(0, min(i, 3) + 1))
+        predecessors = [f"T{p}" for p in rng.choice(i, size=count, replace=False)] if count else []
+        activities.append({"name": f"T{i}", "duration": int(rng.integers(1, 7)),
+                           "resource": int(rng.integers(1, max_resource + 1)), "predecessors": predecessors})
+    return [activities[i] for i in rng.permutation(n)]
+
+
+POOLS = [
+    {"name": "developers", "capacity": 4, "calendar": [{"start": 5, "end": 9, "capacity": 1},
+                                                       {"start": 20, "end": 26, "capacity": 2}]},
+    {"name": "testers", "capacity": 3},
+    {"name": "build_agents", "capacity": 2, "calendar": [{"start": 1, "end": 3, "capacity": 0}]}
+]
+
+
+def random_pool_project(rng, n=25):
+    """
+    在 random_project 的网络上为每个活动随机分配各资源池的需求（不超过默认容量）
+    """
+    activities = random_project(rng, n)
+    for a in activities:
+        del a["resource"]
+        a["demands"] = {pool["name"]: int(rng.integers(0, pool["capacity"] + 1))
+                        for pool in POOLS if rng.random() < 0.6}
+    return activities
+
+
+def pool_usage(network, demand, start, length):
+    """
+    资源池 × 天 的资源占用矩阵
+    """
+    usage = np.zeros((demand.shape[1], length), dtype=np.int64)
+    for i, s in enumerate(start):
+        usage[:, s:s + network.duration[i]] += demand[i][:, None]
+    return usage
+
+
+def baseline_earliest_starts(activities):
+    """
+    原实现：反复扫描活动直到所有前置活动都已确定
+    """
+    es = {}
+    while len(es) < len(activities):
+        for act, info in activities.items():
+            if act not in es and all(pred in es for pred in info.predecessors):
+                es[act] = max([es[pred] + activities[pred].duration for pred in info.predecessors] or [1])
+    return es
+
+
+def baseline_latest_starts(activities, es):
+    """
+    原实现：反复扫描活动直到所有后继活动都已确定，返回最迟开始时间
+    """
+    project_end = max(es[act] + activities[act].duration - 1 for act in activities)
+    ls = {}
+    while len(ls) < len(activities):
+        for act, info in activities.items():
+            if act in ls:
+                continue
+            successors = [a for a, i in activities.items() if act in i.predecessors]
+            if all(suc in ls for suc in successors):
+                ls[act] = min([ls[suc] - info.duration for suc in successors]) if successors \
+                    else project_end - info.duration + 1
+    return ls
+
+
+def baseline_delay_leveling(activities, resource_limit):
+    """
+    原实现：把第一个超载日上前置活动最多的活动推迟一天，直到不再超载。
+    原实现不顺延后继活动，这里在每次推迟后补上顺延，即新接口保持紧前关系的行为
+    """
+    start_times = baseline_earliest_starts(activities)
+    while True:
+        project_end = max(start_times[act] + activities[act].duration - 1 for act in activities)
+        daily_resources = {day: 0 for day in range(1, project_end + 1)}
+        for act, info in activities.items():
+            for d in range(start_times[act], start_times[act] + info.duration):
+                daily_resources[d] += info.resource
+        overloaded_days = [d for d, r in daily_resources.items() if r > resource_limit]
+        if not overloaded_days:
+            return start_times
+        od = overloaded_days[0]
+        candidates = [act for act, info in activities.items()
+                      if start_times[act] <= od < start_times[act] + info.duration]
+        candidates.sort(key=lambda x: len(activities[x].predecessors), reverse=True)
+        start_times[candidates[0]] += 1
+
+        pushed = True
+        while pushed:
+            pushed = False
+            for act, info in activities.items():
+                earliest = max([start_times[p] + activities[p].duration for p in info.predecessors] or [1])
+                if earliest > start_times[act]:
+                    start_times[act], pushed = earliest, True
+
+
+def reference_schedule(network, demand, calendar, scheme, rule):
+    """
+    逐日扫描的进度生成方案：serial 依次把优先级最高的可排活动放到最早可行日，
+    parallel 逐日按优先级开工已就绪且放得下的活动
+    """
+    keys = priority_keys(network, demand, calendar, rule).tolist()
+    duration = network.duration.tolist()
+    capacity = calendar.capacity(calendar.horizon + sum(duration) + 2)
+    start = {}
+
+    def fits(i, day):
+        return bool((capacity[:, day:day + duration[i]] >= demand[i][:, None]).all())
+
+    def ready(i):
+        return max([start[p] + duration[p] for p in network.predecessors[i]] or [1])
+
+    def eligible():
+        return sorted((keys[i], i) for i in range(len(network))
+                      if i not in start and all(p in start for p in network.predecessors[i]))
+
+    def place(i, day):
+        start[i] = day
+        capacity[:, day:day + duration[i]] -= demand[i][:, None]
+
+    day = 1
+    while len(start) < len(network):
+        if scheme == "serial":
+            _, i = eligible()[0]
+            day = ready(i)
+            while not fits(i, day):
+                day += 1
+            place(i, day)
+        else:
+            for _, i in eligible():
+                if ready(i) <= day and fits(i, day):
+                    place(i, day)
+            day += 1
+    return [start[i] for i in range(len(network))]
+
+
+def daily_load(activities, start_times):
+    """
+    每日资源占用，下标为天数（第 0 天不用）
+    """
+    end = max(start_times[a["name"]] + a["duration"] - 1 for a in activities)
+    load = np.zeros(end + 1, dtype=np.int64)
+    for a in activities:
+        load[start_times[a["name"]]:start_times[a["name"]] + a["duration"]] += a["resource"]
+    return load
+
+
+def _respects_precedence(activities, start_times):
+    duration = {a["name"]: a["duration"] for a in activities}
+    return all(
+        start_times[a["name"]] >= start_times[p] + duration[p]
+        for a in activities for p in a["predecessors"]
+    )
+
+
+@pytest.mark.parametrize("workers, restarts, rounds", [(0, 8, 1), (2, 5, 3), (4, 4, 1), (4, 9, 3)])
+def test_optimize_timeout_counts_queued_rounds(monkeypatch, workers, restarts, rounds):
+    from app.routers import scheduler
+
+    monkeypatch.setattr(scheduler, "max_workers", workers)
+    assert scheduler.optimize_timeout(10, restarts) == rounds * 10 + default_timeout
+
+
+def test_optimize_endpoint(client):
+    payload = {"activities": ACTIVITIES, "resource_limit": 6, "objective": "variance",
+               "time_budget": 0.2, "restarts": 3, "seed": 1}
+    response = client.post("/resource/optimize", json=payload)
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["restarts"]) == 3
+    best = min(body["restarts"], key=lambda r: r["cost"])
+    assert body["value"] == best["value"]
+    assert _respects_precedence(ACTIVITIES, body["start_times"])
+    # peak / variance 目标保持 CPM 工期
+    cpm = client.post("/resource/cpm", json={"activities": ACTIVITIES, "resource_limit": 6}).json()
+    assert body["project_end"] == cpm["project_end"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_cpm_matches_baseline(seed):
+    activities = [Activity(**a) for a in random_project(np.random.default_rng(seed))]
+    by_name = {a.name: a for a in activities}
+    network = ProjectNetwork(activities)
+    cpm = network.critical_path()
+    es = baseline_earliest_starts(by_name)
+    ls = baseline_latest_starts(by_name, es)
+    assert dict(zip(network.names, cpm["es"].tolist())) == es
+    assert dict(zip(network.names, cpm["ls"].tolist())) == ls
+
+    for i, name in enumerate(network.names):
+        successors = [a.name for a in activities if name in a.predecessors]
+        next_start = min((es[s] for s in successors), default=cpm["project_end"] + 1)
+        assert cpm["free_float"][i] == next_start - (es[name] + by_name[name].duration)
+        assert 0 <= cpm["free_float"][i] <= cpm["total_float"][i]
+
+
+def test_cpm_endpoint(client):
+    response = client.post("/resource/cpm", json={"activities": ACTIVITIES, "resource_limit": 6})
+    assert response.status_code == 200
+    body = response.json()
+    # A(1-4) -> B(5-7) -> D(8-9) 与 A -> C(5-9) 汇合于 E(10-13)
+    assert body["project_end"] == 13
+    assert body["critical_activities"] == ["A", "B", "C", "D", "E"]
+    assert body["activities"]["C"] == {"es": 5, "ef": 9, "ls": 5, "lf": 9, "total_float": 0, "free_float": 0}
+
+
+@pytest.mark.parametrize("activities, message", [
+    ([{"name": "A", "duration": 1, "resource": 1, "predecessors": ["B"]},
+      {"name": "B", "duration": 1, "resource": 1, "predecessors": ["A"]}], "Cyclic dependency"),
+    ([{"name": "A", "duration": 1, "resource": 1, "predecessors": ["Z"]}], "Unknown predecessors: A <- Z"),
+    ([{"name": "A", "duration": 1, "resource": 1}, {"name": "A", "duration": 2, "resource": 1}],
+     "Duplicate activity names: A")
+])
+@pytest.mark.parametrize("endpoint", ["cpm", "leveling", "smoothing"])
+def test_invalid_networks_are_rejected(client, endpoint, activities, message):
+    response = client.post(f"/resource/{endpoint}", json={"activities": activities, "resource_limit": 5})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(message)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_delay_leveling_matches_baseline(seed):
+    activities = random_project(np.random.default_rng(seed), n=25)
+    data = ProjectData(activities=activities, resource_limit=6)
+    network = ProjectNetwork(data.activities)
+    calendar, demand = resource_model(data)
+    start_times = dict(zip(network.names, level_resources(network, demand, calendar).tolist()))
+    assert start_times == baseline_delay_leveling({a.name: a for a in data.activities}, 6)
+    assert _respects_precedence(activities, start_times)
+    assert daily_load(activities, start_times).max() <= 6
+
+
+def test_leveling_endpoint(client):
+    response = client.post("/resource/leveling", json={"activities": ACTIVITIES, "resource_limit": 5})
+    assert response.status_code == 200
+    body = response.json()
+    by_name = {a["name"]: Activity(**a) for a in ACTIVITIES}
+    assert body["start_times"] == baseline_delay_leveling(by_name, 5)
+    assert body["project_end"] == max(body["start_times"][a["name"]] + a["duration"] - 1 for a in ACTIVITIES)
+
+    # 单个活动的需求超过资源上限时永远无法排入
+    response = client.post("/resource/leveling", json={"activities": ACTIVITIES, "resource_limit": 3})
+    assert response.status_code == 400
+    assert "above its capacity" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("scheme", ["serial", "parallel"])
+@pytest.mark.parametrize("rule", PRIORITY_RULES)
+def test_schedule_generation_matches_reference(scheme, rule):
+    for seed in range(5):
+        activities = random_project(np.random.default_rng(seed), n=25)
+        data = ProjectData(activities=activities, resource_limit=7)
+        network = ProjectNetwork(data.activities)
+        calendar, demand = resource_model(data)
+        start = generate_schedule(network, demand, calendar, scheme, rule).tolist()
+        assert start == reference_schedule(network, demand, calendar, scheme, rule)
+        start_times = dict(zip(network.names, start))
+        assert _respects_precedence(activities, start_times)
+        assert daily_load(activities, start_times).max() <= 7
+
+
+def test_schedule_generation_endpoint(client):
+    payload = {"activities": ACTIVITIES, "resource_limit": 5, "method": "serial", "priority_rule": "min_slack"}
+    body = client.post("/resource/leveling", json=payload).json()
+    assert _respects_precedence(ACTIVITIES, body["start_times"])
+    assert daily_load(ACTIVITIES, body["start_times"]).max() <= 5
+
+    payload["priority_rule"] = "random"
+    assert client.post("/resource/leveling", json=payload).status_code == 422
+
+
+def test_best_shift_matches_full_recompute():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        k, days, duration = int(rng.integers(1, 3)), 30, int(rng.integers(1, 6))
+        amount = rng.integers(0, 4, size=k)
+        current = int(rng.integers(1, days - duration))
+        usage = rng.integers(0, 6, size=(k, days))
+        usage[:, current:current + duration] += amount[:, None]
+        capacity = np.full((k, days), 8)
+        lo, hi = int(rng.integers(1, current + 1)), int(rng.integers(current, days - duration + 1))
+
+        # 原实现的做法：逐个候选开始日重建资源曲线，重新计算平方和并检查超载
+        base = usage.copy()
+        base[:, current:current + duration] -= amount[:, None]
+        best = (0, current)
+        for new_start in range(lo, hi + 1):
+            moved = base.copy()
+            moved[:, new_start:new_start + duration] += amount[:, None]
+            if (moved[:, new_start:new_start + duration] > capacity[:, new_start:new_start + duration]).any():
+                continue
+            delta = int((moved ** 2).sum() - (usage ** 2).sum())
+            if delta < best[0]:
+                best = (delta, new_start)
+        assert best_shift(usage, capacity, lo, hi, current, duration, amount) == best
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_smoothing_reaches_local_optimum(seed):
+    activities = random_project(np.random.default_rng(seed), n=15)
+    by_name = {a["name"]: a for a in activities}
+    es = baseline_earliest_starts({a["name"]: Activity(**a) for a in activities})
+    limit = int(daily_load(activities, es).max())
+    data = ProjectData(activities=activities, resource_limit=limit)
+    network = ProjectNetwork(data.activities)
+    calendar, demand = resource_model(data)
+    start_times = dict(zip(network.names, smooth_resources(network, demand, calendar).tolist()))
+
+    load = daily_load(activities, start_times)
+    project_end = max(es[a["name"]] + a["duration"] - 1 for a in activities)
+    assert len(load) - 1 == project_end
+    assert _respects_precedence(activities, start_times)
+    assert load.max() <= limit
+    assert load[1:].var() <= daily_load(activities, es)[1:].var()
+
+    # 任何一个活动单独移到其可行范围内的其他开始日，都不能在不超载的前提下进一步降低方差
+    for name, a in by_name.items():
+        lo = max([start_times[p] + by_name[p]["duration"] for p in a["predecessors"]] or [1])
+        hi = min([start_times[s] for s, b in by_name.items() if name in b["predecessors"]] or [project_end + 1]) \
+            - a["duration"]
+        for new_start in range(lo, hi + 1):
+            moved = daily_load(activities, dict(start_times, **{name: new_start}))
+            if moved.max() <= limit:
+                assert moved[1:].var() >= load[1:].var() - 1e-9
+
+
+def test_smoothing_endpoint(client):
+    # 示例中的活动都在关键路径上，加入一个有时差的活动 F
+    activities = ACTIVITIES + [{"name": "F", "duration": 2, "resource": 2, "predecessors": []}]
+    body = client.post("/resource/smoothing", json={"activities": activities, "resource_limit": 6}).json()
+    assert body["project_end"] == 13
+    assert _respects_precedence(activities, body["start_times"])
+    load = daily_load(activities, body["start_times"])
+    assert load.max() <= 6
+    es = {"A": 1, "B": 5, "C": 5, "D": 8, "E": 10, "F": 1}
+    assert load[1:].var() < daily_load(activities, es)[1:].var()
+    assert body["start_times"]["F"] >= 10
+
+
+def test_calendar_periods_override_capacity():
+    calendar = ResourceCalendar(["dev", "qa"], [4, 2], [(0, 3, 6, 1), (0, 5, 8, 3), (1, 2, 2, 0)])
+    capacity = calendar.capacity(11)
+    assert capacity[0].tolist() == [4, 4, 4, 1, 1, 3, 3, 3, 3, 4, 4]
+    assert capacity[1].tolist() == [2, 2, 0, 2, 2, 2, 2, 2, 2, 2, 2]
+    assert calendar.horizon == 8
+    assert [calendar.next_change(day) for day in (0, 3, 5, 8, 9)] == [2, 5, 7, 9, -1]
+    with pytest.raises(ValueError):
+        ResourceCalendar(["dev"], [4], [(0, 6, 3, 1)])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_multi_pool_scheduling(seed):
+    activities = random_pool_project(np.random.default_rng(seed))
+    data = ProjectData(activities=activities, resources=POOLS)
+    network = ProjectNetwork(data.activities)
+    calendar, demand = resource_model(data)
+    es = network.earliest_starts()
+
+    schedules = {"delay": level_resources(network, demand, calendar)}
+    for scheme in ("serial", "parallel"):
+        schedules[scheme] = generate_schedule(network, demand, calendar, scheme, "lft")
+        assert schedules[scheme].tolist() == reference_schedule(network, demand, calendar, scheme, "lft")
+    for start in schedules.values():
+        length = int((start + network.duration).max())
+        usage = pool_usage(network, demand, start, length)
+        assert (usage <= calendar.capacity(length)).all()
+        assert all(start[i] >= start[p] + network.duration[p]
+                   for i in range(len(network)) for p in network.predecessors[i])
+
+    # 平滑不改变工期，且只会减少超载的 (资源池, 日期)
+    start = smooth_resources(network, demand, calendar)
+    length = int((es + network.duration).max())
+    assert int((start + network.duration).max()) == length
+    capacity = calendar.capacity(length)
+    before = pool_usage(network, demand, es, length) > capacity
+    after = pool_usage(network, demand, start, length) > capacity
+    assert not (after & ~before).any()
+
+
+def test_multi_pool_endpoint(client):
+    payload = {
+        "activities": [
+            {"name": "A", "duration": 4, "demands": {"developers": 2, "build_agents": 1}, "predecessors": []},
+            {"name": "B", "duration": 3, "demands": {"testers": 1}, "predecessors": ["A"]},
+            {"name": "C", "duration": 3, "demands": {"developers": 2}, "predecessors": []}
+        ],
+        "resources": [
+            {"name": "developers", "capacity": 3, "calendar": [{"start": 5, "end": 9, "capacity": 1}]},
+            {"name": "testers", "capacity": 2},
+            {"name": "build_agents", "capacity": 1}
+        ]
+    }
+    # A 与 C 不能同时使用 developers；前置活动数相同时推迟输入靠前的 A，
+    # A 逐日推迟后又遇到 developers 容量为 1 的第 5~9 天，只能在第 10 天开工，B 随之顺延
+    body = client.post("/resource/leveling", json=payload).json()
+    assert body == {"start_times": {"A": 10, "B": 14, "C": 1}, "project_end": 16}
+    serial = client.post("/resource/leveling", json=dict(payload, method="serial")).json()
+    assert serial == {"start_times": {"A": 1, "B": 5, "C": 10}, "project_end": 12}
+
+    unknown = dict(payload, activities=[{"name": "A", "duration": 1, "demands": {"designers": 1}}])
+    assert client.post("/resource/leveling", json=unknown).json()["detail"] == \
+        "Unknown resource pool for activity 'A': designers"
+    duplicate = dict(payload, resources=payload["resources"] + [{"name": "testers", "capacity": 1}])
+    assert client.post("/resource/leveling", json=duplicate).status_code == 400
+    assert client.post("/resource/leveling", json={"activities": payload["activities"]}).status_code == 400
+
+
+@pytest.mark.parametrize("objective", ["makespan", "peak", "variance"])
+@pytest.mark.parametrize("algorithm", ["annealing", "genetic"])
+def test_optimizer_improves_on_greedy_start(objective, algorithm):
+    data = ProjectData(activities=random_pool_project(np.random.default_rng(6), n=20), resources=POOLS)
+    network = ProjectNetwork(data.activities)
+    calendar, demand = resource_model(data)
+    initial = generate_schedule(network, demand, calendar) if objective == "makespan" \
+        else smooth_resources(network, demand, calendar)
+    problem = ScheduleProblem(network, demand, calendar, objective)
+    # 满足紧前关系的进度经偏移量编码后可以原样解码
+    assert problem.decode(problem.encode(initial)) == initial.tolist()
+
+    result = optimize_schedule(network, demand, calendar, objective, algorithm, 0.3, initial, seed=1)
+    start = np.array(result["start"])
+    assert result["cost"] <= problem.evaluate(initial.tolist())[0]
+    assert (result["cost"], result["value"], result["overload"]) == problem.evaluate(result["start"])
+    assert all(start[i] >= start[p] + network.duration[p]
+               for i in range(len(network)) for p in network.predecessors[i])
+    if objective != "makespan":
+        assert int((start + network.duration).max()) - 1 == network.critical_path()["project_end"]
+    assert [point["best"] for point in result["trace"]] == sorted((point["best"] for point in result["trace"]),
+                                                                   reverse=True)
+
+
+def test_variance_objective_matches_profile():
+    data = ProjectData(activities=random_pool_project(np.random.default_rng(2), n=20), resources=POOLS)
+    network = ProjectNetwork(data.activities)
+    calendar, demand = resource_model(data)
+    start = smooth_resources(network, demand, calendar)
+    end = int((start + network.duration).max()) - 1
+    used = demand.any(axis=0)
+    usage = pool_usage(network, demand, start, end + 1)[used, 1:] / calendar.base[used, None]
+    _, value, _ = ScheduleProblem(network, demand, calendar, "variance").evaluate(start.tolist())
+    assert value == pytest.approx(usage.var(axis=1).sum())
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+# 冷启动（import main）的时间预算，单位秒；较慢的 CI 机器可通过环境变量放宽
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "2.0"))
+
+LAZY_MODULES = ("scipy", "uvicorn", "sklearn", "numpy_financial")
+
+
+def _run(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *options, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                          check=True)
+
+
+def test_import_time_budget():
+    stderr = _run("import main", "-X", "importtime").stderr
+    # 每行格式：import time: self [us] | cumulative | imported package；顶层 main 的累计时间即冷启动耗时
+    cumulative = next(int(line.split("|")[1]) for line in stderr.splitlines() if line.split("|")[-1].strip() == "main")
+    assert cumulative / 1e6 < IMPORT_TIME_BUDGET, f"import main took {cumulative / 1e6:.2f}s"
+
+
+def test_heavy_modules_load_lazily():
+    stdout = _run(f"import sys, main; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))").stdout
+    assert stdout.strip() == ""
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from app.model.compiled_tree import compile_tree
+from app.model.decision_tree import build_tree
+from app.model.tree_session import TreeSession
+from conftest import paths, random_tree
+
+
+def assert_matches_recursive(session):
+    """
+    会话中每个节点的 EV 与导出的树重新递归计算的结果一致
+    """
+    exported = session.export()
+    root = build_tree(exported)
+    assert exported["ev"] == pytest.approx(root.expected_value())
+    for path, node in paths(exported):
+        assert node["ev"] == pytest.approx(root.path_index[tuple(path)].expected_value())
+
+
+def snapshot(session):
+    return {tuple(path): node["ev"] for path, node in paths(session.export())}
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_random_edits_match_recursive(seed):
+    rng = np.random.default_rng(seed)
+    session = TreeSession(compile_tree(random_tree(rng)))
+    assert_matches_recursive(session)
+
+    for step in range(40):
+        nodes = list(paths(session.export()))
+        path, node = nodes[int(rng.integers(len(nodes)))]
+        before = snapshot(session)
+        action = rng.random()
+        if action < 0.5:
+            if "children" not in node:
+                result = session.update_node(path, {"value": float(rng.integers(-100, 200))})
+            elif "probability" in node:
+                result = session.update_node(path, {"probability": float(rng.random())})
+            else:
+                continue
+        elif action < 0.8:
+            child = {"name": f"new{step}", "value": float(rng.integers(-100, 200))}
+            if node.get("children") and all("probability" in c for c in node["children"]):
+                child["probability"] = 0.1
+            result = session.add_child(path, child)
+            assert result["added"]["ev"] == child["value"]
+        else:
+            parent = session.parent[session.find(path)]
+            if len(session.children[parent]) == 1 and session.value[parent] is None:
+                with pytest.raises(ValueError):
+                    session.remove_node(path)
+                continue
+            result = session.remove_node(path)
+
+        assert_matches_recursive(session)
+        after = snapshot(session)
+        # changed 只列出 EV 确实变化的祖先
+        for item in result["changed"]:
+            assert tuple(item["path"]) not in before or before[tuple(item["path"])] != item["ev"]
+            assert after.get(tuple(item["path"]), session.ev[0]) == item["ev"]
+        assert result["optimal_expected_value"] == session.ev[0]
+
+
+def test_invalid_edits_are_rejected():
+    session = TreeSession(compile_tree({
+        "name": "Root",
+        "children": [{"name": "A", "value": 1, "probability": 0.5}, {"name": "B", "value": 3, "probability": 0.5}]
+    }))
+    with pytest.raises(ValueError):
+        session.update_node(["A"], {"probability": 1.5})
+    with pytest.raises(ValueError):
+        session.update_node(["A"], {"weight": 2})
+    with pytest.raises(ValueError):
+        session.update_node(["A"], {"value": None})
+    with pytest.raises(ValueError):
+        session.add_child([], {"name": "A", "value": 2})
+    # 新增子树的每个节点与 update_node 做相同的校验
+    for node in ({"name": "C", "value": 5, "probability": 2}, {"name": "C", "value": "5"},
+                 {"name": "C", "children": [{"name": "D", "value": 1, "probability": -0.1}]}):
+        with pytest.raises(ValueError):
+            session.add_child([], node)
+    assert list(session.child_ids[0]) == ["A", "B"]
+    with pytest.raises(ValueError):
+        session.remove_node([])
+    with pytest.raises(ValueError):
+        session.find(["C"])
+    assert session.ev[0] == 2
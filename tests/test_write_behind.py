@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import app.write_behind as write_behind
+from app.dependencies import build_engine, sql_url
+from app.model.budget_cost import ROI
+from app.model.estimation import Estimation
+from app.write_behind import WriteBehindQueue
+
+
+def run_with_engine(monkeypatch, scenario):
+    """
+    在新的事件循环中执行 scenario(engine)；写后队列改用绑定到该循环的独立引擎
+    """
+    async def run():
+        engine = build_engine(sql_url)
+        monkeypatch.setattr(write_behind, "engine", engine)
+        try:
+            return await scenario(engine)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+async def count(engine, model, method):
+    async with AsyncSession(engine) as session:
+        return len((await session.exec(select(model).where(model.method == method))).all())
+
+
+def test_flush_by_batch_size(client, monkeypatch):
+    async def scenario(engine):
+        queue = WriteBehindQueue(100, batch_size=5, flush_interval=60, enqueue_timeout=1)
+        queue.start()
+        for size in range(10):
+            await queue.put(Estimation(method="wb_batch", size=size, effort=size, time=-1))
+        # 攒满两批后立即写入，不必等待 flush_interval
+        for _ in range(100):
+            if queue.written == 10:
+                break
+            await asyncio.sleep(0.01)
+        written = await count(engine, Estimation, "wb_batch")
+        await queue.stop()
+        return queue, written
+
+    queue, written = run_with_engine(monkeypatch, scenario)
+    assert (written, queue.written, queue.batches, queue.failed) == (10, 10, 2, 0)
+
+
+def test_flush_by_interval(client, monkeypatch):
+    async def scenario(engine):
+        queue = WriteBehindQueue(100, batch_size=500, flush_interval=0.05, enqueue_timeout=1)
+        queue.start()
+        await queue.put(ROI(method="wb_interval", gain=30, cost=10, roi_value=2))
+        await queue.put(Estimation(method="wb_interval", size=1, effort=1, time=-1))
+        await asyncio.sleep(0.3)
+        written = (await count(engine, ROI, "wb_interval"), await count(engine, Estimation, "wb_interval"))
+        await queue.stop()
+        return queue, written
+
+    queue, written = run_with_engine(monkeypatch, scenario)
+    # 不同表的记录在同一批中分组写入
+    assert written == (1, 1)
+    assert (queue.batches, queue.written) == (1, 2)
+
+
+def test_full_queue_rejects_and_stop_drains(client, monkeypatch):
+    async def scenario(engine):
+        queue = WriteBehindQueue(2, batch_size=1, flush_interval=0, enqueue_timeout=0.05)
+        # 第一批的写入被阻塞，后台任务不再取出记录，队列随即被填满
+        release, flush = asyncio.Event(), queue._flush
+
+        async def blocked_flush(batch):
+            await release.wait()
+            await flush(batch)
+
+        queue._flush = blocked_flush
+        queue.start()
+        await queue.put(Estimation(method="wb_full", size=0, effort=0, time=-1))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as rejected:
+            for size in range(1, 4):
+                await queue.put(Estimation(method="wb_full", size=size, effort=size, time=-1))
+        stats = queue.stats()
+        release.set()
+        await queue.stop()
+        return queue, stats, rejected.value, await count(engine, Estimation, "wb_full")
+
+    queue, stats, error, written = run_with_engine(monkeypatch, scenario)
+    assert error.status_code == 503
+    assert (stats["depth"], stats["capacity"], stats["rejected"], stats["enabled"]) == (2, 2, 1, True)
+    assert written == queue.written == queue.enqueued == 3
+    assert not queue.running and queue.stats()["depth"] == 0
+
+
+def test_failed_flush_is_counted(client, monkeypatch):
+    async def scenario(engine):
+        queue = WriteBehindQueue(10, batch_size=1, flush_interval=0, enqueue_timeout=1)
+        queue.start()
+        # 违反主键唯一约束的一批被丢弃，后续记录照常写入
+        await queue.put(Estimation(id=1, method="wb_failed", size=1, effort=1, time=-1))
+        await queue.put(Estimation(method="wb_failed", size=2, effort=2, time=-1))
+        await queue.stop()
+        return queue, await count(engine, Estimation, "wb_failed")
+
+    queue, written = run_with_engine(monkeypatch, scenario)
+    assert (queue.failed, queue.written, written) == (1, 1, 1)
+
+
+def test_save_record_uses_queue_when_running(client, monkeypatch):
+    async def scenario(engine):
+        queue = WriteBehindQueue(10, batch_size=500, flush_interval=60, enqueue_timeout=1)
+        monkeypatch.setattr(write_behind, "write_queue", queue)
+        queue.start()
+        async with AsyncSession(engine) as session:
+            record = await write_behind.save_record(session, Estimation(method="wb_save", size=1, effort=1, time=-1))
+        await queue.stop()
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            direct = await write_behind.save_record(session, Estimation(method="wb_save", size=2, effort=2, time=-1))
+        return record, direct, await count(engine, Estimation, "wb_save")
+
+    record, direct, written = run_with_engine(monkeypatch, scenario)
+    # 写后模式下返回的记录还没有主键；队列停止后直接提交并拿到主键
+    assert record.id is None and direct.id is not None
+    assert written == 2
+
+
+def test_write_behind_endpoint(client):
+    stats = client.get("/write-behind").json()
+    assert stats["enabled"] is False
+    assert stats["capacity"] == write_behind.queue_size
+    assert {"depth", "written", "failed", "rejected", "avg_flush_ms"} <= set(stats)